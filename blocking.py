@@ -0,0 +1,110 @@
+"""请求拦截：按配置的规则阻止截图用不到的请求（视频流、统计上报、推荐信息流等）
+
+规则表在 src/block_profiles.json 中，每个规则集包含 deny（阻止）和 allow（放行）
+两组通配符 URL 模式，allow 优先。通过 DevTools 的 Network.setBlockedURLs 在
+setup_browser 中应用，请求在浏览器内部被拦截，不会发到网络上。
+内置的 off 规则集不拦截任何请求。
+
+拦截后每个页面的请求数、传输字节数和被阻止的请求数从 chromedriver 的
+performance 日志中统计，记录到任务日志和 /metrics。
+"""
+import json
+import os
+
+BLOCK_PROFILES_FILE = "src/block_profiles.json"
+DEFAULT_BLOCK_PROFILE = "default"
+BLOCK_PROFILE_OFF = "off"
+
+
+def load_block_profiles(path=BLOCK_PROFILES_FILE):
+    """读取规则表，返回 {名称: {"deny": [...], "allow": [...]}}，总是包含 off"""
+    profiles = {BLOCK_PROFILE_OFF: {"deny": [], "allow": []}}
+    if not os.path.exists(path):
+        return profiles
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except Exception as e:
+        print(f"读取请求拦截规则失败: {str(e)}")
+        return profiles
+    for name, entry in entries.items():
+        if not isinstance(entry, dict):
+            print(f"忽略格式不正确的拦截规则: {name}")
+            continue
+        profiles[name] = {
+            "deny": [p for p in entry.get("deny", []) if isinstance(p, str) and p],
+            "allow": [p for p in entry.get("allow", []) if isinstance(p, str) and p],
+        }
+    return profiles
+
+
+def get_block_profile(name, path=BLOCK_PROFILES_FILE):
+    """按名称取规则集，不存在时抛出 ValueError"""
+    profiles = load_block_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"不支持的请求拦截规则: {name}（可选: {', '.join(profiles)}）")
+    return profiles[name]
+
+
+def chrome_logging_options(chrome_options):
+    """开启 chromedriver 的 performance 日志（只记录网络事件），用于统计每个页面的请求"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
+
+def apply_block_profile(driver, profile):
+    """在浏览器中应用规则集，返回是否成功
+
+    新版 Chrome 支持按顺序匹配的 urlPatterns，可以表达放行规则；
+    旧版只支持阻止列表，此时 allow 被忽略。
+    """
+    if not profile["deny"]:
+        return True
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+    except Exception as e:
+        print(f"启用网络拦截失败: {str(e)[:100]}")
+        return False
+    patterns = ([{"urlPattern": p, "block": False} for p in profile["allow"]] +
+                [{"urlPattern": p, "block": True} for p in profile["deny"]])
+    try:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urlPatterns": patterns})
+        return True
+    except Exception:
+        pass
+    try:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile["deny"]})
+        if profile["allow"]:
+            print("当前 Chrome 不支持放行规则，只应用阻止列表")
+        return True
+    except Exception as e:
+        print(f"设置请求拦截失败: {str(e)[:100]}")
+        return False
+
+
+def drain_network_log(driver):
+    """取出 performance 日志并统计网络请求，返回 {requests, bytes, blocked, failed}
+
+    日志在 chromedriver 中累积，每次调用都会清空；没有开启日志时返回 None。
+    """
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return None
+    stats = {"requests": 0, "bytes": 0, "blocked": 0, "failed": 0}
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == "Network.loadingFinished":
+            stats["requests"] += 1
+            stats["bytes"] += int(params.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed":
+            if params.get("blockedReason"):
+                stats["blocked"] += 1
+            elif not params.get("canceled"):
+                stats["failed"] += 1
+    return stats
@@ -0,0 +1,167 @@
+"""常驻浏览器池：Web 任务之间复用已经启动、已经登录的 Chrome
+
+任务开始时从池中租用浏览器，结束时归还而不是关闭。租出前用一次很便宜的
+execute_script 检查浏览器是否还活着；空闲超过 idle_ttl 秒的浏览器由后台线程关闭；
+一个浏览器累计打开 max_pages 个页面后不再放回池中，避免长时间运行后内存膨胀。
+浏览器的启动参数（页面加载策略、设备像素比）不同时不能混用，按 key 分开存放。
+"""
+import threading
+import time
+
+# 池中最多保留的空闲浏览器数量
+MAX_IDLE_BROWSERS = 8
+# 空闲浏览器保留的时间（秒）
+IDLE_TTL = 600
+# 每个浏览器最多打开的页面数，超过后关闭重建
+RECYCLE_AFTER_PAGES = 200
+# 后台检查空闲浏览器的间隔（秒）
+REAP_INTERVAL = 30
+
+
+class PooledBrowser:
+    """池中的一个浏览器及其使用情况"""
+
+    def __init__(self, driver, key):
+        self.driver = driver
+        self.key = key
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.pages = 0
+
+
+class BrowserPool:
+    """按 key 存放空闲浏览器的池
+
+    lease(key, create) 优先返回同一 key 的空闲浏览器，没有可用的时调用 create() 启动新的；
+    release(driver) 把浏览器放回池中，healthy 为假、打开的页面过多或池已满时直接关闭。
+    """
+
+    def __init__(self, max_idle=MAX_IDLE_BROWSERS, idle_ttl=IDLE_TTL, max_pages=RECYCLE_AFTER_PAGES,
+                 reap_interval=REAP_INTERVAL):
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self.max_pages = max_pages
+        self._idle = []     # PooledBrowser，最近归还的在最后
+        self._leased = {}   # id(driver) -> PooledBrowser
+        self._counts = {"launched": 0, "reused": 0, "unhealthy": 0, "recycled": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        if reap_interval:
+            threading.Thread(target=self._reaper, args=(reap_interval,), daemon=True).start()
+
+    def lease(self, key, create):
+        """租用一个浏览器，返回 driver"""
+        while True:
+            with self._lock:
+                entry = self._take_idle(key)
+            if entry is None:
+                break
+            if self._probe(entry.driver):
+                self._count("reused")
+                return self._lease_entry(entry)
+            self._count("unhealthy")
+            self._quit(entry.driver)
+        driver = create()
+        self._count("launched")
+        return self._lease_entry(PooledBrowser(driver, key))
+
+    def _take_idle(self, key):
+        """取出同一 key 中最近归还的空闲浏览器，调用方需持有 _lock"""
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].key == key:
+                return self._idle.pop(i)
+        return None
+
+    def _lease_entry(self, entry):
+        with self._lock:
+            self._leased[id(entry.driver)] = entry
+        return entry.driver
+
+    def _probe(self, driver):
+        """一次往返检查浏览器是否还能响应"""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def mark_page(self, driver, count=1):
+        """记录租用中的浏览器又打开了 count 个页面"""
+        with self._lock:
+            entry = self._leased.get(id(driver))
+            if entry is not None:
+                entry.pages += count
+
+    def release(self, driver, healthy=True):
+        """归还浏览器；不再需要的浏览器会被关闭"""
+        with self._lock:
+            entry = self._leased.pop(id(driver), None)
+        if entry is None:
+            self._quit(driver)
+            return
+        if healthy and entry.pages >= self.max_pages:
+            self._count("recycled")
+            healthy = False
+        if healthy and not self._closed.is_set():
+            try:
+                # 停止页面上的脚本和媒体，空闲时不占用 CPU
+                driver.get("about:blank")
+            except Exception:
+                self._count("unhealthy")
+                healthy = False
+        if not healthy or self._closed.is_set():
+            self._quit(driver)
+            return
+        entry.last_used = time.time()
+        with self._lock:
+            self._idle.append(entry)
+            overflow = self._idle[:max(0, len(self._idle) - self.max_idle)]
+            del self._idle[:len(overflow)]
+        for old in overflow:
+            self._count("evicted")
+            self._quit(old.driver)
+
+    def prewarm(self, key, create):
+        """预先启动一个浏览器放入池中，供下一个任务直接使用"""
+        try:
+            self.release(self.lease(key, create))
+        except Exception as e:
+            print(f"预热浏览器失败: {str(e)}")
+
+    def evict_idle(self, now=None):
+        """关闭空闲超过 idle_ttl 秒的浏览器，返回关闭的数量"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [entry for entry in self._idle if now - entry.last_used > self.idle_ttl]
+            self._idle = [entry for entry in self._idle if entry not in expired]
+        for entry in expired:
+            self._count("evicted")
+            self._quit(entry.driver)
+        return len(expired)
+
+    def _reaper(self, interval):
+        while not self._closed.wait(interval):
+            self.evict_idle()
+
+    def close(self):
+        """关闭所有空闲浏览器，之后归还的浏览器也会直接关闭"""
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._quit(entry.driver)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def stats(self):
+        """空闲和租用中的数量，以及启动、复用、回收等累计次数"""
+        with self._lock:
+            return dict(self._counts, idle=len(self._idle), leased=len(self._leased))
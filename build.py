@@ -13,6 +13,26 @@ def prepare_build():
     files_to_copy = [
         "web.py",
         "main.py",
+        "worker_pool.py",
+        "postprocess.py",
+        "compositor.py",
+        "readiness.py",
+        "manifest.py",
+        "ingest.py",
+        "jobs.py",
+        "events.py",
+        "screenshot_index.py",
+        "thumbnails.py",
+        "encoders.py",
+        "metrics.py",
+        "joblog.py",
+        "capture.py",
+        "browser_pool.py",
+        "overlays.py",
+        "blocking.py",
+        "retry.py",
+        "throttle.py",
+        "distributed.py",
         "requirements.txt"
     ]
     
@@ -67,6 +87,10 @@ def init_with_progress():
         return False
 
 if __name__ == '__main__':
+    # 打包后使用后处理进程池需要 freeze_support
+    import multiprocessing
+    multiprocessing.freeze_support()
+    
     try:
         # 确保工作目录正确
         if getattr(sys, 'frozen', False):
@@ -0,0 +1,117 @@
+"""浏览器截图方式：按原生分辨率只截取保留区域，或沿用旧的 2 倍截图再缩放
+
+原生模式（native）让 Chrome 以 1179 / 450 的设备像素比渲染 450 宽的移动端视口，
+并通过 DevTools 的 Page.captureScreenshot 只截取最终图片中间的内容区域，
+得到的截图已经是 1179 × 2290，合成时只需粘贴，不再重采样，也不丢弃像素。
+缩放模式（scaled）为原来的做法：pixelRatio 2.0 截取整个视口（900 × 1900），
+由合成器缩放到 1179 × 2490 后裁切。两种模式的 CSS 布局完全相同。
+
+Page.captureScreenshot 的 clip 以文档左上角为原点，页面滚动后（例如点击下一页前
+scrollIntoView 了按钮）需要加上当前的滚动位置，才能截到视口中显示的内容。
+
+截图字节由 Chrome 直接按 image_format 编码（png/jpeg/webp），base64 解码后
+在内存中交给后处理，不经过临时文件。JPEG/WebP 传输的数据量小得多，但会多一次
+有损压缩；optimize_for_speed 让 Chrome 用更快、压缩率更低的方式编码。
+"""
+import base64
+
+from compositor import SCALED_SIZE, CONTENT_TOP, CONTENT_SIZE
+
+# 移动端模拟的 CSS 视口：宽 450，高按 1179 × 2490 等比例缩小
+VIEWPORT_WIDTH = 450
+VIEWPORT_HEIGHT = int(VIEWPORT_WIDTH * SCALED_SIZE[1] / SCALED_SIZE[0])
+
+CAPTURE_MODES = ("native", "scaled")
+DEFAULT_CAPTURE_MODE = "native"
+# 原生模式下一个 CSS 像素对应的设备像素数，视口宽度正好渲染成 1179 像素
+NATIVE_PIXEL_RATIO = SCALED_SIZE[0] / VIEWPORT_WIDTH
+SCALED_PIXEL_RATIO = 2.0
+
+# Chrome 截图时的编码格式
+CAPTURE_FORMATS = ("png", "jpeg", "webp")
+DEFAULT_CAPTURE_FORMAT = "png"
+# JPEG/WebP 截图的默认质量，后处理还会再编码一次，所以取得较高
+CAPTURE_QUALITY = 90
+
+
+def scroll_position(driver):
+    """视口在文档中的位置 (x, y)（CSS 像素），读取失败时按未滚动处理"""
+    try:
+        metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    except Exception:
+        return 0, 0
+    # 旧版 Chrome 只有 visualViewport
+    viewport = metrics.get("cssVisualViewport") or metrics.get("visualViewport") or {}
+    return viewport.get("pageX", 0), viewport.get("pageY", 0)
+
+
+class FrameCapture:
+    """一种截图方式：决定浏览器的设备像素比，以及如何从浏览器取得截图字节"""
+
+    def __init__(self, mode=DEFAULT_CAPTURE_MODE, image_format=DEFAULT_CAPTURE_FORMAT, quality=None,
+                 optimize_for_speed=False):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"不支持的截图方式: {mode}")
+        if image_format not in CAPTURE_FORMATS:
+            raise ValueError(f"不支持的截图格式: {image_format}")
+        if quality is not None:
+            quality = int(quality)
+            if not 1 <= quality <= 100:
+                raise ValueError(f"截图质量应在 1~100 之间: {quality}")
+        self.mode = mode
+        self.pixel_ratio = NATIVE_PIXEL_RATIO if mode == "native" else SCALED_PIXEL_RATIO
+        self.image_format = image_format
+        self.quality = None if image_format == "png" else (CAPTURE_QUALITY if quality is None else quality)
+        self.optimize_for_speed = bool(optimize_for_speed)
+
+    def device_metrics(self):
+        """Chrome mobileEmulation 使用的设备参数"""
+        return {
+            "width": VIEWPORT_WIDTH,
+            "height": VIEWPORT_HEIGHT,
+            "pixelRatio": self.pixel_ratio,
+            "mobile": True
+        }
+
+    def clip(self, scroll=(0, 0)):
+        """原生模式截取的区域（CSS 像素）：最终图片保留的 195~2485 行
+
+        scroll 为页面的滚动位置 (x, y)，clip 以文档为原点，所以要加上滚动位置。
+        高度多取一个设备像素，避免浮点舍入后少一行，多出的行由合成器裁掉。
+        """
+        return {
+            "x": scroll[0],
+            "y": scroll[1] + CONTENT_TOP / self.pixel_ratio,
+            "width": VIEWPORT_WIDTH,
+            "height": (CONTENT_SIZE[1] + 1) / self.pixel_ratio,
+            "scale": 1
+        }
+
+    def screenshot_params(self, scroll=(0, 0)):
+        """Page.captureScreenshot 的参数，为 None 时使用 WebDriver 的截图接口"""
+        if self.mode == "scaled" and self.image_format == "png" and not self.optimize_for_speed:
+            return None
+        params = {"format": self.image_format, "captureBeyondViewport": False}
+        if self.quality is not None:
+            params["quality"] = self.quality
+        if self.optimize_for_speed:
+            params["optimizeForSpeed"] = True
+        if self.mode == "native":
+            params["clip"] = self.clip(scroll)
+        return params
+
+    def grab(self, driver):
+        """截取当前页面，返回 image_format 格式的图片字节"""
+        params = self.screenshot_params(scroll_position(driver) if self.mode == "native" else (0, 0))
+        if params is None:
+            return driver.get_screenshot_as_png()
+        result = driver.execute_cdp_cmd("Page.captureScreenshot", params)
+        return base64.b64decode(result["data"])
+
+    def describe(self):
+        text = f"{self.mode} (pixelRatio {self.pixel_ratio:.4g}, {self.image_format}"
+        if self.quality is not None:
+            text += f" quality={self.quality}"
+        if self.optimize_for_speed:
+            text += ", optimizeForSpeed"
+        return text + ")"
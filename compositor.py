@@ -0,0 +1,100 @@
+"""截图合成器：每次运行只生成一次静态模板，每帧只做一次粘贴和一次编码"""
+import io
+import threading
+import time
+from PIL import Image
+from encoders import create_encoder
+
+# 最终图片尺寸 (1179 × 2556)
+CANVAS_SIZE = (1179, 2556)
+# 整个视口的截图先等比缩放到 1179 × 2490，再保留 195~2485 行
+SCALED_SIZE = (1179, 2490)
+CONTENT_TOP = 195
+CONTENT_BOTTOM = 2485
+# 截图内容在最终图片中的位置：顶部 165px 之下、底部 101px 之上
+CONTENT_OFFSET = (0, 165)
+CONTENT_SIZE = (1179, CONTENT_BOTTOM - CONTENT_TOP)
+BOTTOM_OFFSET = (0, 2455)
+# 宽度与 1179 相差不超过这个值的截图视为原生分辨率截取的内容区域
+NATIVE_WIDTH_TOLERANCE = 2
+
+
+def back_icon_position():
+    """计算返回图标的粘贴位置（以 35,170 -> 118,257 区域的中心为准）"""
+    width = 118 - 35
+    height = 257 - 170
+    size = max(width, height)  # 取最长边
+
+    center_x = (35 + 118) // 2
+    center_y = (170 + 257) // 2
+    half_size = size // 2
+    return (center_x - half_size, center_y - half_size)
+
+
+class Compositor:
+    """截图合成器
+
+    构造时把顶部栏、底部栏画到一张可复用的画布上，并计算好返回图标的位置。
+    截图区域和顶部、底部互不重叠，每帧的截图都会完整覆盖中间区域，
+    所以画布不需要每帧重建：只需粘贴裁切后的截图、粘贴返回图标，再编码一次。
+    encoder 决定输出格式，默认为快速压缩的 PNG。
+    """
+
+    def __init__(self, top_img, bottom_img, back_icon, encoder=None):
+        self.canvas = Image.new('RGB', CANVAS_SIZE, 'white')
+        self.canvas.paste(top_img, (0, 0))
+        self.canvas.paste(bottom_img, BOTTOM_OFFSET)
+        self.back_icon = back_icon.copy()
+        self.icon_pos = back_icon_position()
+        self.encoder = encoder or create_encoder()
+        self._lock = threading.Lock()
+
+    def prepare_content(self, screenshot):
+        """把浏览器截图缩放并裁切成 1179 × 2290 的内容区域
+
+        原生分辨率截取的内容区域（宽 1179）不做重采样，只裁掉舍入多出的行；
+        整个视口的截图只对保留下来的行做重采样，等价于先缩放到 1179 × 2490 再裁切。
+        """
+        if screenshot.size == CONTENT_SIZE:
+            return screenshot
+        width, height = screenshot.size
+        if width == CONTENT_SIZE[0] and height > CONTENT_SIZE[1]:
+            return screenshot.crop((0, 0) + CONTENT_SIZE)
+        if abs(width - CONTENT_SIZE[0]) <= NATIVE_WIDTH_TOLERANCE:
+            # 原生截图因设备像素舍入差了一两个像素，整体微调
+            return screenshot.resize(CONTENT_SIZE, Image.Resampling.LANCZOS)
+        scale_y = height / SCALED_SIZE[1]
+        box = (0, CONTENT_TOP * scale_y, width, CONTENT_BOTTOM * scale_y)
+        return screenshot.resize(CONTENT_SIZE, Image.Resampling.LANCZOS, box=box)
+
+    def _render(self, screenshot):
+        """在复用画布上绘制一帧，调用方需持有 _lock"""
+        self.canvas.paste(self.prepare_content(screenshot), CONTENT_OFFSET)
+        self.canvas.paste(self.back_icon, self.icon_pos)
+        return self.canvas
+
+    def compose(self, screenshot):
+        """返回合成好的最终图片（独立副本）"""
+        with self._lock:
+            return self._render(screenshot).copy()
+
+    def encode(self, screenshot, after_encode=None, timings=None):
+        """合成并编码成图片字节，整个过程只编码一次
+
+        after_encode(image, data) 在画布仍是这一帧时调用，可以直接用合成好的
+        图片生成缩略图，不需要再复制或解码一次。
+        timings 为字典时写入 resize（缩放和拼接）与 encode 两个阶段的耗时（秒）。
+        """
+        buffer = io.BytesIO()
+        with self._lock:
+            start = time.perf_counter()
+            canvas = self._render(screenshot)
+            rendered = time.perf_counter()
+            self.encoder.save(canvas, buffer)
+            if timings is not None:
+                timings["resize"] = rendered - start
+                timings["encode"] = time.perf_counter() - rendered
+            data = buffer.getvalue()
+            if after_encode:
+                after_encode(canvas, data)
+        return data
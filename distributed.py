@@ -0,0 +1,672 @@
+"""分布式模式：协调端把 URL 列表拆成租约，多台机器上的工作端领取并处理
+
+协调端（submit）把任务的 URL 按 lease_size 个一组拆成租约写入队列后端；
+工作端（worker）在每台机器上启动若干浏览器，每个浏览器循环领取一个租约、
+逐个调用 process_single_url 处理其中的 URL、定期发送心跳延长租约，处理完
+再领取下一个。工作端中途退出时租约不再续期，过期后会被其他工作端重新领取。
+
+每一页截图的路径、大小和 sha256 由工作端写回队列后端，所有工作端的结果
+合并成一个任务视图（status）。截图文件保存在各工作端自己的 ./screenshot 中，
+视图中记录了生成它的工作端。
+
+队列后端是可替换的：QueueBackend 定义了接口，SQLiteQueueBackend 用一个
+SQLite 文件实现，适合在同一台机器或共享目录上测试。新的后端实现同样的方法后
+在 BACKENDS 中注册即可，用 scheme://地址 选择。
+
+    python distributed.py submit url.txt --queue sqlite:///queue.db
+    python distributed.py worker --queue sqlite:///queue.db --workers 2
+    python distributed.py status <任务ID> --queue sqlite:///queue.db
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from jobs import new_job_id
+
+DEFAULT_QUEUE = "sqlite:///./screenshot/queue.db"
+# 每个租约包含的 URL 数量
+LEASE_SIZE = 5
+# 租约有效期（秒），工作端每隔三分之一有效期发送一次心跳
+LEASE_SECONDS = 120
+# 一个租约最多被领取的次数，超过后标记为失败
+MAX_LEASE_ATTEMPTS = 3
+# 没有可领取的租约时，工作端等待的间隔（秒）
+IDLE_POLL_SECONDS = 5
+
+# 租约状态
+LEASE_QUEUED = "queued"
+LEASE_LEASED = "leased"
+LEASE_DONE = "done"
+LEASE_FAILED = "failed"
+
+# URL 状态，与运行清单一致
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_CAPTURED = "captured"
+TASK_FAILED = "failed"
+
+
+class Lease:
+    """工作端领取到的一个租约"""
+
+    def __init__(self, id, job_id, options, tasks, attempts):
+        self.id = id
+        self.job_id = job_id
+        self.options = options
+        self.tasks = tasks  # [(序号, URL)]
+        self.attempts = attempts
+
+
+class QueueBackend(ABC):
+    """队列后端接口
+
+    协调端调用 create_job 和 job_view；工作端调用 claim、heartbeat、complete、
+    release，以及记录 URL 和截图结果的 start_task、record_frame、finish_task、fail_task。
+    方法都是抽象的，缺少实现的后端在创建时就会报错。
+    """
+
+    @abstractmethod
+    def create_job(self, urls, options=None, lease_size=LEASE_SIZE):
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, worker, lease_seconds=LEASE_SECONDS, job_id=None):
+        """领取一个排队中或已过期的租约，没有时返回 None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, worker, lease_ids, lease_seconds=LEASE_SECONDS):
+        """延长租约，返回仍然属于该工作端的租约 ID 集合"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, worker, lease_id):
+        """租约处理完毕，返回是否成功（租约已被其他工作端接管时返回 False）"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, worker, lease_id):
+        """放弃租约，让其他工作端立即领取"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def start_task(self, job_id, index, worker):
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_frame(self, job_id, index, page, result, worker):
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish_task(self, job_id, index, frame_count):
+        raise NotImplementedError
+
+    @abstractmethod
+    def fail_task(self, job_id, index, error):
+        raise NotImplementedError
+
+    @abstractmethod
+    def job_view(self, job_id):
+        """合并所有工作端结果的任务视图，任务不存在时返回 None"""
+        raise NotImplementedError
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    options TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS leases_status ON leases (status, expires);
+CREATE TABLE IF NOT EXISTS tasks (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    lease_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    frame_count INTEGER,
+    error TEXT,
+    updated REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS tasks_lease ON tasks (lease_id);
+CREATE TABLE IF NOT EXISTS frames (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    worker TEXT,
+    PRIMARY KEY (job_id, idx, page)
+);
+"""
+
+
+class SQLiteQueueBackend(QueueBackend):
+    """基于单个 SQLite 文件的队列后端
+
+    领取租约时使用 BEGIN IMMEDIATE 加写锁，多个进程同时领取也不会拿到同一个租约。
+    每个线程使用自己的连接。SQLite 依赖文件锁，不要放在网络文件系统上用于生产。
+    """
+
+    def __init__(self, path, max_attempts=MAX_LEASE_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql, *params):
+        return self._connection().execute(sql, params)
+
+    def create_job(self, urls, options=None, lease_size=LEASE_SIZE):
+        job_id = new_job_id()
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO jobs (id, options, created) VALUES (?, ?, ?)",
+                         (job_id, json.dumps(options or {}, ensure_ascii=False), now))
+            tasks = list(enumerate(urls, 1))
+            for start in range(0, len(tasks), max(1, lease_size)):
+                lease_id = conn.execute(
+                    "INSERT INTO leases (job_id, status, updated) VALUES (?, ?, ?)",
+                    (job_id, LEASE_QUEUED, now)).lastrowid
+                conn.executemany(
+                    "INSERT INTO tasks (job_id, idx, url, lease_id, status, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(job_id, index, url, lease_id, TASK_PENDING, now)
+                     for index, url in tasks[start:start + max(1, lease_size)]])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS, job_id=None):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(
+                    "SELECT id, job_id, attempts FROM leases "
+                    "WHERE (status = ? OR (status = ? AND expires < ?)) AND (? IS NULL OR job_id = ?) "
+                    "ORDER BY id LIMIT 1",
+                    (LEASE_QUEUED, LEASE_LEASED, now, job_id, job_id)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                lease_id, lease_job, attempts = row
+                if attempts >= self.max_attempts:
+                    # 反复过期或被放弃的租约（例如总是让浏览器崩溃的 URL）不再分配
+                    conn.execute("UPDATE leases SET status = ?, updated = ? WHERE id = ?",
+                                 (LEASE_FAILED, now, lease_id))
+                    conn.execute("UPDATE tasks SET status = ?, error = ?, updated = ? "
+                                 "WHERE lease_id = ? AND status != ?",
+                                 (TASK_FAILED, "租约多次未完成", now, lease_id, TASK_CAPTURED))
+                    continue
+                conn.execute("UPDATE leases SET status = ?, worker = ?, expires = ?, attempts = ?, updated = ? "
+                             "WHERE id = ?",
+                             (LEASE_LEASED, worker, now + lease_seconds, attempts + 1, now, lease_id))
+                tasks = conn.execute("SELECT idx, url FROM tasks WHERE lease_id = ? AND status != ? ORDER BY idx",
+                                     (lease_id, TASK_CAPTURED)).fetchall()
+                options = conn.execute("SELECT options FROM jobs WHERE id = ?", (lease_job,)).fetchone()[0]
+                conn.execute("COMMIT")
+                return Lease(lease_id, lease_job, json.loads(options), [tuple(task) for task in tasks], attempts + 1)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def heartbeat(self, worker, lease_ids, lease_seconds=LEASE_SECONDS):
+        lease_ids = list(lease_ids)
+        if not lease_ids:
+            return set()
+        now = time.time()
+        marks = ",".join("?" * len(lease_ids))
+        self._write(f"UPDATE leases SET expires = ?, updated = ? WHERE worker = ? AND status = ? AND id IN ({marks})",
+                    now + lease_seconds, now, worker, LEASE_LEASED, *lease_ids)
+        rows = self._write(f"SELECT id FROM leases WHERE worker = ? AND status = ? AND id IN ({marks})",
+                           worker, LEASE_LEASED, *lease_ids).fetchall()
+        return {row[0] for row in rows}
+
+    def complete(self, worker, lease_id):
+        cursor = self._write("UPDATE leases SET status = ?, expires = NULL, updated = ? "
+                             "WHERE id = ? AND worker = ? AND status = ?",
+                             LEASE_DONE, time.time(), lease_id, worker, LEASE_LEASED)
+        return cursor.rowcount == 1
+
+    def release(self, worker, lease_id):
+        self._write("UPDATE leases SET status = ?, worker = NULL, expires = NULL, updated = ? "
+                    "WHERE id = ? AND worker = ? AND status = ?",
+                    LEASE_QUEUED, time.time(), lease_id, worker, LEASE_LEASED)
+
+    def start_task(self, job_id, index, worker):
+        self._write("DELETE FROM frames WHERE job_id = ? AND idx = ?", job_id, index)
+        self._write("UPDATE tasks SET status = ?, worker = ?, error = NULL, frame_count = NULL, updated = ? "
+                    "WHERE job_id = ? AND idx = ?",
+                    TASK_RUNNING, worker, time.time(), job_id, index)
+
+    def record_frame(self, job_id, index, page, result, worker):
+        self._write("INSERT OR REPLACE INTO frames (job_id, idx, page, path, size, sha256, worker) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    job_id, index, page, result["path"], result["size"], result["sha256"], worker)
+
+    def finish_task(self, job_id, index, frame_count):
+        self._write("UPDATE tasks SET status = ?, frame_count = ?, updated = ? WHERE job_id = ? AND idx = ?",
+                    TASK_CAPTURED, frame_count, time.time(), job_id, index)
+
+    def fail_task(self, job_id, index, error):
+        self._write("UPDATE tasks SET status = ?, error = ?, updated = ? WHERE job_id = ? AND idx = ?",
+                    TASK_FAILED, str(error)[:200], time.time(), job_id, index)
+
+    def job_view(self, job_id):
+        conn = self._connection()
+        job = conn.execute("SELECT options, created FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        now = time.time()
+        tasks = dict(conn.execute("SELECT status, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY status",
+                                  (job_id,)).fetchall())
+        leases = {}
+        for status, expires, attempts in conn.execute("SELECT status, expires, attempts FROM leases WHERE job_id = ?",
+                                                      (job_id,)):
+            # 已过期但还没被重新领取的租约也算作排队中
+            if status == LEASE_LEASED and expires is not None and expires < now:
+                status = LEASE_QUEUED
+            leases[status] = leases.get(status, 0) + 1
+        requeued = conn.execute("SELECT COUNT(*) FROM leases WHERE job_id = ? AND attempts > 1",
+                                (job_id,)).fetchone()[0]
+        workers = {}
+        for worker, status, count in conn.execute(
+                "SELECT worker, status, COUNT(*) FROM tasks WHERE job_id = ? AND worker IS NOT NULL "
+                "GROUP BY worker, status", (job_id,)):
+            workers.setdefault(worker, {})[status] = count
+        frames, frame_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM frames WHERE job_id = ?",
+                                           (job_id,)).fetchone()
+        total = sum(tasks.values())
+        finished = tasks.get(TASK_CAPTURED, 0) + tasks.get(TASK_FAILED, 0)
+        return {
+            "id": job_id,
+            "options": json.loads(job[0]),
+            "created_at": job[1],
+            "total": total,
+            "tasks": tasks,
+            "leases": leases,
+            "requeued_leases": requeued,
+            "workers": workers,
+            "frames": frames,
+            "frame_bytes": frame_bytes,
+            "progress": round(finished * 100 / total) if total else 100,
+        }
+
+
+def _sqlite_backend(address):
+    return SQLiteQueueBackend(address)
+
+
+# scheme -> 根据地址创建后端的函数
+BACKENDS = {"sqlite": _sqlite_backend}
+
+
+def open_backend(url=DEFAULT_QUEUE):
+    """按 scheme://地址 打开队列后端，没有 scheme 时视为 SQLite 文件路径"""
+    scheme, sep, address = url.partition("://")
+    if not sep:
+        scheme, address = "sqlite", url
+    if scheme not in BACKENDS:
+        raise ValueError(f"不支持的队列后端: {scheme}（可选: {', '.join(BACKENDS)}）")
+    if scheme == "sqlite" and sep and address.startswith("/"):
+        address = address[1:]  # sqlite:///相对路径，sqlite:////绝对路径
+    return BACKENDS[scheme](address)
+
+
+class LeaseReporter:
+    """把 process_single_url 的清单调用写回队列后端
+
+    实现 RunManifest 中 process_single_url 用到的方法，所以处理逻辑不需要知道
+    自己运行在分布式模式下。截图在后处理完成后才记录，所以在 record_frame
+    回调之前笔记可能已经结束。
+    """
+
+    def __init__(self, backend, job_id, worker):
+        self.backend = backend
+        self.job_id = job_id
+        self.worker = worker
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def start_note(self, key, url, index):
+        with self._lock:
+            self._indexes[key] = index
+        self.backend.start_task(self.job_id, index, self.worker)
+
+    def _index(self, key):
+        with self._lock:
+            return self._indexes.get(key)
+
+    def record_frame(self, key, page, result):
+        index = self._index(key)
+        if index is not None:
+            self.backend.record_frame(self.job_id, index, page, result, self.worker)
+
+    def finish_note(self, key, frame_count):
+        index = self._index(key)
+        if index is not None:
+            self.backend.finish_task(self.job_id, index, frame_count)
+
+    def fail_note(self, key, error):
+        index = self._index(key)
+        if index is not None:
+            self.backend.fail_task(self.job_id, index, error)
+
+
+class Heartbeat:
+    """后台线程定期延长本工作端持有的租约，记录已经失去的租约"""
+
+    def __init__(self, backend, lease_seconds=LEASE_SECONDS):
+        self.backend = backend
+        self.lease_seconds = lease_seconds
+        self._held = {}   # 租约 ID -> 工作端名称
+        self._lost = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def hold(self, worker, lease_id):
+        with self._lock:
+            self._held[lease_id] = worker
+
+    def drop(self, lease_id):
+        with self._lock:
+            self._held.pop(lease_id, None)
+            self._lost.discard(lease_id)
+
+    def lost(self, lease_id):
+        """租约是否已被其他工作端接管"""
+        with self._lock:
+            return lease_id in self._lost
+
+    def beat(self):
+        with self._lock:
+            held = dict(self._held)
+        by_worker = {}
+        for lease_id, worker in held.items():
+            by_worker.setdefault(worker, []).append(lease_id)
+        for worker, lease_ids in by_worker.items():
+            try:
+                owned = self.backend.heartbeat(worker, lease_ids, self.lease_seconds)
+            except Exception as e:
+                print(f"发送心跳失败: {str(e)}")
+                continue
+            with self._lock:
+                self._lost.update(set(lease_ids) - owned)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.beat()
+
+    def stop(self):
+        self._stop.set()
+
+
+def run_worker(backend, workers=1, job_id=None, lease_seconds=LEASE_SECONDS, exit_when_idle=True,
+               processes=None, page_load_strategy=None, capture=None, block_profile=None):
+    """在本机启动 workers 个浏览器，从队列后端领取租约并处理
+
+    exit_when_idle 为真时队列中没有可领取的租约就退出，否则一直等待新任务。
+    每个任务的 max_pages、output_format、quality 取自协调端提交时的参数；
+    浏览器的页面加载策略、截图方式和请求拦截规则是工作端本机的设置，默认与命令行版本相同。
+    浏览器崩溃时放弃当前租约（由其他浏览器重新领取剩余的 URL），并为下一个租约启动新的浏览器。
+    """
+    # 导入浏览器相关模块较慢，只在工作端需要
+    from PIL import Image
+    from main import setup_browser, load_saved_cookies, process_single_url, MAX_CAROUSEL_PAGES
+    from encoders import create_encoder
+    from postprocess import FramePipeline
+    from readiness import DEFAULT_PAGE_LOAD_STRATEGY
+    from throttle import AdaptiveThrottle
+    from retry import driver_alive
+    from blocking import DEFAULT_BLOCK_PROFILE, get_block_profile
+    from capture import FrameCapture
+
+    capture = capture or FrameCapture()
+    if block_profile is None:
+        block_profile = get_block_profile(DEFAULT_BLOCK_PROFILE)
+
+    host = f"{socket.gethostname()}-{os.getpid()}"
+    cookies = load_saved_cookies()
+    if not cookies:
+        print("警告：没有找到保存的登录状态（chrome_user_data/cookies.json），页面可能要求登录")
+
+    top_img = Image.open("src/top.jpg")
+    bottom_img = Image.open("src/bottom.jpg")
+    back_icon = Image.open("src/back.png")
+    for img in (top_img, bottom_img, back_icon):
+        img.load()
+
+    heartbeat = Heartbeat(backend, lease_seconds)
+    # 本机的浏览器共用一个访问节奏
+    throttle = AdaptiveThrottle(max_concurrency=workers)
+    pipelines = {}
+    pipelines_lock = threading.Lock()
+
+    def pipeline_for(options):
+        """每种输出格式共用一个后处理流水线"""
+        key = (options.get('output_format') or 'png', options.get('quality'))
+        with pipelines_lock:
+            if key not in pipelines:
+                pipelines[key] = FramePipeline(processes=processes, encoder=create_encoder(*key))
+            return pipelines[key]
+
+    def worker_loop(worker_index):
+        worker = f"{host}-{worker_index}"
+        driver = None
+        is_first = True
+        try:
+            while True:
+                lease = backend.claim(worker, lease_seconds, job_id)
+                if lease is None:
+                    if exit_when_idle:
+                        return
+                    time.sleep(IDLE_POLL_SECONDS)
+                    continue
+                heartbeat.hold(worker, lease.id)
+                print(f"[{worker}] 领取租约 {lease.id}（任务 {lease.job_id}，{len(lease.tasks)} 个URL，"
+                      f"第 {lease.attempts} 次）")
+                reporter = LeaseReporter(backend, lease.job_id, worker)
+                try:
+                    if driver is None:
+                        driver = setup_browser(cookies=cookies, capture=capture, block_profile=block_profile,
+                                               page_load_strategy=page_load_strategy or DEFAULT_PAGE_LOAD_STRATEGY)
+                        is_first = True
+                    pipeline = pipeline_for(lease.options)
+                    for index, url in lease.tasks:
+                        if heartbeat.lost(lease.id):
+                            print(f"[{worker}] 租约 {lease.id} 已过期并被重新分配，停止处理")
+                            break
+                        success = process_single_url(driver, url, index, top_img, bottom_img, back_icon,
+                                                     check_guides=is_first, pipeline=pipeline, manifest=reporter,
+                                                     max_pages=lease.options.get('max_pages', MAX_CAROUSEL_PAGES),
+                                                     output_prefix=f"{lease.job_id}_", capture=capture,
+                                                     throttle=throttle)
+                        is_first = False
+                        if not success and not driver_alive(driver):
+                            # 继续使用崩溃的浏览器只会让租约中剩余的 URL 全部失败
+                            print(f"[{worker}] 浏览器已不可用，放弃租约 {lease.id}，重新启动浏览器")
+                            try:
+                                driver.quit()
+                            except Exception:
+                                pass
+                            driver = None
+                            pipeline.wait()
+                            backend.release(worker, lease.id)
+                            break
+                    else:
+                        # 截图全部写回后端后才完成租约，工作端在此之前退出时租约会被重新领取
+                        pipeline.wait()
+                        backend.complete(worker, lease.id)
+                except Exception:
+                    backend.release(worker, lease.id)
+                    raise
+                finally:
+                    heartbeat.drop(lease.id)
+        except Exception as e:
+            print(f"[{worker}] 工作端出错: {str(e)}")
+        finally:
+            if driver is not None:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+    threads = [threading.Thread(target=worker_loop, args=(i,), daemon=True) for i in range(max(1, workers))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        heartbeat.stop()
+        for pipeline in pipelines.values():
+            pipeline.close()
+        for img in (top_img, bottom_img, back_icon):
+            img.close()
+
+
+def format_view(view):
+    """任务视图的文字摘要"""
+    lines = [
+        f"任务 {view['id']}：{view['progress']}%（{view['total']} 个URL）",
+        "URL: " + "，".join(f"{status} {count}" for status, count in sorted(view['tasks'].items())),
+        "租约: " + "，".join(f"{status} {count}" for status, count in sorted(view['leases'].items()))
+        + f"（重新分配过 {view['requeued_leases']} 个）",
+        f"截图: {view['frames']} 张，{view['frame_bytes'] / 1024 / 1024:.1f} MB",
+    ]
+    for worker, counts in sorted(view['workers'].items()):
+        lines.append(f"  {worker}: " + "，".join(f"{status} {count}" for status, count in sorted(counts.items())))
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="小红书截图分布式协调端/工作端")
+    parser.add_argument('--queue', default=DEFAULT_QUEUE, help=f"队列后端地址（默认 {DEFAULT_QUEUE}）")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="提交 URL 列表，拆分成租约")
+    submit.add_argument('url_file', nargs='?', default='url.txt', help="URL 文件，- 表示标准输入（默认 url.txt）")
+    submit.add_argument('--lease-size', type=int, default=LEASE_SIZE, help=f"每个租约的 URL 数（默认 {LEASE_SIZE}）")
+    submit.add_argument('--max-pages', type=int, default=None, help="每个笔记最多截取的轮播页数")
+    submit.add_argument('--format', default=None, help="输出图片格式")
+    submit.add_argument('--quality', type=int, default=None, help="JPEG/WebP 图片质量")
+
+    worker = commands.add_parser('worker', help="领取并处理租约")
+    worker.add_argument('-w', '--workers', type=int, default=1, help="本机并行的浏览器数量（默认 1）")
+    worker.add_argument('-p', '--processes', type=int, default=None, help="图片后处理进程数")
+    worker.add_argument('--job', default=None, help="只处理指定任务")
+    worker.add_argument('--lease-seconds', type=int, default=LEASE_SECONDS,
+                        help=f"租约有效期（秒，默认 {LEASE_SECONDS}）")
+    worker.add_argument('--wait', action='store_true', help="队列为空时继续等待新任务，而不是退出")
+    worker.add_argument('--page-load-strategy', default=None, help="Chrome 页面加载策略（normal/eager/none）")
+    worker.add_argument('--capture', default=None, help="截图方式（native/scaled）")
+    worker.add_argument('--block-profile', default=None,
+                        help="请求拦截规则（见 src/block_profiles.json，off 表示不拦截，默认 default）")
+
+    status = commands.add_parser('status', help="查看任务的合并视图")
+    status.add_argument('job_id', help="任务 ID")
+    status.add_argument('--json', action='store_true', help="以 JSON 输出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        backend = open_backend(args.queue)
+    except ValueError as e:
+        print(f"参数错误: {str(e)}")
+        return 1
+
+    if args.command == 'submit':
+        from encoders import create_encoder
+        from ingest import UrlIngestor
+        from main import read_urls
+        ingestor = UrlIngestor()
+        # 提交时要把所有URL拆成租约写入队列，所以在这里读完
+        urls = list(read_urls(args.url_file, ingestor))
+        if not urls:
+            print("URL文件为空或不存在")
+            return 1
+        print(ingestor.summary())
+        options = {}
+        if args.max_pages is not None:
+            options['max_pages'] = max(1, args.max_pages)
+        if args.format is not None or args.quality is not None:
+            try:
+                create_encoder(args.format or 'png', args.quality)
+            except ValueError as e:
+                print(f"参数错误: {str(e)}")
+                return 1
+            options['output_format'] = args.format or 'png'
+            options['quality'] = args.quality
+        job_id = backend.create_job(urls, options, args.lease_size)
+        print(f"已提交任务 {job_id}：{len(urls)} 个URL，每个租约 {args.lease_size} 个")
+        return 0
+
+    if args.command == 'worker':
+        from blocking import DEFAULT_BLOCK_PROFILE, get_block_profile
+        from capture import DEFAULT_CAPTURE_MODE, FrameCapture
+        from readiness import PAGE_LOAD_STRATEGIES, DEFAULT_PAGE_LOAD_STRATEGY
+        from worker_pool import normalize_worker_count
+        page_load_strategy = args.page_load_strategy or DEFAULT_PAGE_LOAD_STRATEGY
+        try:
+            if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+                raise ValueError(f"不支持的页面加载策略: {page_load_strategy}")
+            capture = FrameCapture(args.capture or DEFAULT_CAPTURE_MODE)
+            block_profile = get_block_profile(args.block_profile or DEFAULT_BLOCK_PROFILE)
+        except ValueError as e:
+            print(f"参数错误: {str(e)}")
+            return 1
+        run_worker(backend, normalize_worker_count(args.workers), job_id=args.job,
+                   lease_seconds=max(10, args.lease_seconds), exit_when_idle=not args.wait,
+                   processes=args.processes, page_load_strategy=page_load_strategy, capture=capture,
+                   block_profile=block_profile)
+        return 0
+
+    view = backend.job_view(args.job_id)
+    if view is None:
+        print(f"任务不存在: {args.job_id}")
+        return 1
+    if args.json:
+        print(json.dumps(view, ensure_ascii=False, indent=2))
+    else:
+        print(format_view(view))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""输出图片编码器：每种格式的扩展名、MIME 类型和 Pillow 保存参数
+
+默认参数来自 tool/benchmark.py 对 1179 × 2556 合成图的测量：
+PNG 的 compress_level 从 Pillow 默认的 6 降到 1，编码快 1.5~3.5 倍，文件只大 0~10%；
+JPEG 92（4:4:4 采样）每帧约 20 ms；有损 WebP 文件最小但编码较慢。
+默认仍输出无损 PNG，与之前的输出完全一致，只是编码更快。
+"""
+
+# 可选的输出格式
+OUTPUT_FORMATS = ("png", "jpeg", "webp", "webp-lossless")
+DEFAULT_OUTPUT_FORMAT = "png"
+# 所有格式可能产生的扩展名，截图列表按这些扩展名识别输出文件
+OUTPUT_EXTENSIONS = (".png", ".jpg", ".webp")
+
+PNG_COMPRESS_LEVEL = 1
+JPEG_QUALITY = 92
+WEBP_QUALITY = 85
+
+
+class OutputEncoder:
+    """一种输出格式及其保存参数，可以传给后处理进程"""
+
+    def __init__(self, name, format, extension, mimetype, **options):
+        self.name = name
+        self.format = format
+        self.extension = extension
+        self.mimetype = mimetype
+        self.options = options
+
+    def save(self, image, fp):
+        """把图片编码保存到文件路径或文件对象"""
+        image.save(fp, self.format, **self.options)
+
+    def describe(self):
+        options = ", ".join(f"{key}={value}" for key, value in self.options.items())
+        return f"{self.name} ({options})"
+
+
+def create_encoder(name=DEFAULT_OUTPUT_FORMAT, quality=None, compress_level=None):
+    """按格式名创建编码器，quality 用于 JPEG/WebP，compress_level 用于 PNG
+
+    格式名不支持或参数超出范围时抛出 ValueError。
+    """
+    if name == "png":
+        level = PNG_COMPRESS_LEVEL if compress_level is None else int(compress_level)
+        if not 0 <= level <= 9:
+            raise ValueError(f"PNG 压缩级别应在 0~9 之间: {level}")
+        # optimize 会让 Pillow 反复尝试压缩参数，速度慢很多，始终关闭
+        return OutputEncoder(name, "PNG", ".png", "image/png", compress_level=level, optimize=False)
+
+    if name in ("jpeg", "webp"):
+        default = JPEG_QUALITY if name == "jpeg" else WEBP_QUALITY
+        quality = default if quality is None else int(quality)
+        if not 1 <= quality <= 100:
+            raise ValueError(f"图片质量应在 1~100 之间: {quality}")
+        if name == "jpeg":
+            # 4:4:4 采样保证文字边缘清晰
+            return OutputEncoder(name, "JPEG", ".jpg", "image/jpeg", quality=quality, subsampling=0, optimize=False)
+        return OutputEncoder(name, "WEBP", ".webp", "image/webp", quality=quality, method=2)
+
+    if name == "webp-lossless":
+        # 无损模式下 quality 表示压缩力度，0 最快
+        return OutputEncoder(name, "WEBP", ".webp", "image/webp", lossless=True, quality=0, method=0)
+
+    raise ValueError(f"不支持的输出格式: {name}")
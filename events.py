@@ -0,0 +1,209 @@
+"""事件流：带序号的服务端事件日志，供 SSE 推送给所有连接的客户端
+
+每个事件有递增的序号，客户端按自己的游标读取，互不影响；
+断线重连时带上最后收到的序号（Last-Event-ID）即可补齐错过的事件。
+服务端只保留最近的一部分事件，更早的事件会被丢弃并计数。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+# 事件类型
+EVENT_LOG = "log"            # 普通日志行
+EVENT_PROGRESS = "progress"  # 进度百分比
+EVENT_STATUS = "status"      # 状态文字
+EVENT_FRAME = "frame"        # 截图已保存
+EVENT_JOB = "job"            # 任务状态变化
+
+# 环形缓冲区默认保留的事件数和估算内存上限
+MAX_EVENTS = 10000
+MAX_EVENT_BYTES = 8 * 1024 * 1024
+# 覆盖上面两个上限的环境变量（条数、MB）
+MAX_EVENTS_ENV = "XHS_EVENT_MAX_EVENTS"
+MAX_EVENT_MB_ENV = "XHS_EVENT_MAX_MB"
+# 每个事件除数据外的固定开销估算（元组、字典等）
+EVENT_OVERHEAD = 200
+
+PROGRESS_PREFIX = "progress:"
+STATUS_PREFIX = "状态更新: "
+
+
+def _env_number(environ, name, convert, default):
+    """读取正数环境变量，未设置时返回默认值，无效时提示并返回默认值"""
+    value = environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        number = convert(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        print(f"⚠️ 环境变量 {name}={value} 无效，使用默认值 {default:g}")
+        return default
+    return number
+
+
+class EventHub:
+    """事件日志，支持按游标阻塞读取
+
+    事件保存在有界的环形缓冲区里：超过 max_events 条或估算大小超过 max_bytes
+    时丢弃最早的事件，并累计丢弃数量。长时间运行的批量任务即使没有客户端读取，
+    占用的内存也不会无限增长。
+    """
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """按环境变量 XHS_EVENT_MAX_EVENTS 和 XHS_EVENT_MAX_MB 设置缓冲区上限，未设置或无效时使用默认值"""
+        environ = os.environ if environ is None else environ
+        max_events = _env_number(environ, MAX_EVENTS_ENV, int, MAX_EVENTS)
+        max_mb = _env_number(environ, MAX_EVENT_MB_ENV, float, MAX_EVENT_BYTES / (1024 * 1024))
+        return cls(max_events=max_events, max_bytes=int(max_mb * 1024 * 1024))
+
+    def __init__(self, max_events=MAX_EVENTS, max_bytes=MAX_EVENT_BYTES):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.dropped_events = 0
+        self.dropped_bytes = 0
+        self._events = deque()  # (序号, 类型, 数据, 时间)
+        self._sizes = deque()   # 每个事件的估算大小
+        self._bytes = 0
+        self._next_seq = 1
+        self._condition = threading.Condition()
+
+    @property
+    def last_seq(self):
+        with self._condition:
+            return self._next_seq - 1
+
+    @property
+    def first_seq(self):
+        """缓冲区中最早事件的序号，没有事件时为下一个序号"""
+        with self._condition:
+            return self._events[0][0] if self._events else self._next_seq
+
+    def publish(self, kind, data):
+        """发布事件，返回事件序号"""
+        size = _estimate_size(data)
+        with self._condition:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._events.append((seq, kind, data, time.time()))
+            self._sizes.append(size)
+            self._bytes += size
+            while len(self._events) > self.max_events or (self._bytes > self.max_bytes and len(self._events) > 1):
+                self._events.popleft()
+                dropped = self._sizes.popleft()
+                self._bytes -= dropped
+                self.dropped_events += 1
+                self.dropped_bytes += dropped
+            self._condition.notify_all()
+        return seq
+
+    def _since(self, cursor):
+        """序号大于 cursor 的事件，调用方需持有锁"""
+        # 序号连续递增，读取方通常只落后几条，从尾部往前取
+        if not self._events or cursor >= self._events[-1][0]:
+            return []
+        count = min(len(self._events), self._events[-1][0] - cursor)
+        return list(islice(reversed(self._events), count))[::-1]
+
+    def missed(self, cursor):
+        """游标之后已经被丢弃、无法再读取的事件数"""
+        with self._condition:
+            first = self._events[0][0] if self._events else self._next_seq
+            return max(0, first - 1 - cursor)
+
+    def read_since(self, cursor=0, timeout=None, limit=None):
+        """读取序号大于 cursor 的事件，没有新事件时最多等待 timeout 秒
+
+        返回 (事件列表, 新游标)。已被丢弃的事件直接跳过。
+        """
+        with self._condition:
+            events = self._since(cursor)
+            if not events and timeout:
+                self._condition.wait_for(lambda: self._since(cursor), timeout)
+                events = self._since(cursor)
+            if limit is not None:
+                events = events[:limit]
+            next_cursor = events[-1][0] if events else max(cursor, 0)
+        return events, next_cursor
+
+    def tail_cursor(self, count):
+        """从最近 count 条事件开始读取时使用的游标"""
+        with self._condition:
+            first = self._events[0][0] if self._events else self._next_seq
+            return max(first - 1, self._next_seq - 1 - count)
+
+    def tail(self, count, kinds=None):
+        """最近 count 条事件（可以只取指定类型），返回 (按时间排列的事件, 游标)
+
+        游标为当前最后一个事件的序号，之后用 read_since 接着读取不会遗漏。
+        """
+        with self._condition:
+            events = reversed(self._events)
+            if kinds is not None:
+                events = (event for event in events if event[1] in kinds)
+            return list(islice(events, count))[::-1], self._next_seq - 1
+
+    def stats(self):
+        """缓冲区状态和丢弃计数"""
+        with self._condition:
+            return {
+                "events": len(self._events),
+                "bytes": self._bytes,
+                "max_events": self.max_events,
+                "max_bytes": self.max_bytes,
+                "dropped_events": self.dropped_events,
+                "dropped_bytes": self.dropped_bytes,
+                "first_seq": self._events[0][0] if self._events else self._next_seq,
+                "last_seq": self._next_seq - 1,
+            }
+
+
+def _estimate_size(data):
+    """估算事件占用的内存：按字符串长度粗略计算，不做序列化"""
+    if not isinstance(data, dict):
+        return EVENT_OVERHEAD + len(str(data))
+    size = EVENT_OVERHEAD
+    for key, value in data.items():
+        size += len(key) + (len(value) if isinstance(value, str) else 16)
+    return size
+
+
+def format_sse(seq, kind, data):
+    """格式化为一条 Server-Sent Event"""
+    return f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class OutputQueue:
+    """兼容原来 output_queue.put(text) 用法的适配器
+
+    按文本前缀把消息分类成进度、状态或普通日志事件。
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def put(self, text):
+        if text.startswith(PROGRESS_PREFIX):
+            try:
+                return self.hub.publish(EVENT_PROGRESS, {"value": int(text[len(PROGRESS_PREFIX):])})
+            except ValueError:
+                pass
+        if text.startswith(STATUS_PREFIX):
+            return self.hub.publish(EVENT_STATUS, {"text": text[len(STATUS_PREFIX):]})
+        return self.hub.publish(EVENT_LOG, {"text": text})
+
+
+def event_text(kind, data):
+    """把事件还原成旧接口 /get_output 使用的文本行"""
+    if kind == EVENT_PROGRESS:
+        return f"{PROGRESS_PREFIX}{data['value']}"
+    if kind == EVENT_STATUS:
+        return f"{STATUS_PREFIX}{data['text']}"
+    if kind == EVENT_LOG:
+        return data["text"]
+    return None
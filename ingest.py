@@ -0,0 +1,127 @@
+"""URL 读取：逐行读取链接，规范化笔记链接，去掉重复的笔记
+
+url.txt、标准输入和网页中粘贴的文本都按行逐个读取，不会一次读入整个文件。
+每行取第一个 http(s) 链接（分享文案中夹带的链接也能识别），没有链接时整行作为链接。
+能解析出笔记 ID 的链接统一改写成 https://www.xiaohongshu.com/explore/<ID>，
+只保留访问笔记需要的 xsec_token 和 xsec_source 参数。
+
+同一个笔记只访问一次：已经出现过的笔记 ID 记在集合中（24 位十六进制 ID 按整数保存）。
+同一个笔记的多个链接常常只有 xsec_token 不同，较早的 token 可能已经失效，所以
+最近 lookahead 个笔记在交给浏览器之前先留在缓冲区里，期间再次出现时改用新链接中的 token。
+"""
+import io
+import os
+import re
+import sys
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs, urlencode
+
+from manifest import parse_note_id, note_key
+from metrics import DUPLICATE_URLS_TOTAL
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"'，。！？、）】]+")
+NOTE_URL = "https://www.xiaohongshu.com/explore/{}"
+# 规范化后保留的查询参数
+KEEP_QUERY_PARAMS = ("xsec_token", "xsec_source")
+# 在交给浏览器之前缓冲的笔记数，None 表示全部读完再交出
+LOOKAHEAD = 1000
+
+
+def iter_lines(source):
+    """逐行读取：source 为文件路径、"-"（标准输入）或可迭代的文本行，文件不存在时不产生任何行"""
+    if source == "-":
+        yield from sys.stdin
+    elif isinstance(source, str):
+        if not os.path.exists(source):
+            return
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from f
+    else:
+        yield from source
+
+
+def iter_text_lines(text):
+    """逐行读取一段文本，不复制出所有行的列表"""
+    return iter(io.StringIO(text))
+
+
+def extract_url(line):
+    """从一行文本中取出链接，空行返回 None"""
+    line = line.strip()
+    if not line:
+        return None
+    match = URL_PATTERN.search(line)
+    return match.group(0) if match else line
+
+
+def normalize_url(url):
+    """规范化链接，返回 (去重用的键, 链接)
+
+    笔记链接的键为笔记 ID，其余链接的键为去掉查询参数的地址，链接保持不变。
+    """
+    note_id = parse_note_id(url)
+    if not note_id:
+        return note_key(url), url
+    query = parse_qs(urlparse(url).query)
+    params = [(name, query[name][-1]) for name in KEEP_QUERY_PARAMS if query.get(name)]
+    normalized = NOTE_URL.format(note_id)
+    if params:
+        normalized += "?" + urlencode(params)
+    return note_id, normalized
+
+
+def _compact_key(key):
+    """笔记 ID 按整数保存，比字符串省内存"""
+    try:
+        return int(key, 16) if len(key) == 24 else key
+    except ValueError:
+        return key
+
+
+class UrlIngestor:
+    """按笔记去重的链接读取器
+
+    ingest(lines) 逐行读取并按首次出现的顺序产生规范化后的链接；读取过程中统计
+    行数、链接数、重复的笔记数（也就是省下的浏览器访问次数）和更新了 token 的笔记数。
+    """
+
+    def __init__(self, lookahead=LOOKAHEAD):
+        self.lookahead = lookahead
+        self.lines = 0
+        self.urls = 0
+        self.duplicates = 0
+        self.token_updates = 0
+        self._seen = set()
+
+    def ingest(self, lines):
+        buffer = OrderedDict()  # 键 -> 还没交出的链接
+        for line in lines:
+            self.lines += 1
+            url = extract_url(line)
+            if url is None:
+                continue
+            self.urls += 1
+            key, url = normalize_url(url)
+            compact = _compact_key(key)
+            if compact in self._seen:
+                self.duplicates += 1
+                DUPLICATE_URLS_TOTAL.inc()
+                if key in buffer and buffer[key] != url:
+                    buffer[key] = url
+                    self.token_updates += 1
+                continue
+            self._seen.add(compact)
+            buffer[key] = url
+            if self.lookahead is not None and len(buffer) > self.lookahead:
+                yield buffer.popitem(last=False)[1]
+        while buffer:
+            yield buffer.popitem(last=False)[1]
+
+    def summary(self):
+        """读取结果的一行摘要"""
+        text = f"读取 {self.urls} 个链接，{self.urls - self.duplicates} 个不同的笔记"
+        if self.duplicates:
+            text += f"，去掉 {self.duplicates} 个重复链接（省下 {self.duplicates} 次浏览器访问）"
+        if self.token_updates:
+            text += f"，{self.token_updates} 个笔记改用较新的 xsec_token"
+        return text
@@ -0,0 +1,186 @@
+"""任务事件日志：带级别、任务 ID、URL 序号和时间戳的结构化日志
+
+线程通过 bind() 绑定到某个任务的 JobLogger，之后该线程里的日志（包括 print
+输出）只进入这个任务的日志；没有绑定的线程（例如 Flask 请求线程）的 print
+仍然输出到控制台。绑定保存在线程局部变量里，worker 线程和后处理回调通过
+current_binding()/restore() 继承提交它们的线程的绑定。
+
+每条日志以一行 JSON 追加到任务输出旁边的日志文件，并推送到事件流。
+低于日志级别的调用在格式化之前就返回。
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from events import EVENT_LOG, EVENT_PROGRESS, EVENT_STATUS
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+_local = threading.local()
+
+
+class JobLogger:
+    """一个任务的结构化日志
+
+    path 为 JSONL 日志文件路径，hub 为 EventHub，echo 为同时输出文本的流
+    （命令行模式下为控制台）；三者都可以为空。
+    """
+
+    def __init__(self, job_id=None, path=None, hub=None, level=INFO, echo=None):
+        self.job_id = job_id
+        self.path = path
+        self.hub = hub
+        self.level = level
+        self.echo = echo
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+
+    def log(self, level, msg, *args, **fields):
+        """记录一条日志，msg 中的 % 占位符只在需要输出时才格式化"""
+        if level < self.level or (self._file is None and self.hub is None and self.echo is None):
+            return
+        record = self._record(level)
+        binding = current_binding()
+        if binding is not None and binding[0] is self:
+            record.update(binding[1])
+        record.update(fields)
+        record["text"] = msg % args if args else msg
+        self._write(record)
+        if self.hub is not None:
+            self.hub.publish(EVENT_LOG, record)
+        if self.echo is not None:
+            self.echo.write(record["text"] + "\n")
+
+    def _record(self, level):
+        record = {"ts": round(time.time(), 3), "level": LEVEL_NAMES.get(level, str(level))}
+        if self.job_id:
+            record["job"] = self.job_id
+        return record
+
+    def debug(self, msg, *args, **fields):
+        self.log(DEBUG, msg, *args, **fields)
+
+    def info(self, msg, *args, **fields):
+        self.log(INFO, msg, *args, **fields)
+
+    def warning(self, msg, *args, **fields):
+        self.log(WARNING, msg, *args, **fields)
+
+    def error(self, msg, *args, **fields):
+        self.log(ERROR, msg, *args, **fields)
+
+    def status(self, text):
+        """状态文字：写入日志并推送 status 事件"""
+        record = dict(self._record(INFO), status=text)
+        self._write(record)
+        if self.hub is not None:
+            self.hub.publish(EVENT_STATUS, dict(record, text=text))
+
+    def progress(self, value):
+        """进度百分比：只推送 progress 事件"""
+        if self.hub is not None:
+            self.hub.publish(EVENT_PROGRESS, dict(self._record(INFO), value=value))
+
+    def _write(self, record):
+        if self._file is None:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                if record.get("level") == "error":
+                    self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def current_binding():
+    """当前线程绑定的 (JobLogger, 上下文字段)，没有绑定时返回 None"""
+    return getattr(_local, "binding", None)
+
+
+@contextmanager
+def restore(binding):
+    """在当前线程恢复另一个线程的绑定，binding 为 current_binding() 的返回值"""
+    previous = current_binding()
+    _local.binding = binding
+    try:
+        yield
+    finally:
+        _local.binding = previous
+
+
+@contextmanager
+def bind(logger, **context):
+    """把当前线程绑定到 logger，context 中的字段（如 url_index）会加到每条日志里"""
+    with restore((logger, context)):
+        yield logger
+
+
+@contextmanager
+def context(**fields):
+    """在已有绑定上追加上下文字段；线程没有绑定时什么也不做"""
+    binding = current_binding()
+    if binding is None:
+        yield
+        return
+    with restore((binding[0], dict(binding[1], **fields))):
+        yield
+
+
+def log(level, msg, *args, **fields):
+    """写入当前线程绑定的任务日志；没有绑定时（命令行模式）直接 print"""
+    binding = current_binding()
+    if binding is None:
+        if level >= INFO:
+            print(msg % args if args else msg)
+        return
+    binding[0].log(level, msg, *args, **fields)
+
+
+class StdoutRouter:
+    """替换 sys.stdout：已绑定任务的线程写入任务日志，其余线程写入原来的输出"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        binding = current_binding()
+        if binding is None:
+            return self.stream.write(text)
+        # print 会分多次写入内容和换行，按行拼接后再记录
+        pending = getattr(_local, "partial", "") + text
+        *lines, _local.partial = pending.split("\n")
+        for line in lines:
+            if line.strip():
+                binding[0].log(INFO, line)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def install_stdout_router():
+    """安装 StdoutRouter，重复调用不会重复安装；返回原来的输出流"""
+    if not isinstance(sys.stdout, StdoutRouter):
+        sys.stdout = StdoutRouter(sys.stdout)
+    return sys.stdout.stream
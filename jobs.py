@@ -0,0 +1,244 @@
+"""截图任务队列：任务 ID、有界 FIFO 队列、任务和 URL 级别的状态以及单独取消"""
+import threading
+import time
+import uuid
+from queue import Queue, Empty
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# URL 状态
+URL_PENDING = "pending"
+URL_RUNNING = "running"
+URL_DONE = "done"
+URL_FAILED = "failed"
+URL_SKIPPED = "skipped"
+URL_CANCELLED = "cancelled"
+
+# 最多排队的任务数量
+MAX_QUEUED_JOBS = 20
+# 保留在内存中的已结束任务数量
+MAX_FINISHED_JOBS = 50
+
+
+def new_job_id():
+    """生成按时间排序的任务 ID，同时用作输出文件名前缀"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+
+
+class Job:
+    """一个截图任务"""
+
+    def __init__(self, urls, options=None):
+        self.id = new_job_id()
+        self.urls = urls
+        self.options = options or {}
+        self.status = JOB_QUEUED
+        self.message = ""
+        self.url_status = [URL_PENDING] * len(urls)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.drivers = []  # 任务正在使用的浏览器，取消时一并关闭
+        self._lock = threading.Lock()
+
+    @property
+    def output_prefix(self):
+        """任务输出文件名前缀，避免不同任务的截图互相覆盖"""
+        return f"{self.id}_"
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def set_url_status(self, index, status):
+        """更新第 index 个 URL（从 1 开始）的状态"""
+        with self._lock:
+            self.url_status[index - 1] = status
+
+    def add_driver(self, driver):
+        with self._lock:
+            self.drivers.append(driver)
+
+    def remove_driver(self, driver):
+        with self._lock:
+            if driver in self.drivers:
+                self.drivers.remove(driver)
+
+    def cancel(self):
+        """取消任务：设置取消标志并关闭任务使用的浏览器"""
+        self.cancel_event.set()
+        with self._lock:
+            drivers = list(self.drivers)
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"关闭浏览器时出错: {str(e)}")
+
+    def finish(self, status, message=""):
+        """任务结束，把还没处理的 URL 标记为已取消"""
+        with self._lock:
+            self.status = status
+            self.message = message
+            self.finished_at = time.time()
+            self.url_status = [
+                URL_CANCELLED if state in (URL_PENDING, URL_RUNNING) else state
+                for state in self.url_status
+            ]
+            self.drivers = []
+
+    def counts(self):
+        """各状态的 URL 数量"""
+        with self._lock:
+            states = list(self.url_status)
+        counts = {}
+        for state in states:
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def summary(self):
+        """任务摘要（不含逐个 URL 的状态）"""
+        counts = self.counts()
+        total = len(self.urls)
+        finished = sum(counts.get(state, 0) for state in (URL_DONE, URL_FAILED, URL_SKIPPED))
+        return {
+            "id": self.id,
+            "status": self.status,
+            "message": self.message,
+            "total": total,
+            "counts": counts,
+            "progress": round(finished * 100 / total) if total else 100,
+            "options": self.options,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def detail(self, offset=0, limit=100):
+        """任务详情，包含分页的 URL 状态"""
+        with self._lock:
+            states = self.url_status[offset:offset + limit]
+        info = self.summary()
+        info["offset"] = offset
+        info["urls"] = [
+            {"index": offset + i + 1, "url": self.urls[offset + i], "status": state}
+            for i, state in enumerate(states)
+        ]
+        return info
+
+
+class JobManager:
+    """任务管理器
+
+    提交的任务进入有界 FIFO 队列，由 concurrency 个后台线程依次调用
+    runner(job) 执行。队列满时 submit 抛出 queue.Full，不会阻塞 HTTP 请求。
+    任务提交、开始和结束时调用 on_change(job)。
+    """
+
+    def __init__(self, runner, max_queued=MAX_QUEUED_JOBS, concurrency=1, on_change=None):
+        self.runner = runner
+        self.on_change = on_change
+        self.jobs = {}
+        self._order = []
+        self._queue = Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        for _ in range(concurrency):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, urls, options=None):
+        """提交任务，返回 Job；队列已满时抛出 queue.Full"""
+        job = Job(urls, options)
+        with self._lock:
+            self._queue.put_nowait(job)
+            self.jobs[job.id] = job
+            self._order.append(job.id)
+            self._prune()
+        self._notify(job)
+        return job
+
+    def _notify(self, job):
+        """通知任务状态变化"""
+        if self.on_change:
+            try:
+                self.on_change(job)
+            except Exception as e:
+                print(f"任务状态回调出错: {str(e)}")
+
+    def _prune(self):
+        """只保留最近的已结束任务，调用方需持有 _lock"""
+        finished = [job_id for job_id in self._order if self.jobs[job_id].status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self._order.remove(job_id)
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        """所有任务的摘要，按提交顺序排列"""
+        with self._lock:
+            jobs = [self.jobs[job_id] for job_id in self._order]
+        return [job.summary() for job in jobs]
+
+    def status_counts(self):
+        """各状态的任务数"""
+        with self._lock:
+            states = [job.status for job in self.jobs.values()]
+        counts = {}
+        for state in states:
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def active_jobs(self):
+        """排队中和运行中的任务"""
+        with self._lock:
+            return [job for job in self.jobs.values() if job.status not in FINISHED_STATES]
+
+    def cancel(self, job_id):
+        """取消单个任务，返回是否找到该任务"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        if job.status == JOB_QUEUED:
+            job.finish(JOB_CANCELLED, "任务已取消")
+            self._notify(job)
+        return True
+
+    def cancel_all(self):
+        """取消所有排队中和运行中的任务"""
+        for job in self.active_jobs():
+            self.cancel(job.id)
+
+    def _worker(self):
+        """后台线程：按 FIFO 顺序执行任务"""
+        while True:
+            try:
+                job = self._queue.get(timeout=1)
+            except Empty:
+                continue
+            if job.cancelled:
+                continue
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._notify(job)
+            try:
+                self.runner(job)
+                if job.cancelled:
+                    job.finish(JOB_CANCELLED, "任务已取消")
+                elif job.status == JOB_RUNNING:
+                    job.finish(JOB_DONE)
+            except Exception as e:
+                job.finish(JOB_CANCELLED if job.cancelled else JOB_FAILED, str(e))
+            finally:
+                with self._lock:
+                    self._prune()
+                self._notify(job)
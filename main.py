@@ -1,9 +1,7 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException
 from PIL import Image
 import os
 import time
@@ -13,78 +11,226 @@ import shutil
 from select import select
 from selenium.webdriver.common.action_chains import ActionChains
 import json
+import argparse
+from itertools import chain
+from worker_pool import run_worker_pool, normalize_worker_count
+from postprocess import FramePipeline, compose_screenshot
+from encoders import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, create_encoder
+from compositor import Compositor
+from blocking import (
+    DEFAULT_BLOCK_PROFILE, apply_block_profile, chrome_logging_options, drain_network_log, get_block_profile,
+    load_block_profiles
+)
+from overlays import default_overlays, dismiss_overlays, install_overlay_observer
+from capture import CAPTURE_MODES, CAPTURE_FORMATS, DEFAULT_CAPTURE_MODE, DEFAULT_CAPTURE_FORMAT, FrameCapture
+from manifest import RunManifest, note_key
+from ingest import UrlIngestor, iter_lines
+from throttle import AdaptiveThrottle, MAX_RATE
+from retry import RetryStore, check_note_page, classify_failure, driver_alive, run_with_retries
+from joblog import JobLogger, bind, install_stdout_router, log, INFO, ERROR
+from metrics import (
+    timed, record_page_saved, record_network, stage_summary, network_summary, failure_summary,
+    NOTES_TOTAL, BROWSERS_TOTAL, NOTE_FAILURES_TOTAL, NOTE_RETRIES_TOTAL,
+)
+from readiness import (
+    DEFAULT_PAGE_LOAD_STRATEGY, PAGE_LOAD_STRATEGIES, install_network_tracker,
+    wait_for_document, wait_for_page_ready, wait_for_slide_ready, wait_for_transition_end
+)
 
 # 添加用户数据目录的常量
 USER_DATA_DIR = "./chrome_user_data"
+COOKIE_FILE = os.path.join(USER_DATA_DIR, "cookies.json")
+# 恢复登录状态时没有域名的 cookie 归属的地址
+XHS_HOME_URL = "https://www.xiaohongshu.com"
 
-def read_urls(file_path='url.txt'):
-    """读取URL文件"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        urls = [line.strip() for line in f.readlines() if line.strip()]
-    return urls
+# 每个笔记最多截取的轮播页数
+MAX_CAROUSEL_PAGES = 20
 
-def setup_browser(use_previous_session=False, service=None):
-    """设置浏览器配置"""
+# 读取轮播页码指示器（如 "2/5"），没有指示器时返回 null
+CAROUSEL_POSITION_SCRIPT = """
+const fraction = document.querySelector('#noteContainer .fraction, .swiper-pagination-fraction, .fraction');
+if (fraction) {
+    const match = fraction.textContent.match(/(\\d+)\\s*\\/\\s*(\\d+)/);
+    if (match) return [parseInt(match[1]), parseInt(match[2])];
+}
+const bullets = document.querySelectorAll('#noteContainer .swiper-pagination-bullet, .pagination-item');
+if (bullets.length > 1) {
+    const active = Array.from(bullets).findIndex((el) => /active/.test(el.className));
+    return [active + 1, bullets.length];
+}
+return null;
+"""
+
+class ExtraPageStats:
+    """统计第二页及之后每一页的额外耗时（点击下一页到截图提交）"""
+    def __init__(self):
+        self.pages = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+    
+    def record(self, seconds):
+        with self.lock:
+            self.pages += 1
+            self.seconds += seconds
+    
+    def reset(self):
+        with self.lock:
+            self.pages = 0
+            self.seconds = 0.0
+    
+    def summary(self):
+        """返回统计摘要，没有额外页时返回 None"""
+        with self.lock:
+            if not self.pages:
+                return None
+            return f"共截取 {self.pages} 张额外轮播页，平均每页 {self.seconds / self.pages * 1000:.0f} ms"
+
+extra_page_stats = ExtraPageStats()
+
+def read_urls(file_path='url.txt', ingestor=None):
+    """读取URL文件（"-" 表示标准输入），逐行解析链接并按笔记 ID 去掉重复的链接
+
+    返回边读取边产生链接的迭代器；ingestor 为 UrlIngestor 时可以在读取后查看去重统计。
+    """
+    ingestor = ingestor or UrlIngestor()
+    return ingestor.ingest(iter_lines(file_path))
+
+def load_saved_cookies(cookie_file=COOKIE_FILE):
+    """读取已保存的cookies，不存在或读取失败时返回 None"""
+    if not os.path.exists(cookie_file):
+        return None
+    try:
+        with open(cookie_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"读取cookie文件失败: {str(e)}")
+        return None
+
+def cookie_params(cookies, now=None):
+    """把 WebDriver 格式的cookies转换成 Network.setCookies 的参数
+
+    返回 (参数列表, 已过期的数量)；已过期和格式不正确的cookie不注入。
+    """
+    now = time.time() if now is None else now
+    params = []
+    expired = 0
+    for cookie in cookies:
+        if 'name' not in cookie or 'value' not in cookie:
+            continue
+        if 'expiry' in cookie and cookie['expiry'] <= now:
+            expired += 1
+            continue
+        param = {'name': cookie['name'], 'value': cookie['value']}
+        for key in ('domain', 'path', 'secure', 'httpOnly', 'sameSite'):
+            if key in cookie:
+                param[key] = cookie[key]
+        if 'expiry' in cookie:
+            param['expires'] = cookie['expiry']
+        if 'domain' not in param:
+            param['url'] = XHS_HOME_URL
+        params.append(param)
+    return params, expired
+
+def restore_cookies(driver, cookies):
+    """把cookies注入到浏览器中
+
+    在第一次导航之前通过 DevTools 的 Network.setCookies 一次注入所有cookie，
+    不需要先打开首页、逐个添加再刷新；浏览器不支持时退回逐个添加。
+    返回成功注入的cookie数量。
+    """
+    print("正在恢复登录状态...")
+    start = time.perf_counter()
+    params, expired = cookie_params(cookies)
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+        restored = len(params)
+    except Exception as e:
+        print(f"批量注入cookie失败，改为逐个添加: {str(e)[:100]}")
+        restored = add_cookies_one_by_one(driver, cookies)
+    
+    print(f"已恢复 {restored}/{len(cookies)} 个cookie，耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+    if expired:
+        print(f"警告：{expired} 个cookie已过期，可能需要重新登录")
+    return restored
+
+def add_cookies_one_by_one(driver, cookies):
+    """旧的恢复方式：先打开首页，再逐个添加cookie并刷新页面"""
+    # 先访问网站，然后才能添加cookie
+    driver.get(XHS_HOME_URL)
+    wait_for_document(driver)  # 等待页面加载
+    
+    success_count = 0
+    for cookie in cookies:
+        try:
+            # 确保cookie格式正确
+            if 'name' in cookie and 'value' in cookie:
+                driver.add_cookie(cookie)
+                success_count += 1
+        except Exception as e:
+            print(f"添加cookie失败: {str(e)}")
+            continue
+    
+    # 刷新页面使cookie生效
+    driver.refresh()
+    
+    # 验证登录状态
+    wait_for_document(driver)
+    if "login" in driver.current_url.lower():
+        print("警告：cookie可能已失效，需要重新登录")
+    return success_count
+
+def setup_browser(use_previous_session=False, service=None, cookies=None,
+                  page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY, capture=None, overlay_observer=False,
+                  block_profile=None):
+    """设置浏览器配置
+
+    cookies 不为空时直接注入这些cookies（用于多个浏览器共享同一登录会话），
+    否则在 use_previous_session 为真时从 cookie 文件恢复。
+    page_load_strategy 为 normal/eager/none；eager 和 none 时 driver.get 不等待
+    所有资源加载完毕，由 readiness 模块按真实页面信号判断何时可以截图。
+    capture 为 FrameCapture，决定移动端模拟的设备像素比，默认按原生分辨率截图。
+    overlay_observer 为真时在每个页面注入 MutationObserver，弹窗出现时立即关闭。
+    block_profile 为 blocking 模块的规则集时拦截匹配的请求，并统计每个页面的网络请求。
+    """
     chrome_options = Options()
+    chrome_options.page_load_strategy = page_load_strategy
     
     # 设置为 1179×2490 的等比例缩小尺寸
-    target_width = 450
-    original_ratio = 2490 / 1179
-    target_height = int(target_width * original_ratio)
+    device_metrics = (capture or FrameCapture()).device_metrics()
+    target_width = device_metrics["width"]
+    target_height = device_metrics["height"]
     
     mobile_emulation = {
-        "deviceMetrics": {
-            "width": target_width,
-            "height": target_height,
-            "pixelRatio": 2.0,
-            "mobile": True
-        }
+        "deviceMetrics": device_metrics
     }
     chrome_options.add_experimental_option("mobileEmulation", mobile_emulation)
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    if block_profile is not None:
+        chrome_logging_options(chrome_options)
     
     # 创建浏览器实例，使用提供的 service
-    driver = webdriver.Chrome(service=service, options=chrome_options) if service else webdriver.Chrome(options=chrome_options)
-    driver.set_window_size(target_width, target_height)
+    with timed("browser_launch"):
+        driver = webdriver.Chrome(service=service, options=chrome_options) if service else webdriver.Chrome(options=chrome_options)
+        driver.set_window_size(target_width, target_height)
+        install_network_tracker(driver)
+        if overlay_observer:
+            install_overlay_observer(driver, default_overlays())
+        if block_profile is not None:
+            apply_block_profile(driver, block_profile)
+            # process_single_url 据此在每个笔记前后读取网络日志
+            driver.collect_network_stats = True
+    BROWSERS_TOTAL.inc()
     
     # 如果使用上次会话，加载cookies
-    if use_previous_session:
+    if cookies is None and use_previous_session:
+        cookies = load_saved_cookies()
+        if cookies is None:
+            print("未找到cookie文件")
+    
+    if cookies:
         try:
-            cookie_file = "./chrome_user_data/cookies.json"
-            if os.path.exists(cookie_file):
-                print("正在恢复登录状态...")
-                
-                # 先访问网站，然后才能添加cookie
-                driver.get("https://www.xiaohongshu.com")
-                time.sleep(1)  # 等待页面加载
-                
-                # 加载并添加cookies
-                with open(cookie_file, 'r', encoding='utf-8') as f:
-                    cookies = json.load(f)
-                
-                success_count = 0
-                for cookie in cookies:
-                    try:
-                        # 确保cookie格式正确
-                        if 'name' in cookie and 'value' in cookie:
-                            driver.add_cookie(cookie)
-                            success_count += 1
-                    except Exception as e:
-                        print(f"添加cookie失败: {str(e)}")
-                        continue
-                
-                # 刷新页面使cookie生效
-                driver.refresh()
-                print(f"已恢复 {success_count}/{len(cookies)} 个cookie")
-                
-                # 验证登录状态
-                time.sleep(1)
-                if "login" in driver.current_url.lower():
-                    print("警告：cookie可能已失效，需要重新登录")
-                else:
-                    print("登录状态恢复成功")
-            else:
-                print("未找到cookie文件")
+            with timed("cookie_restore"):
+                restore_cookies(driver, cookies)
         except Exception as e:
             print(f"加载cookie失败: {str(e)}")
     
@@ -102,11 +248,10 @@ def save_browser_session(driver):
             return False
         
         # 确保目录存在
-        os.makedirs("./chrome_user_data", exist_ok=True)
+        os.makedirs(USER_DATA_DIR, exist_ok=True)
         
         # 保存cookies到文件
-        cookie_file = "./chrome_user_data/cookies.json"
-        with open(cookie_file, 'w', encoding='utf-8') as f:
+        with open(COOKIE_FILE, 'w', encoding='utf-8') as f:
             json.dump(cookies, f, ensure_ascii=False, indent=2)
         
         print(f"成功保存了 {len(cookies)} 个cookie")
@@ -120,7 +265,10 @@ def ask_yes_no(question, default=True):
     """询问用户是否确认，带默认选项"""
     default_hint = "(Y/n)" if default else "(y/N)"
     while True:
-        response = input(f"{question} {default_hint}: ").lower().strip()
+        try:
+            response = input(f"{question} {default_hint}: ").lower().strip()
+        except EOFError:  # 标准输入已用于读取URL或已关闭
+            return default
         if not response:  # 如果用户直接按回车，使用默认值
             return default
         if response in ['y', 'yes']:
@@ -129,9 +277,12 @@ def ask_yes_no(question, default=True):
             return False
         print("请输入 y 或 n，或直接按回车使用默认选项")
 
-def wait_for_login(driver, timeout=60):
-    """等待用户登录"""
-    print(f"请在{timeout}秒内完成登录，或按Enter键继续...")
+def wait_for_login(driver, timeout=60, wait_enter=True):
+    """等待用户登录
+
+    wait_enter 为假时（标准输入用于读取URL）只等待超时，不读取Enter键。
+    """
+    print(f"请在{timeout}秒内完成登录" + ("，或按Enter键继续..." if wait_enter else "..."))
     print("正在打开小红书登录页面...")
     driver.get("https://www.xiaohongshu.com")
     
@@ -145,11 +296,12 @@ def wait_for_login(driver, timeout=60):
     # 创建输入检查线程
     input_thread = threading.Thread(target=check_input)
     input_thread.daemon = True
-    input_thread.start()
+    if wait_enter:
+        input_thread.start()
     
     # 等待直到超时或输入
     while True:
-        if not input_thread.is_alive():  # 如果用户按下Enter键
+        if wait_enter and not input_thread.is_alive():  # 如果用户按下Enter键
             print("检测到Enter键，继续执行...")
             break
         if time.time() - start_time > timeout:  # 如果超时
@@ -157,6 +309,16 @@ def wait_for_login(driver, timeout=60):
             break
         time.sleep(0.1)
 
+def read_carousel_position(driver):
+    """读取轮播图当前页和总页数，返回 (当前页, 总页数)，读取失败返回 None"""
+    try:
+        position = driver.execute_script(CAROUSEL_POSITION_SCRIPT)
+    except Exception:
+        return None
+    if not position or position[1] < 1:
+        return None
+    return position[0], position[1]
+
 def check_and_click_next_button(driver):
     """检查并点击下一页按钮"""
     try:
@@ -169,7 +331,6 @@ def check_and_click_next_button(driver):
             
             # 先滚动到按钮位置
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
-            time.sleep(0.1)
             
             # 获取按钮的位置和大小
             location = button.location
@@ -182,7 +343,6 @@ def check_and_click_next_button(driver):
             # 模拟鼠标移动到按钮中心
             actions.move_to_element_with_offset(button, size['width']/2, size['height']/2)
             actions.perform()
-            time.sleep(0.1)
             
             # 尝试点击按钮中心
             try:
@@ -201,8 +361,6 @@ def check_and_click_next_button(driver):
                 # 如果 JavaScript 点击失败，尝试直接点击中心
                 actions.move_to_element_with_offset(button, size['width']/2, size['height']/2).click().perform()
             
-            # 等待页面加载
-            time.sleep(0.1)
             print("成功点击下一页按钮")
             return True
             
@@ -257,280 +415,205 @@ def prepare_back_icon():
         print(f"处理返回图标时出错: {str(e)}")
         return False
 
-def replace_back_icon(image_path, back_icon):
-    """替换图片中的返回图标"""
-    try:
-        with Image.open(image_path) as img:
-            # 计算正方形区域（以最长边为准）
-            width = 118 - 35
-            height = 257 - 170
-            size = max(width, height)  # 取最长边
-            
-            # 计算居中的正方形区域
-            center_x = (35 + 118) // 2
-            center_y = (170 + 257) // 2
-            half_size = size // 2
-            
-            paste_box = (
-                center_x - half_size,  # left
-                center_y - half_size,  # top
-                center_x + half_size,  # right
-                center_y + half_size   # bottom
-            )
-            
-            # 将返回图标粘贴到指定位置
-            paste_pos = (paste_box[0], paste_box[1])
-            img.paste(back_icon, paste_pos)
-            
-            # 保存修改后的图片
-            img.save(image_path, quality=95)
-            return True
-            
-    except Exception as e:
-        print(f"替换返回图标时出错: {str(e)}")
-        return False
+def save_frame(driver, output_path, top_img, bottom_img, back_icon, pipeline=None, callback=None, encoder=None,
+               capture=None):
+    """截取当前页面并交给后处理
 
-def check_and_click_ok_button(driver):
-    """检查并点击'好的'按钮"""
-    try:
-        print("检查是否存在'好的'按钮...")
-        
-        # 使用更精确的 XPath 定位提示文本和按钮
-        try:
-            # 先找到包含"鼠标悬停查看 Ta 的信息"的元素
-            hover_text = driver.find_element(By.XPATH, "//span[contains(text(), '鼠标悬停查看 Ta 的信息')]")
-            print("找到提示文本")
-            
-            # 然后在其中找到"好的"按钮
-            ok_button = hover_text.find_element(By.XPATH, ".//span[contains(text(), '好的')]")
-            print("找到'好的'按钮")
-            
-            if ok_button:
-                # 创建 ActionChains 对象
-                actions = ActionChains(driver)
-                
-                # 先滚动到文本位置
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", hover_text)
-                time.sleep(0.1)
-                
-                # 先移动到提示文本
-                actions.move_to_element(hover_text)
-                actions.perform()
-                time.sleep(0.1)
-                
-                # 获取按钮的位置和大小
-                location = ok_button.location
-                size = ok_button.size
-                
-                # 计算按钮的中心点
-                center_x = location['x'] + size['width'] / 2
-                center_y = location['y'] + size['height'] / 2
-                
-                # 移动到按钮并点击
-                actions.move_to_element(ok_button)
-                actions.click()
-                actions.perform()
-                print("已点击'好的'按钮")
-                
-                # 等待提示消失
-                time.sleep(0.2)
-                
-                # 验证提示是否消失
-                try:
-                    hover_text = driver.find_element(By.XPATH, "//span[contains(text(), '鼠标悬停查看 Ta 的信息')]")
-                    print("警告：提示仍然存在")
-                    return False
-                except NoSuchElementException:
-                    print("提示已成功关闭")
-                    return True
-                    
-            return False
-        except NoSuchElementException:
-            print("未检测到'好的'按钮")
-            return False
-    except Exception as e:
-        print(f"检查'好的'按钮时出错: {str(e)}")
-        return False
+    有 pipeline 时只把截图字节交给流水线，立即返回；
+    否则在当前线程中按 encoder 的格式完成拼接和保存。callback(result) 在截图保存成功后调用。
+    capture 为 FrameCapture，须与创建浏览器时使用的截图方式一致。
+    """
+    with timed("screenshot"):
+        frame_bytes = (capture or FrameCapture()).grab(driver)
+    if pipeline is not None:
+        pipeline.submit(frame_bytes, output_path, callback)
+    else:
+        compositor = Compositor(top_img, bottom_img, back_icon, encoder)
+        result = compose_screenshot(frame_bytes, output_path, compositor)
+        record_page_saved(result["timings"])
+        log(INFO, "截图已保存并处理: %s", output_path, path=output_path, size=result["size"], sha256=result["sha256"])
+        if callback:
+            callback(result)
 
-def check_and_click_collect_guide(driver):
-    """检查并点击收藏夹引导提示"""
-    try:
-        print("检查是否存在收藏夹引导...")
-        
-        # 检查是否存在提示文本
-        try:
-            collect_text = driver.find_element(By.XPATH, "//span[contains(text(), '可以添加到收藏夹啦')]")
-            if collect_text:
-                print("找到收藏夹引导提示")
-                
-                # 找到需要点击的元素
-                guide_element = driver.find_element(By.XPATH, '//*[@id="note-page-collect-board-guide"]')
-                
-                # 创建 ActionChains 对象
-                actions = ActionChains(driver)
-                
-                # 第一次点击
-                actions.move_to_element(guide_element).click().perform()
-                print("已完成第一次点击")
-                time.sleep(0.1)  # 等待 0.1 秒
-                
-                # 第二次点击
-                actions.move_to_element(guide_element).click().perform()
-                print("已完成第二次点击")
-                
-                # 验证提示是否消失
-                time.sleep(0.1)
-                try:
-                    driver.find_element(By.XPATH, "//span[contains(text(), '可以添加到收藏夹啦')]")
-                    print("警告：收藏夹引导仍然存在")
-                    return False
-                except NoSuchElementException:
-                    print("收藏夹引导已成功关闭")
-                    return True
-                
-        except NoSuchElementException:
-            return False  # 没有找到提示，静默返回
-            
-    except Exception as e:
-        print(f"处理收藏夹引导时出错: {str(e)}")
-        return False
+def process_single_url(driver, url, index, top_img, bottom_img, back_icon, check_guides=None,
+                       pipeline=None, manifest=None, max_pages=MAX_CAROUSEL_PAGES, output_prefix="",
+                       encoder=None, capture=None, retry_store=None, throttle=None):
+    """处理单个URL的截图，成功返回 True
 
-def check_and_close_login_popup(driver):
-    """检查并关闭登录提示框"""
-    try:
-        # 检查是否存在登录提示框
-        try:
-            # 先检查提示框是否存在且可见
-            login_popup = driver.find_element(By.XPATH, '//*[@id="app"]/div[1]/div/div[1]/div[2]/div[1]')
-            if not login_popup.is_displayed():
-                return False  # 提示框不可见，直接返回
-                
-            # 检查关闭按钮是否存在且可交互
-            close_button = driver.find_element(By.XPATH, '/html/body/div[1]/div[1]/div/div[1]/div[1]')
-            if close_button.is_displayed() and close_button.is_enabled():
-                print("检测到登录提示框，尝试关闭...")
-                close_button.click()
-                time.sleep(0.1)
-                print("已点击关闭按钮")
-                return True
-                    
-        except NoSuchElementException:
-            return False  # 没有找到提示框，静默返回
-            
-    except Exception as e:
-        # 只在真正需要处理时才输出错误
-        if "element not interactable" not in str(e):
-            print(f"处理登录提示框时出错: {str(e)[:100]}")
-        return False
+    依次截取轮播图的每一页，根据页码指示器判断何时结束，最多 max_pages 页。
 
-def process_single_url(driver, url, index, top_img, bottom_img, back_icon):
-    """处理单个URL的截图"""
+    check_guides 表示是否检查新手引导提示，默认只在第一个URL时检查；
+    多浏览器并行时每个浏览器处理的第一个URL都需要检查。
+    pipeline 为 FramePipeline 时，图片拼接和保存在后处理进程中异步完成。
+    manifest 为 RunManifest 时，按笔记 ID 记录生成的每一页截图。
+    输出文件名为 {output_prefix}{index}_{页码}{扩展名}，格式由 pipeline 的编码器
+    （没有 pipeline 时由 encoder）决定。
+    capture 为创建浏览器时使用的 FrameCapture。
+    失败时按 retry 模块的分类记录原因；retry_store 为 RetryStore 时记录每次尝试，
+    可以重试的失败会安排在批次末尾重新处理。
+    throttle 为 AdaptiveThrottle 时，开始处理前等待并发名额和令牌，结束后按结果调整访问节奏。
+    """
+    if check_guides is None:
+        check_guides = index == 1
+    if pipeline is not None:
+        encoder = pipeline.encoder
+    elif encoder is None:
+        encoder = create_encoder()
+    
+    key = note_key(url)
+    frame_count = 0
+    
+    def capture_page(page):
+        """截取第 page 页并记录到清单"""
+        callback = None
+        if manifest is not None:
+            callback = lambda result: manifest.record_frame(key, page, result)
+        save_frame(driver, f'./screenshot/{output_prefix}{index}_{page}{encoder.extension}',
+                   top_img, bottom_img, back_icon, pipeline, callback, encoder, capture)
+    
+    ticket = throttle.acquire() if throttle is not None else None
+    failure = None
     try:
-        print(f"正在处理第 {index} 个URL: {url}")
-        driver.get(url)
+        if manifest is not None:
+            manifest.start_note(key, url, index)
+        if retry_store is not None:
+            retry_store.start(key, url, index)
+        
+        note_start = time.perf_counter()
+        log(INFO, "正在处理第 %d 个URL: %s", index, url, url=url, note=key)
+        collect_network = getattr(driver, 'collect_network_stats', False)
+        if collect_network:
+            drain_network_log(driver)  # 丢弃上一个页面之后的请求
+        with timed("navigation"):
+            driver.get(url)
         
-        # 等待页面加载完成
-        time.sleep(0.8)
+        # 等待页面加载完成：DOM 可用、轮播图解码完成、网络空闲
+        with timed("readiness"):
+            wait_for_page_ready(driver)
         
-        # 检查并关闭登录提示框（每个页面都需要）
-        check_and_close_login_popup(driver)
+        # 验证码页、登录页和已删除笔记的提示页不截图，按失败处理
+        check_note_page(driver)
         
-        # 只在处理第一个URL时检查这些提示
-        if index == 1:
-            print("首次访问，检查新手引导提示...")
-            # 检查并点击"好的"按钮
-            check_and_click_ok_button(driver)
-            
-            # 检查并处理收藏夹引导
-            check_and_click_collect_guide(driver)
+        with timed("popups"):
+            # 一次脚本调用检查 src/overlays.json 中的所有弹窗，引导提示只在浏览器首次访问时检查
+            dismissed = dismiss_overlays(driver, default_overlays(), include_first=check_guides)
+            if dismissed:
+                print(f"已关闭弹窗: {'、'.join(dismissed)}")
         
         # 等待可能的动画效果结束
-        time.sleep(0.2)
+        with timed("transition"):
+            wait_for_transition_end(driver)
         
-        # 处理第一张截图
-        temp_screenshot_path = f'./screenshot/temp_{index}_1.png'
-        final_screenshot_path = f'./screenshot/{index}_1.png'
+        # 截取第一张图
+        capture_page(1)
+        frame_count = 1
         
-        # 保存第一张截图
-        driver.save_screenshot(temp_screenshot_path)
+        # 根据页码指示器确定总页数，没有指示器时一直翻到没有下一页按钮为止
+        position = read_carousel_position(driver)
+        total_pages = min(position[1], max_pages) if position else max_pages
+        if position and position[1] > max_pages:
+            print(f"笔记共 {position[1]} 页，只截取前 {max_pages} 页")
         
-        # 处理第一张图片
-        with Image.open(temp_screenshot_path) as img:
-            # 调整主截尺寸
-            resized_img = img.resize((1179, 2490), Image.Resampling.LANCZOS)
-            # 裁切时去掉上面195px(180+15)和下面5px
-            cropped_img = resized_img.crop((0, 195, 1179, 2485))
-            
-            # 创建最终尺寸的空白图片 (1179 × 2556)
-            final_img = Image.new('RGB', (1179, 2556), 'white')
-            
-            # 拼接图片
-            final_img.paste(top_img, (0, 0))
-            final_img.paste(cropped_img, (0, 165))
-            final_img.paste(bottom_img, (0, 2455))
-            
-            # 保存最终图片
-            final_img.save(final_screenshot_path, quality=95)
-            
-            # 替换返回图标
-            replace_back_icon(final_screenshot_path, back_icon)
-            
-            # 删除临时文件
-            os.remove(temp_screenshot_path)
-            print(f"第一张截图已保存并处理: {final_screenshot_path}")
+        while frame_count < total_pages:
+            page_start = time.perf_counter()
             
             # 检查并点击下一页按钮
-            if check_and_click_next_button(driver):
-                print("检测到下一页按钮，正在截取第二张图...")
-                
-                # 处理第二张截图
-                temp_screenshot_path = f'./screenshot/temp_{index}_2.png'
-                final_screenshot_path = f'./screenshot/{index}_2.png'
-                
-                # 等待新页面加载
-                time.sleep(0.2)
-                
-                # 保存第二张截图
-                driver.save_screenshot(temp_screenshot_path)
-                
-                # 处理第二张图片
-                with Image.open(temp_screenshot_path) as img:
-                    resized_img = img.resize((1179, 2490), Image.Resampling.LANCZOS)
-                    cropped_img = resized_img.crop((0, 195, 1179, 2485))
-                    
-                    final_img = Image.new('RGB', (1179, 2556), 'white')
-                    final_img.paste(top_img, (0, 0))
-                    final_img.paste(cropped_img, (0, 165))
-                    final_img.paste(bottom_img, (0, 2455))
-                    
-                    final_img.save(final_screenshot_path, quality=95)
-                    
-                    # 替换返回图标
-                    replace_back_icon(final_screenshot_path, back_icon)
-                    
-                    # 删除临时文件
-                    os.remove(temp_screenshot_path)
-                    print(f"第二张截图已保存并处理: {final_screenshot_path}")
+            with timed("next_click"):
+                clicked = check_and_click_next_button(driver)
+            if not clicked:
+                break
+            
+            # 等待切换动画结束且新图片解码完成
+            with timed("slide_ready"):
+                wait_for_slide_ready(driver)
+            
+            # 页码没有前进说明已经到最后一页
+            position = read_carousel_position(driver)
+            if position and position[0] <= frame_count:
+                print("轮播图没有翻页，停止截图")
+                break
+            
+            # 截取下一张图，截图字节立即交给后处理，不等待编码
+            print(f"正在截取第 {frame_count + 1} 张图...")
+            capture_page(frame_count + 1)
+            frame_count += 1
+            extra_page_stats.record(time.perf_counter() - page_start)
+        
+        if manifest is not None:
+            manifest.finish_note(key, frame_count)
+        if retry_store is not None:
+            retry_store.succeed(key)
+        NOTES_TOTAL.inc(result="done")
+        network = drain_network_log(driver) if collect_network else None
+        if network:
+            record_network(network)
+            network = {f"network_{name}": value for name, value in network.items()}
+        log(INFO, "第 %d 个URL处理完成，共 %d 页", index, frame_count,
+            note=key, pages=frame_count, seconds=round(time.perf_counter() - note_start, 3), **(network or {}))
+        return True
         
     except Exception as e:
-        print(f"处理URL时出错: {url}")
-        print(f"错误信息: {str(e)}")
+        NOTES_TOTAL.inc(result="failed")
+        failure = classify_failure(e, driver)
+        NOTE_FAILURES_TOTAL.inc(failure=failure)
+        log(ERROR, "处理URL时出错（%s）: %s\n错误信息: %s", failure, url, e,
+            url=url, note=key, error=str(e), failure=failure)
+        if manifest is not None:
+            manifest.fail_note(key, e)
+        if retry_store is not None:
+            delay = retry_store.fail(key, failure, e)
+            if delay is not None:
+                NOTE_RETRIES_TOTAL.inc()
+                print(f"将在批次末尾重试（至少 {delay:.0f} 秒后）")
+        return False
+    finally:
+        if ticket is not None:
+            throttle.release(ticket, failure, frame_count)
 
-def capture_screenshots():
-    """主函数：捕获截图"""
-    # 询问是否使用上次的会话（默认使用）
-    use_previous = False
-    if os.path.exists(USER_DATA_DIR):
-        use_previous = ask_yes_no("检测到上次的浏览器配置，是否使用？", default=True)
+def capture_screenshots(workers=1, processes=None, page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY,
+                        max_pages=MAX_CAROUSEL_PAGES, encoder=None, capture=None, overlay_observer=False,
+                        block_profile=None, max_rate=MAX_RATE, url_file='url.txt'):
+    """主函数：捕获截图
+
+    workers 为并行使用的浏览器数量，所有浏览器共享同一个登录会话；
+    processes 为图片后处理进程数，0 表示在浏览器线程中直接处理；
+    page_load_strategy 为 Chrome 的页面加载策略；
+    max_pages 为每个笔记最多截取的轮播页数；
+    encoder 为输出图片的编码器，默认快速压缩的 PNG；
+    capture 为截图方式，默认按原生分辨率截取；
+    overlay_observer 为真时浏览器中的弹窗一出现就自动关闭；
+    block_profile 为请求拦截规则集，默认使用 default 规则；
+    max_rate 为访问速率上限（篇/分钟），实际并发和速率根据网站的反应自动调整，0 表示不限速；
+    url_file 为URL文件，"-" 表示从标准输入读取。
+    """
+    if block_profile is None:
+        block_profile = get_block_profile(DEFAULT_BLOCK_PROFILE)
+    capture = capture or FrameCapture()
+    
+    # 从标准输入读取URL时，标准输入不再用于回答问题，所有问题使用默认选项
+    interactive = url_file != '-'
     
     # 创建截图目录
     os.makedirs('./screenshot', exist_ok=True)
     
-    # 读取URL列表
-    urls = read_urls()
-    if not urls:
-        print("URL文件为空或不存在")
+    # URL边读取边处理，不会一次读入整个文件：同一个笔记只保留一个链接，跳过上次运行中已经完成的笔记
+    ingestor = UrlIngestor()
+    manifest = RunManifest()
+    tasks = manifest.iter_pending_tasks(read_urls(url_file, ingestor))
+    first_task = next(tasks, None)
+    if first_task is None:
+        if not ingestor.urls:
+            print("URL文件为空或不存在")
+        else:
+            print(ingestor.summary())
+            print("所有笔记都已完成")
         return
+    tasks = chain([first_task], tasks)
+    
+    # 询问是否使用上次的会话（默认使用）
+    use_previous = False
+    if os.path.exists(USER_DATA_DIR):
+        use_previous = ask_yes_no("检测到上次的浏览器配置，是否使用？", default=True) if interactive else True
     
     # 预先加载所有需要的图片资源
     try:
@@ -540,29 +623,82 @@ def capture_screenshots():
         if top_img.size != (1179, 165) or bottom_img.size != (1179, 101):
             print("错误：顶部或底部图片尺寸不正确")
             return
+        # 立即解码，避免多个线程同时触发延迟加载
+        top_img.load()
+        bottom_img.load()
+        back_icon.load()
     except Exception as e:
         print(f"加载图片资源失败: {str(e)}")
         return
     
     # 设置浏览器
-    driver = setup_browser(use_previous)
+    driver = setup_browser(use_previous, page_load_strategy=page_load_strategy, capture=capture,
+                           overlay_observer=overlay_observer, block_profile=block_profile)
+    # drivers[0] 为第一个浏览器，崩溃后在重试前被替换
+    drivers = [driver]
     
     try:
         # 如果不使用上次会话，则需要等待登录
         if not use_previous:
-            wait_for_login(driver)
+            wait_for_login(driver, wait_enter=interactive)
+        
+        # 其余浏览器以及替换崩溃的浏览器都直接复用第一个浏览器的登录cookies
+        shared_cookies = driver.get_cookies()
+        
+        def create_driver(worker_id):
+            if worker_id == 0:
+                if not driver_alive(drivers[0]):
+                    print("浏览器已不可用，重新启动")
+                    try:
+                        drivers[0].quit()
+                    except Exception:
+                        pass
+                    drivers[0] = setup_browser(cookies=shared_cookies, page_load_strategy=page_load_strategy,
+                                               capture=capture, overlay_observer=overlay_observer,
+                                               block_profile=block_profile)
+                return drivers[0]
+            return setup_browser(cookies=shared_cookies, page_load_strategy=page_load_strategy, capture=capture,
+                                 overlay_observer=overlay_observer, block_profile=block_profile)
         
-        # 遍历URL并截图
-        for i, url in enumerate(urls, 1):
-            process_single_url(driver, url, i, top_img, bottom_img, back_icon)
+        def release_driver(worker_driver, worker_id):
+            # 第一个浏览器在保存会话后统一关闭
+            if worker_driver is not drivers[0]:
+                worker_driver.quit()
+        
+        # 记录每个笔记的尝试次数，可以重试的失败在所有 URL 处理完后按退避时间重试
+        retry_store = RetryStore()
+        retry_store.begin_run()
+        throttle = AdaptiveThrottle(max_concurrency=workers, max_rate=max_rate) if max_rate > 0 else None
+        
+        # 本次运行的结构化日志写在截图旁边，同时照常输出到控制台
+        run_id = time.strftime('%Y%m%d-%H%M%S')
+        logger = JobLogger(run_id, f'./screenshot/run_{run_id}_events.jsonl', echo=install_stdout_router())
+        
+        # 遍历URL并截图，图片拼接在后处理进程中与浏览器导航并行
+        with logger, bind(logger), FramePipeline(processes=processes, encoder=encoder) as pipeline:
+            def handle_url(worker_driver, index, url, worker_id, is_first):
+                return process_single_url(worker_driver, url, index, top_img, bottom_img, back_icon,
+                                          check_guides=is_first, pipeline=pipeline, manifest=manifest,
+                                          max_pages=max_pages, capture=capture, retry_store=retry_store,
+                                          throttle=throttle)
+            
+            run_with_retries(tasks, retry_store,
+                             lambda batch: run_worker_pool(batch, workers, create_driver, handle_url, release_driver))
+        
+        # 读取完成后才知道去重和跳过的数量
+        skipped = f"跳过 {manifest.skipped} 个已完成的笔记" if manifest.skipped else None
+        for summary in (ingestor.summary(), skipped, extra_page_stats.summary(), stage_summary(),
+                        network_summary(), failure_summary(), throttle.summary() if throttle else None):
+            if summary:
+                print(summary)
         
         # 只有在没有使用历史配置时才询问是否保存
         if not use_previous:
-            if ask_yes_no("是否保存当前的浏览器配置（包��登录状态等）？", default=True):
-                save_browser_session(driver)
+            if not interactive or ask_yes_no("是否保存当前的浏览器配置（包括登录状态等）？", default=True):
+                save_browser_session(drivers[0])
                 
     finally:
-        driver.quit()
+        drivers[0].quit()
         # 关闭图片
         top_img.close()
         bottom_img.close()
@@ -714,11 +850,64 @@ def prepare_top_image():
         print(f"处理顶部图片时出错: {str(e)}")
         return False
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="小红书笔记截图工具")
+    parser.add_argument('--urls', default='url.txt',
+                        help="URL文件，每行一个链接，- 表示从标准输入读取（默认 url.txt）")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="并行使用的浏览器数量（默认 1）")
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help="图片后处理进程数（默认按 CPU 核数自动选择，0 表示不使用子进程）")
+    parser.add_argument('--page-load-strategy', choices=PAGE_LOAD_STRATEGIES, default=DEFAULT_PAGE_LOAD_STRATEGY,
+                        help=f"Chrome 页面加载策略（默认 {DEFAULT_PAGE_LOAD_STRATEGY}）")
+    parser.add_argument('--max-pages', type=int, default=MAX_CAROUSEL_PAGES,
+                        help=f"每个笔记最多截取的轮播页数（默认 {MAX_CAROUSEL_PAGES}）")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT,
+                        help=f"输出图片格式（默认 {DEFAULT_OUTPUT_FORMAT}）")
+    parser.add_argument('--quality', type=int, default=None,
+                        help="JPEG/WebP 图片质量 1~100")
+    parser.add_argument('--compress-level', type=int, default=None,
+                        help="PNG 压缩级别 0~9（默认 1，越大文件越小、编码越慢）")
+    parser.add_argument('--block-profile', choices=sorted(load_block_profiles()), default=DEFAULT_BLOCK_PROFILE,
+                        help=f"请求拦截规则（见 src/block_profiles.json，off 表示不拦截，默认 {DEFAULT_BLOCK_PROFILE}）")
+    parser.add_argument('--max-rate', type=float, default=MAX_RATE,
+                        help=f"访问速率上限（篇/分钟，默认 {MAX_RATE:.0f}），并发和速率根据网站的反应自动调整，0 表示不限速")
+    parser.add_argument('--overlay-observer', action='store_true',
+                        help="在页面中监听 DOM 变化，弹窗出现时立即自动关闭")
+    parser.add_argument('--capture', choices=CAPTURE_MODES, default=DEFAULT_CAPTURE_MODE,
+                        help=f"截图方式：native 按原生分辨率只截取内容区域，scaled 为 2 倍截图后缩放（默认 {DEFAULT_CAPTURE_MODE}）")
+    parser.add_argument('--capture-format', choices=CAPTURE_FORMATS, default=DEFAULT_CAPTURE_FORMAT,
+                        help=f"Chrome 截图时的编码格式，jpeg/webp 传输更快但有损（默认 {DEFAULT_CAPTURE_FORMAT}）")
+    parser.add_argument('--capture-quality', type=int, default=None,
+                        help="jpeg/webp 截图质量 1~100（默认 90）")
+    parser.add_argument('--capture-fast', action='store_true',
+                        help="让 Chrome 截图时优先编码速度（optimizeForSpeed）")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    try:
+        encoder = create_encoder(args.format, args.quality, args.compress_level)
+    except ValueError as e:
+        print(f"参数错误: {str(e)}")
+        sys.exit(1)
+    print(f"输出格式: {encoder.describe()}")
+    try:
+        capture = FrameCapture(args.capture, args.capture_format, args.capture_quality, args.capture_fast)
+    except ValueError as e:
+        print(f"参数错误: {str(e)}")
+        sys.exit(1)
+    print(f"截图方式: {capture.describe()}")
+    
     # 准备所有资源
     prepare_top_image()
     prepare_bottom_image()
     prepare_back_icon()
     
     # 开始主程序
-    capture_screenshots()
+    capture_screenshots(workers=normalize_worker_count(args.workers), processes=args.processes,
+                        page_load_strategy=args.page_load_strategy, max_pages=max(1, args.max_pages),
+                        encoder=encoder, capture=capture, overlay_observer=args.overlay_observer,
+                        block_profile=get_block_profile(args.block_profile), max_rate=max(0, args.max_rate),
+                        url_file=args.urls)
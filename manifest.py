@@ -0,0 +1,154 @@
+"""运行清单：按笔记 ID 记录已生成的截图，支持中断后继续运行
+
+清单是只追加的 JSONL 文件，每行一个事件，启动时按顺序重放得到每个笔记的状态。
+追加写入不需要重写整个文件，进程中途退出最多丢失最后一行。
+"""
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+MANIFEST_PATH = "./screenshot/manifest.jsonl"
+
+# 小红书笔记链接：/explore/<24位十六进制ID>，也兼容 /discovery/item/<ID>
+NOTE_ID_PATTERN = re.compile(r"/(?:explore|discovery/item)/([0-9a-fA-F]{24})(?:[/?#]|$)")
+
+
+def parse_note_id(url):
+    """从笔记链接中解析笔记 ID，解析失败返回 None"""
+    match = NOTE_ID_PATTERN.search(urlparse(url.strip()).path + "/")
+    return match.group(1).lower() if match else None
+
+
+def note_key(url):
+    """清单中使用的键：优先使用笔记 ID，否则使用去掉查询参数的链接"""
+    note_id = parse_note_id(url)
+    if note_id:
+        return note_id
+    parsed = urlparse(url.strip())
+    return f"{parsed.netloc}{parsed.path}"
+
+
+class RunManifest:
+    """运行清单
+
+    每个笔记记录链接、序号、状态以及每一页截图的路径、大小和 sha256。
+    笔记采集结束时记录一共提交了几页截图；后处理是异步的，只有所有页都
+    保存完成、且磁盘上的文件大小与记录一致时才算完成。
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.notes = {}
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """重放清单文件中的事件"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    continue  # 中途退出时可能留下不完整的最后一行
+
+    def _apply(self, event):
+        """把一个事件应用到内存中的状态"""
+        key = event["note"]
+        kind = event["event"]
+        if kind == "start":
+            self.notes[key] = {
+                "url": event["url"],
+                "index": event["index"],
+                "status": "running",
+                "frames": {},
+                "frame_count": None,
+            }
+            return
+
+        note = self.notes.get(key)
+        if note is None:
+            return
+        if kind == "frame":
+            note["frames"][str(event["page"])] = {
+                "path": event["path"],
+                "size": event["size"],
+                "sha256": event["sha256"],
+            }
+        elif kind == "finish":
+            note["frame_count"] = event["frame_count"]
+            note["status"] = "captured"
+        elif kind == "fail":
+            note["status"] = "failed"
+            note["error"] = event.get("error")
+
+    def _append(self, event):
+        """记录事件并追加写入清单文件"""
+        event["time"] = round(time.time(), 3)
+        with self._lock:
+            self._apply(event)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def start_note(self, key, url, index):
+        """开始处理一个笔记（之前的记录会被覆盖）"""
+        self._append({"event": "start", "note": key, "url": url, "index": index})
+
+    def record_frame(self, key, page, result):
+        """记录一页已经保存好的截图，result 为后处理返回的路径、大小和哈希"""
+        self._append({
+            "event": "frame", "note": key, "page": page,
+            "path": result["path"], "size": result["size"], "sha256": result["sha256"],
+        })
+
+    def finish_note(self, key, frame_count):
+        """笔记采集结束，共提交了 frame_count 页截图"""
+        self._append({"event": "finish", "note": key, "frame_count": frame_count})
+
+    def fail_note(self, key, error):
+        """笔记处理失败"""
+        self._append({"event": "fail", "note": key, "error": str(error)[:200]})
+
+    def is_done(self, key):
+        """笔记的所有截图都已生成且文件完好"""
+        with self._lock:
+            note = self.notes.get(key)
+            if not note or note["status"] != "captured" or not note["frame_count"]:
+                return False
+            frames = list(note["frames"].values())
+        if len(frames) < note["frame_count"]:
+            return False
+        for frame in frames:
+            try:
+                if os.path.getsize(frame["path"]) != frame["size"]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def iter_pending_tasks(self, urls):
+        """逐个产生未完成笔记的 (序号, 链接)，跳过的数量累计在 self.skipped 中
+
+        序号仍然是链接在原列表中的位置，所以续跑时输出文件名不变。
+        urls 可以是边读取边产生链接的迭代器，不需要先读完整个列表。
+        """
+        self.skipped = 0
+        for index, url in enumerate(urls, 1):
+            if self.is_done(note_key(url)):
+                self.skipped += 1
+            else:
+                yield index, url
+
+    def pending_tasks(self, urls):
+        """过滤掉已完成的笔记，返回 (序号, 链接) 列表和跳过的数量"""
+        tasks = list(self.iter_pending_tasks(urls))
+        return tasks, self.skipped
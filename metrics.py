@@ -0,0 +1,279 @@
+"""运行指标：各阶段耗时直方图、计数器和 Prometheus 文本格式导出
+
+采集线程用 timed("navigation") 包住每个阶段；后处理进程里的缩放、编码和保存
+耗时随结果返回，由主进程的 FramePipeline 调用 observe_stage 记录。
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 直方图分桶（秒），覆盖从几毫秒的编码到几十秒的页面加载
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 计算每分钟页数的时间窗口（秒）
+RATE_WINDOW = 60
+
+
+def _format_value(value):
+    """数值转换成 Prometheus 文本格式"""
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    """格式化标签，如 {stage="navigation",le="0.5"}"""
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """只增不减的计数器，可以带标签"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def items(self):
+        """[(标签值元组, 数值)]，按标签值排列"""
+        with self._lock:
+            return sorted(self._values.items())
+
+    def samples(self):
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in self.items()]
+
+
+class Histogram:
+    """累计分桶的直方图，可以带标签"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # 标签值 -> [各桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """{标签值: (总和, 次数)}"""
+        with self._lock:
+            return {key: (series[1], series[2]) for key, series in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            series_list = sorted((key, list(series[0]), series[1], series[2]) for key, series in self._series.items())
+        samples = []
+        for key, counts, total, count in series_list:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, ("le", _format_value(bound))),
+                                cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labels, key), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labels, key), count))
+        return samples
+
+
+class Gauge:
+    """读取时才计算的当前值，func 返回数值或 {标签值: 数值}"""
+
+    type = "gauge"
+
+    def __init__(self, name, help, func, labels=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.labels = tuple(labels)
+
+    def samples(self):
+        try:
+            value = self.func()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, _format_labels(self.labels, key if isinstance(key, tuple) else (key,)), v)
+                    for key, v in sorted(value.items())]
+        return [(self.name, "", value)]
+
+
+class RateWindow:
+    """统计最近 window 秒内发生的事件次数"""
+
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def mark(self):
+        now = time.monotonic()
+        with self._lock:
+            self._times.append(now)
+            self._trim(now)
+
+    def count(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return len(self._times)
+
+    def _trim(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+
+class MetricsRegistry:
+    """指标注册表，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, func, labels=()):
+        return self.register(Gauge(name, help, func, labels))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "xhs_stage_seconds", "每个处理阶段的耗时（秒）", labels=("stage",))
+PAGES_TOTAL = registry.counter("xhs_pages_total", "已保存的截图页数")
+NOTES_TOTAL = registry.counter("xhs_notes_total", "处理结束的笔记数", labels=("result",))
+FRAME_ERRORS_TOTAL = registry.counter("xhs_frame_errors_total", "后处理失败的截图数")
+BROWSERS_TOTAL = registry.counter("xhs_browser_launches_total", "启动的浏览器数量")
+JOBS_TOTAL = registry.counter("xhs_jobs_finished_total", "结束的 Web 任务数", labels=("status",))
+NETWORK_REQUESTS_TOTAL = registry.counter(
+    "xhs_network_requests_total", "笔记页面的网络请求数（loaded/blocked/failed）", labels=("result",))
+NETWORK_BYTES_TOTAL = registry.counter("xhs_network_bytes_total", "笔记页面传输的字节数")
+NOTE_FAILURES_TOTAL = registry.counter(
+    "xhs_note_failures_total", "笔记处理失败的次数，按失败原因（见 retry.py）", labels=("failure",))
+NOTE_RETRIES_TOTAL = registry.counter("xhs_note_retries_total", "安排在批次末尾重试的笔记数")
+DUPLICATE_URLS_TOTAL = registry.counter("xhs_duplicate_urls_total", "读取链接时去掉的重复笔记数（省下的浏览器访问）")
+
+pages_window = RateWindow()
+registry.gauge("xhs_pages_per_minute", "最近一分钟保存的截图页数", pages_window.count)
+
+
+def observe_stage(stage, seconds):
+    """记录一个阶段的耗时"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage):
+    """计时上下文：with timed("navigation"): ...，出错时同样记录耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_page_saved(timings=None):
+    """一页截图保存完成，timings 为后处理进程返回的 {阶段: 秒}"""
+    PAGES_TOTAL.inc()
+    pages_window.mark()
+    for stage, seconds in (timings or {}).items():
+        observe_stage(stage, seconds)
+
+
+def record_network(stats):
+    """记录一个笔记页面的网络统计，stats 为 blocking.drain_network_log 的返回值"""
+    NETWORK_REQUESTS_TOTAL.inc(stats["requests"], result="loaded")
+    NETWORK_REQUESTS_TOTAL.inc(stats["blocked"], result="blocked")
+    NETWORK_REQUESTS_TOTAL.inc(stats["failed"], result="failed")
+    NETWORK_BYTES_TOTAL.inc(stats["bytes"])
+
+
+def network_summary():
+    """每个笔记平均的请求数、传输量和被阻止的请求数，没有数据时返回 None"""
+    notes = NOTES_TOTAL.value(result="done")
+    loaded = NETWORK_REQUESTS_TOTAL.value(result="loaded")
+    if not notes or not loaded:
+        return None
+    blocked = NETWORK_REQUESTS_TOTAL.value(result="blocked")
+    return (f"网络: 平均每个笔记 {loaded / notes:.0f} 个请求、{NETWORK_BYTES_TOTAL.value() / notes / 1024:.0f} KB，"
+            f"阻止 {blocked / notes:.0f} 个请求")
+
+
+def failure_summary():
+    """各类失败的次数，没有失败时返回 None"""
+    failures = [(key[0], count) for key, count in NOTE_FAILURES_TOTAL.items() if count]
+    if not failures:
+        return None
+    retries = NOTE_RETRIES_TOTAL.value()
+    return ("失败原因: " + "，".join(f"{failure} {count}" for failure, count in failures) +
+            (f"（重试 {retries:.0f} 次）" if retries else ""))
+
+
+def stage_summary():
+    """各阶段平均耗时的一行摘要，没有数据时返回 None"""
+    snapshot = STAGE_SECONDS.snapshot()
+    if not snapshot:
+        return None
+    parts = [
+        f"{key[0]} {total / count * 1000:.0f} ms"
+        for key, (total, count) in sorted(snapshot.items()) if count
+    ]
+    return "各阶段平均耗时: " + "，".join(parts)
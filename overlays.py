@@ -0,0 +1,157 @@
+"""页面弹窗处理：一次脚本调用检测并关闭所有已知的弹窗和引导提示
+
+弹窗由 src/overlays.json 中的表格描述，修改表格即可支持新的弹窗，不需要改代码。
+每一项包含：
+    name         名称，用于日志
+    scope        every 表示每个页面都检查，first 表示只在浏览器首次访问时检查
+    detect       检测弹窗的 XPath，元素存在且可见时认为弹窗出现
+    click        需要点击的元素的 XPath，以 "." 开头时相对于 detect 找到的元素，
+                 省略时点击 detect 元素本身
+    hover        点击前先在 detect 元素上触发鼠标悬停事件（可选）
+    clicks       点击次数，默认 1；多次点击之间间隔 interval_ms 毫秒
+
+检测和点击都在页面内完成，每个笔记只需要一次 WebDriver 往返。还可以通过
+install_overlay_observer 在每个新页面注入 MutationObserver，弹窗一出现就自动关闭。
+"""
+import json
+import os
+from functools import lru_cache
+
+OVERLAYS_FILE = "src/overlays.json"
+OVERLAY_SCOPES = ("every", "first")
+
+# 页面内执行的检测和关闭函数：返回每个出现的弹窗的 {name, dismissed}
+OVERLAY_FUNCTION = r"""
+function (table, includeFirst) {
+    const handled = window.__xhsOverlayHandled = window.__xhsOverlayHandled || new WeakSet();
+    const find = (xpath, context) => document.evaluate(
+        xpath, context || document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    const visible = (el) => {
+        if (!el || !el.isConnected) return false;
+        const style = getComputedStyle(el);
+        return style.display !== 'none' && style.visibility !== 'hidden' && el.getClientRects().length > 0;
+    };
+    const fire = (el, type) => el.dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+    const press = (el) => {
+        ['mouseover', 'mousedown', 'mouseup'].forEach((type) => fire(el, type));
+        el.click();
+    };
+    const results = [];
+    for (const overlay of table) {
+        if (overlay.scope === 'first' && !includeFirst) continue;
+        let target = null;
+        try {
+            const found = find(overlay.detect);
+            if (!visible(found)) continue;
+            target = overlay.click ? find(overlay.click, overlay.click.startsWith('.') ? found : document) : found;
+            if (!target || handled.has(target)) continue;
+            handled.add(target);
+            if (overlay.hover) fire(found, 'mouseover');
+            press(target);
+            for (let i = 1; i < (overlay.clicks || 1); i++) {
+                setTimeout(() => { if (target.isConnected) press(target); }, i * (overlay.interval_ms || 300));
+            }
+            results.push({name: overlay.name, dismissed: true});
+        } catch (e) {
+            results.push({name: overlay.name, dismissed: false, error: String(e)});
+        }
+    }
+    return results;
+}
+"""
+
+DISMISS_SCRIPT = f"return ({OVERLAY_FUNCTION})(arguments[0], arguments[1]);"
+
+# 注入到每个新页面：DOM 变化后（每帧最多一次）检查弹窗，关闭次数记录在 window.__xhsOverlayStats
+OBSERVER_TEMPLATE = """
+(function () {
+    const dismiss = %s;
+    const table = %s;
+    const stats = window.__xhsOverlayStats = {};
+    let pending = false;
+    const check = () => {
+        pending = false;
+        for (const result of dismiss(table, true)) {
+            if (result.dismissed) stats[result.name] = (stats[result.name] || 0) + 1;
+        }
+    };
+    const start = () => {
+        new MutationObserver(() => {
+            if (!pending) {
+                pending = true;
+                requestAnimationFrame(check);
+            }
+        }).observe(document.documentElement, {childList: true, subtree: true});
+        check();
+    };
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', start);
+    } else {
+        start();
+    }
+})();
+"""
+
+
+def load_overlays(path=OVERLAYS_FILE):
+    """读取弹窗表格，跳过格式不正确的条目；文件不存在或无法解析时返回空列表"""
+    if not os.path.exists(path):
+        print(f"未找到弹窗配置文件: {path}")
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except Exception as e:
+        print(f"读取弹窗配置失败: {str(e)}")
+        return []
+    overlays = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('name') or not entry.get('detect'):
+            print(f"忽略格式不正确的弹窗配置: {entry}")
+            continue
+        if entry.get('scope', 'every') not in OVERLAY_SCOPES:
+            print(f"忽略不支持的弹窗范围: {entry.get('scope')}")
+            continue
+        overlays.append(dict(entry, scope=entry.get('scope', 'every')))
+    return overlays
+
+
+@lru_cache(maxsize=None)
+def _cached_overlays(path):
+    return tuple(load_overlays(path))
+
+
+def default_overlays(path=OVERLAYS_FILE):
+    """读取并缓存弹窗表格，每次运行只读取一次文件"""
+    return list(_cached_overlays(path))
+
+
+def dismiss_overlays(driver, overlays, include_first=True):
+    """检测并关闭弹窗，返回已关闭的弹窗名称列表
+
+    include_first 为假时跳过只在首次访问时出现的引导提示。
+    """
+    if not overlays:
+        return []
+    try:
+        results = driver.execute_script(DISMISS_SCRIPT, overlays, include_first) or []
+    except Exception as e:
+        print(f"检查弹窗时出错: {str(e)[:100]}")
+        return []
+    for result in results:
+        if result.get('error'):
+            print(f"关闭弹窗 {result['name']} 时出错: {result['error'][:100]}")
+    return [result['name'] for result in results if result.get('dismissed')]
+
+
+def install_overlay_observer(driver, overlays):
+    """在每个新页面加载前注入自动关闭弹窗的 MutationObserver"""
+    if not overlays:
+        return False
+    source = OBSERVER_TEMPLATE % (OVERLAY_FUNCTION, json.dumps(overlays, ensure_ascii=False))
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+        return True
+    except Exception as e:
+        print(f"注入弹窗监听脚本失败: {str(e)[:100]}")
+        return False
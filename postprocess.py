@@ -0,0 +1,244 @@
+"""截图后处理：在独立进程中完成缩放、拼接和保存，不占用驱动浏览器的线程"""
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
+from multiprocessing import shared_memory
+from PIL import Image
+from compositor import Compositor
+from thumbnails import write_thumbnails
+from encoders import create_encoder
+from metrics import record_page_saved, FRAME_ERRORS_TOTAL
+from joblog import current_binding, restore, log, INFO, ERROR
+
+TOP_IMAGE_PATH = "src/top.jpg"
+BOTTOM_IMAGE_PATH = "src/bottom.jpg"
+BACK_ICON_PATH = "src/back.png"
+
+# 工作进程内的合成器和缩略图设置，由 _init_worker 创建
+_worker_compositor = None
+_worker_thumbnails = None  # (缓存目录, 宽度) 或 None
+
+
+def compose_screenshot(frame_bytes, output_path, compositor, thumbnails=None):
+    """把浏览器原始截图拼接成最终图片并保存
+
+    返回保存结果：路径、文件大小和 sha256，供运行清单记录。
+    thumbnails 为 (缓存目录, 宽度) 时顺带生成缩略图，新写入的文件列在结果的 thumbnails 中。
+    结果的 timings 为解码、缩放、编码、缩略图和写文件各阶段的耗时（秒）。
+    """
+    timings = {}
+    result = {"path": output_path, "thumbnails": [], "timings": timings}
+
+    def after_encode(image, data):
+        result["size"] = len(data)
+        result["sha256"] = hashlib.sha256(data).hexdigest()
+        if thumbnails:
+            start = time.perf_counter()
+            try:
+                result["thumbnails"] = write_thumbnails(image, result["sha256"], *thumbnails)
+            except Exception as e:
+                print(f"生成缩略图时出错: {str(e)}")
+            timings["thumbnail"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with Image.open(io.BytesIO(frame_bytes)) as img:
+        img.load()
+        timings["decode"] = time.perf_counter() - start
+        data = compositor.encode(img, after_encode=after_encode, timings=timings)
+    start = time.perf_counter()
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    timings["save"] = time.perf_counter() - start
+    return result
+
+
+def load_template_images(top_path=TOP_IMAGE_PATH, bottom_path=BOTTOM_IMAGE_PATH, back_path=BACK_ICON_PATH):
+    """加载并立即解码模板图片"""
+    images = []
+    for path in (top_path, bottom_path, back_path):
+        img = Image.open(path)
+        img.load()
+        images.append(img)
+    return tuple(images)
+
+
+def create_compositor(top_path=TOP_IMAGE_PATH, bottom_path=BOTTOM_IMAGE_PATH, back_path=BACK_ICON_PATH,
+                      encoder=None):
+    """加载模板图片并创建合成器"""
+    images = load_template_images(top_path, bottom_path, back_path)
+    try:
+        return Compositor(*images, encoder=encoder)
+    finally:
+        for img in images:
+            img.close()
+
+
+def _init_worker(top_path, bottom_path, back_path, thumbnails=None, encoder=None):
+    """工作进程初始化：每个进程只生成一次模板画布"""
+    global _worker_compositor, _worker_thumbnails
+    _worker_compositor = create_compositor(top_path, bottom_path, back_path, encoder)
+    _worker_thumbnails = thumbnails
+
+
+def _attach_shared_memory(name):
+    """在工作进程中打开父进程创建的共享内存
+
+    释放（unlink）始终由父进程负责，工作进程只读取后关闭。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数；子进程与父进程共用同一个
+        # resource_tracker，重复登记不会造成重复清理
+        return shared_memory.SharedMemory(name=name)
+
+
+def _compose_from_shared_memory(shm_name, size, output_path):
+    """工作进程入口：从共享内存读取截图数据并完成拼接"""
+    shm = _attach_shared_memory(shm_name)
+    try:
+        frame_bytes = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return compose_screenshot(frame_bytes, output_path, _worker_compositor, _worker_thumbnails)
+
+
+def default_process_count():
+    """默认的后处理进程数：给浏览器留出 CPU"""
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class FramePipeline:
+    """截图后处理流水线
+
+    采集线程只调用 submit() 把截图的原始字节交给流水线，随即可以继续导航到
+    下一个笔记；缩放、拼接和编码在进程池中完成。截图字节通过共享内存传给
+    工作进程，不需要 pickle 数 MB 的缓冲区。
+
+    max_pending 限制尚未处理完的截图数量，超出时 submit() 会阻塞，
+    避免采集速度远高于处理速度时内存无限增长。processes=0 时在调用线程中
+    直接处理（不启动子进程）。
+
+    传入 ThumbnailCache 时，工作进程在编码后立即生成缩略图，
+    由流水线在主进程中登记到缓存并按容量淘汰。传入 ScreenshotIndex 时，
+    保存完成的截图直接登记到索引，读取列表时不需要重新扫描目录。
+    encoder 为输出格式（encoders.OutputEncoder），默认快速压缩的 PNG。
+    """
+
+    def __init__(self, processes=None, max_pending=None, on_saved=None, thumbnails=None, encoder=None,
+                 top_path=TOP_IMAGE_PATH, bottom_path=BOTTOM_IMAGE_PATH, back_path=BACK_ICON_PATH, index=None):
+        self.processes = default_process_count() if processes is None else processes
+        self.on_saved = on_saved
+        self.index = index
+        self.encoder = encoder or create_encoder()
+        self.thumbnails = thumbnails
+        self._thumbnail_settings = (thumbnails.cache_dir, thumbnails.widths) if thumbnails else None
+        self._slots = threading.BoundedSemaphore(max_pending or max(2, self.processes * 2))
+        self._pending = set()
+        self._lock = threading.Lock()
+
+        if self.processes > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_worker,
+                initargs=(top_path, bottom_path, back_path, self._thumbnail_settings, self.encoder)
+            )
+            self._compositor = None
+        else:
+            self._executor = None
+            self._compositor = create_compositor(top_path, bottom_path, back_path, self.encoder)
+
+    def submit(self, frame_bytes, output_path, callback=None):
+        """提交一张截图，返回在图片保存完成后结束的 Future
+
+        callback(result) 在这张截图保存成功后调用，result 为 compose_screenshot 的返回值。
+        完成时的日志和回调在提交线程的任务日志绑定下执行。
+        """
+        self._slots.acquire()
+        binding = current_binding()
+
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(compose_screenshot(frame_bytes, output_path, self._compositor,
+                                                     self._thumbnail_settings))
+            except Exception as e:
+                future.set_exception(e)
+            self._finish(future, output_path, None, callback, binding)
+            return future
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(frame_bytes)))
+        try:
+            shm.buf[:len(frame_bytes)] = frame_bytes
+            future = self._executor.submit(_compose_from_shared_memory, shm.name, len(frame_bytes), output_path)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self._finish(f, output_path, shm, callback, binding))
+        return future
+
+    def _finish(self, future, output_path, shm, callback, binding=None):
+        """单张截图处理结束：释放共享内存和队列名额，并通知调用方"""
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+        with restore(binding):
+            error = future.exception()
+            if error is not None:
+                FRAME_ERRORS_TOTAL.inc()
+                log(ERROR, "处理截图时出错: %s\n错误信息: %s", output_path, error,
+                    path=output_path, error=str(error))
+                return
+            result = future.result()
+            log(INFO, "截图已保存并处理: %s", output_path, path=output_path, size=result["size"],
+                sha256=result["sha256"])
+            record_page_saved(result["timings"])
+            if self.thumbnails and result["thumbnails"]:
+                self.thumbnails.register(result["thumbnails"])
+            if self.index is not None:
+                self.index.add(output_path, result["sha256"])
+            for handler in (callback, self.on_saved):
+                if handler:
+                    try:
+                        handler(result)
+                    except Exception as e:
+                        print(f"截图保存回调出错: {str(e)}")
+
+    def wait(self):
+        """等待所有已提交的截图处理完成"""
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                return
+            for future in pending:
+                try:
+                    future.result()
+                except Exception:
+                    pass  # 错误已在 _finish 中输出
+
+    def close(self):
+        """等待剩余截图处理完成并关闭进程池"""
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._compositor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,176 @@
+"""页面就绪检测：等待真实的页面信号，而不是固定的 sleep
+
+每个阶段都有独立的超时预算，超时后不报错，只返回 False 让调用方继续截图，
+这样快的页面不必等待固定时间，慢的页面也不会在半加载状态下被截图。
+"""
+import time
+
+# 各阶段的超时预算（秒）
+PHASE_TIMEOUTS = {
+    "document": 8.0,     # driver.get 之后等待 DOM 可用
+    "images": 3.0,       # 轮播图解码完成
+    "network": 2.0,      # 没有未完成的请求
+    "transition": 1.0,   # 轮播切换动画结束
+    "overlay": 0.5,      # 弹窗关闭
+}
+
+# Chrome 支持的页面加载策略，eager/none 时 driver.get 不会等待所有资源加载完毕
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+DEFAULT_PAGE_LOAD_STRATEGY = "eager"
+
+# 当前轮播页中的图片
+CAROUSEL_IMAGE_SELECTOR = ".swiper-slide-active img, .note-slider-img, #noteContainer .swiper-slide img"
+
+# 在每个页面加载前注入，统计未完成的 fetch / XHR 请求数量
+NETWORK_TRACKER_SCRIPT = """
+(function () {
+    if (window.__xhsPendingRequests !== undefined) return;
+    window.__xhsPendingRequests = 0;
+    const done = () => { window.__xhsPendingRequests = Math.max(0, window.__xhsPendingRequests - 1); };
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function () {
+            window.__xhsPendingRequests++;
+            return originalFetch.apply(this, arguments).finally(done);
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__xhsPendingRequests++;
+        this.addEventListener('loadend', done, { once: true });
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+_DOCUMENT_SCRIPT = """
+const [timeoutMs, done] = arguments;
+const deadline = Date.now() + timeoutMs;
+(function check() {
+    if (document.readyState !== 'loading' && document.body) return done(true);
+    if (Date.now() > deadline) return done(false);
+    setTimeout(check, 20);
+})();
+"""
+
+_IMAGES_SCRIPT = """
+const [selector, timeoutMs, done] = arguments;
+const deadline = Date.now() + timeoutMs;
+const inViewport = (el) => {
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && rect.bottom > 0 && rect.right > 0 &&
+        rect.top < window.innerHeight && rect.left < window.innerWidth;
+};
+(function waitForImages() {
+    const images = Array.from(document.querySelectorAll(selector)).filter(inViewport);
+    if (images.length === 0) {
+        // 轮播图可能还没插入 DOM
+        if (Date.now() > deadline) return done(false);
+        return setTimeout(waitForImages, 30);
+    }
+    const timer = new Promise((resolve) => setTimeout(() => resolve(false), Math.max(0, deadline - Date.now())));
+    const decoded = Promise.all(images.map((img) => img.decode().catch(() => null))).then(() => true);
+    Promise.race([decoded, timer]).then(done);
+})();
+"""
+
+_NETWORK_SCRIPT = """
+const [quietMs, timeoutMs, done] = arguments;
+const deadline = Date.now() + timeoutMs;
+const resourceCount = () => performance.getEntriesByType('resource').length;
+let lastCount = resourceCount();
+let quietSince = Date.now();
+(function check() {
+    const count = resourceCount();
+    const pending = window.__xhsPendingRequests || 0;
+    if (count !== lastCount || pending > 0) {
+        lastCount = count;
+        quietSince = Date.now();
+    }
+    if (Date.now() - quietSince >= quietMs) return done(true);
+    if (Date.now() > deadline) return done(false);
+    setTimeout(check, 25);
+})();
+"""
+
+_TRANSITION_SCRIPT = """
+const [timeoutMs, done] = arguments;
+const deadline = Date.now() + timeoutMs;
+const running = () => (document.getAnimations ? document.getAnimations() : []).some((animation) => {
+    if (animation.playState !== 'running') return false;
+    // 忽略无限循环的加载动画
+    const timing = animation.effect && animation.effect.getTiming ? animation.effect.getTiming() : {};
+    return timing.iterations !== Infinity;
+});
+// 点击后过渡动画会在下一帧才开始，先等两帧
+requestAnimationFrame(() => requestAnimationFrame(function check() {
+    if (!running()) return done(true);
+    if (Date.now() > deadline) return done(false);
+    requestAnimationFrame(check);
+}));
+"""
+
+
+def phase_timeout(phase, timeout=None):
+    """返回阶段的超时时间（秒）"""
+    return PHASE_TIMEOUTS[phase] if timeout is None else timeout
+
+
+def _run_wait(driver, phase, script, *args, timeout=None):
+    """执行等待脚本，超时或出错时输出提示并返回 False"""
+    seconds = phase_timeout(phase, timeout)
+    try:
+        ready = bool(driver.execute_async_script(script, *args, int(seconds * 1000)))
+    except Exception as e:
+        print(f"等待页面就绪（{phase}）时出错: {str(e)[:100]}")
+        return False
+    if not ready:
+        print(f"等待页面就绪（{phase}）超时 {seconds:.1f}s，继续执行")
+    return ready
+
+
+def wait_for_document(driver, timeout=None):
+    """等待 DOM 可用（配合 eager/none 加载策略使用）"""
+    return _run_wait(driver, "document", _DOCUMENT_SCRIPT, timeout=timeout)
+
+
+def wait_for_carousel_images(driver, timeout=None, selector=CAROUSEL_IMAGE_SELECTOR):
+    """等待当前可见的轮播图 decode() 完成"""
+    return _run_wait(driver, "images", _IMAGES_SCRIPT, selector, timeout=timeout)
+
+
+def wait_for_network_idle(driver, timeout=None, quiet=0.3):
+    """等待 quiet 秒内没有新的资源请求，且没有未完成的 fetch / XHR"""
+    return _run_wait(driver, "network", _NETWORK_SCRIPT, int(quiet * 1000), timeout=timeout)
+
+
+def wait_for_transition_end(driver, timeout=None):
+    """等待轮播切换等过渡动画结束"""
+    return _run_wait(driver, "transition", _TRANSITION_SCRIPT, timeout=timeout)
+
+
+def wait_for_page_ready(driver):
+    """导航后等待页面可以截图：DOM 可用、轮播图解码完成、网络空闲"""
+    start = time.perf_counter()
+    wait_for_document(driver)
+    wait_for_carousel_images(driver)
+    wait_for_network_idle(driver)
+    return time.perf_counter() - start
+
+
+def wait_for_slide_ready(driver):
+    """切换轮播页后等待动画结束且新图片解码完成"""
+    start = time.perf_counter()
+    wait_for_transition_end(driver)
+    wait_for_carousel_images(driver)
+    return time.perf_counter() - start
+
+
+def install_network_tracker(driver):
+    """在每个新页面加载前注入请求计数脚本"""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_SCRIPT})
+        return True
+    except Exception as e:
+        print(f"注入网络监测脚本失败: {str(e)[:100]}")
+        return False
@@ -0,0 +1,321 @@
+"""失败重试：记录每个笔记的尝试次数，按失败原因决定是否在批次末尾重试
+
+失败分为以下几类：
+    timeout          页面加载或等待元素超时
+    missing_element  页面上找不到需要操作的元素
+    login_wall       页面要求登录
+    captcha          页面要求完成验证码（访问过于频繁）
+    deleted_note     笔记已删除或无法浏览
+    driver_crash     浏览器崩溃或与 chromedriver 的连接断开
+    unknown          其他错误
+
+timeout、missing_element、captcha、driver_crash 和 unknown 通常是暂时的，在所有 URL 处理完后
+按指数退避（带随机抖动）重新尝试，不阻塞批次中的其他 URL；login_wall 和
+deleted_note 重试也不会成功，直接标记为失败。
+
+尝试记录保存在 SQLite 文件中，进程退出后仍然保留，可以按失败原因统计，用来调整
+各阶段的超时时间：
+
+    python retry.py            # 各类失败的次数和仍在等待重试的笔记
+"""
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+from selenium.common.exceptions import (
+    TimeoutException, NoSuchElementException, StaleElementReferenceException,
+    ElementNotInteractableException, ElementClickInterceptedException,
+    InvalidSessionIdException, NoSuchWindowException, WebDriverException,
+)
+
+RETRY_DB_PATH = "./screenshot/retry.db"
+
+FAILURE_TIMEOUT = "timeout"
+FAILURE_MISSING_ELEMENT = "missing_element"
+FAILURE_LOGIN_WALL = "login_wall"
+FAILURE_CAPTCHA = "captcha"
+FAILURE_DELETED_NOTE = "deleted_note"
+FAILURE_DRIVER_CRASH = "driver_crash"
+FAILURE_UNKNOWN = "unknown"
+FAILURE_CLASSES = (FAILURE_TIMEOUT, FAILURE_MISSING_ELEMENT, FAILURE_LOGIN_WALL, FAILURE_CAPTCHA,
+                   FAILURE_DELETED_NOTE, FAILURE_DRIVER_CRASH, FAILURE_UNKNOWN)
+RETRYABLE_FAILURES = frozenset({FAILURE_TIMEOUT, FAILURE_MISSING_ELEMENT, FAILURE_CAPTCHA,
+                                FAILURE_DRIVER_CRASH, FAILURE_UNKNOWN})
+
+# 每次运行中一个笔记最多尝试的次数（包括第一次）
+MAX_ATTEMPTS = 3
+# 退避时间：第 n 次失败后等待 RETRY_BASE_SECONDS * 2^(n-1) 秒，最多 RETRY_MAX_SECONDS 秒
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 120.0
+
+# 笔记状态
+TASK_RUNNING = "running"
+TASK_DONE = "done"
+TASK_RETRY = "retry"
+TASK_FAILED = "failed"
+
+# 浏览器已经不可用时错误信息中常见的内容
+DRIVER_CRASH_MARKERS = (
+    "chrome not reachable", "disconnected", "session deleted", "invalid session id",
+    "no such window", "target window already closed", "tab crashed", "connection refused",
+    "max retries exceeded",
+)
+
+# 检查当前页面是验证码页、登录页还是已删除笔记的提示页
+PAGE_STATE_SCRIPT = """
+const text = document.body ? document.body.innerText.slice(0, 2000) : '';
+const href = location.href;
+if (/captcha|verify/i.test(href) || /安全验证|滑块验证|请完成验证|验证码/.test(text) && !document.querySelector('#noteContainer')) {
+    return 'captcha';
+}
+if (/\\/login|website-login/.test(href) || /登录后查看|扫码登录|请先登录/.test(text) && !document.querySelector('#noteContainer')) {
+    return 'login_wall';
+}
+if (/\\/404|error_code=/.test(href) || /笔记不存在|笔记已被删除|当前笔记暂时无法浏览|内容已失效|你访问的页面不见了/.test(text)) {
+    return 'deleted_note';
+}
+return null;
+"""
+
+
+class NoteUnavailable(Exception):
+    """页面是验证码页、登录页或已删除笔记的提示页，failure 为失败原因"""
+
+    def __init__(self, failure, message):
+        super().__init__(message)
+        self.failure = failure
+
+
+def check_note_page(driver):
+    """页面要求验证码、要求登录或笔记已删除时抛出 NoteUnavailable"""
+    try:
+        state = driver.execute_script(PAGE_STATE_SCRIPT)
+    except Exception:
+        return
+    if state == FAILURE_CAPTCHA:
+        raise NoteUnavailable(state, "页面要求完成验证码")
+    if state == FAILURE_LOGIN_WALL:
+        raise NoteUnavailable(state, "页面要求登录")
+    if state == FAILURE_DELETED_NOTE:
+        raise NoteUnavailable(state, "笔记已删除或无法浏览")
+
+
+def _is_driver_crash(error):
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException, ConnectionError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in DRIVER_CRASH_MARKERS)
+
+
+def classify_failure(error, driver=None):
+    """按异常和当前页面判断失败原因，返回 FAILURE_CLASSES 中的一项
+
+    同样是找不到元素，在登录页或笔记删除提示页上发生时按页面状态归类。
+    """
+    if isinstance(error, NoteUnavailable):
+        return error.failure
+    if _is_driver_crash(error):
+        return FAILURE_DRIVER_CRASH
+    if driver is not None:
+        try:
+            check_note_page(driver)
+        except NoteUnavailable as e:
+            return e.failure
+    if isinstance(error, (TimeoutException, TimeoutError)):
+        return FAILURE_TIMEOUT
+    if isinstance(error, (NoSuchElementException, StaleElementReferenceException,
+                          ElementNotInteractableException, ElementClickInterceptedException)):
+        return FAILURE_MISSING_ELEMENT
+    if isinstance(error, WebDriverException) and "timeout" in str(error).lower():
+        return FAILURE_TIMEOUT
+    return FAILURE_UNKNOWN
+
+
+def driver_alive(driver):
+    """浏览器是否还能执行脚本"""
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+
+def retry_delay(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS, rng=random):
+    """第 attempt 次失败后等待的秒数：指数退避，在一半到全部之间随机抖动，避免同时重试"""
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    note TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    total_attempts INTEGER NOT NULL DEFAULT 0,
+    failure TEXT,
+    error TEXT,
+    next_at REAL,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    note TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    failure TEXT,
+    error TEXT,
+    started REAL NOT NULL,
+    seconds REAL
+);
+CREATE INDEX IF NOT EXISTS attempts_failure ON attempts (failure);
+"""
+
+
+class RetryStore:
+    """按笔记记录尝试次数和失败原因的 SQLite 存储
+
+    attempts 是本次运行的尝试次数，total_attempts 是所有运行的累计值；
+    每次运行开始时调用 begin_run，本次运行中还没有尝试过的笔记在第一次尝试时
+    从 1 开始计数，所以不需要预先知道所有笔记。每个线程使用自己的连接。
+    """
+
+    def __init__(self, path=RETRY_DB_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._started = {}
+        self._run_started = time.time()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql, *params):
+        return self._connection().execute(sql, params)
+
+    def begin_run(self):
+        """新的一次运行：之后的尝试重新计数，上次运行留下的重试不再安排"""
+        self._run_started = time.time()
+        self._write("UPDATE tasks SET status = ?, next_at = NULL WHERE status = ?", TASK_FAILED, TASK_RETRY)
+
+    def start(self, key, url, index):
+        """开始一次尝试，返回本次运行中的第几次"""
+        now = time.time()
+        self._write("INSERT INTO tasks (note, url, idx, status, updated) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (note) DO UPDATE SET url = excluded.url, idx = excluded.idx",
+                    key, url, index, TASK_RUNNING, now)
+        # 本次运行开始后没有更新过的笔记是第一次尝试
+        self._write("UPDATE tasks SET status = ?, attempts = CASE WHEN updated < ? THEN 1 ELSE attempts + 1 END, "
+                    "total_attempts = total_attempts + 1, next_at = NULL, updated = ? WHERE note = ?",
+                    TASK_RUNNING, self._run_started, now, key)
+        attempt = self._write("SELECT total_attempts, attempts FROM tasks WHERE note = ?", key).fetchone()
+        with self._lock:
+            self._started[key] = (attempt[0], now)
+        return attempt[1]
+
+    def _record_attempt(self, key, failure=None, error=None):
+        with self._lock:
+            attempt, started = self._started.pop(key, (0, time.time()))
+        self._write("INSERT INTO attempts (note, attempt, failure, error, started, seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                    key, attempt, failure, error, started, round(time.time() - started, 3))
+
+    def succeed(self, key):
+        self._record_attempt(key)
+        self._write("UPDATE tasks SET status = ?, failure = NULL, error = NULL, updated = ? WHERE note = ?",
+                    TASK_DONE, time.time(), key)
+
+    def fail(self, key, failure, error):
+        """记录失败，可以重试时安排下一次尝试的时间并返回等待秒数，否则返回 None"""
+        error = str(error)[:200]
+        self._record_attempt(key, failure, error)
+        now = time.time()
+        attempts = self._write("SELECT attempts FROM tasks WHERE note = ?", key).fetchone()
+        attempts = attempts[0] if attempts else self.max_attempts
+        if failure in RETRYABLE_FAILURES and attempts < self.max_attempts:
+            delay = retry_delay(attempts)
+            self._write("UPDATE tasks SET status = ?, failure = ?, error = ?, next_at = ?, updated = ? WHERE note = ?",
+                        TASK_RETRY, failure, error, now + delay, now, key)
+            return delay
+        self._write("UPDATE tasks SET status = ?, failure = ?, error = ?, next_at = NULL, updated = ? WHERE note = ?",
+                    TASK_FAILED, failure, error, now, key)
+        return None
+
+    def status(self, key):
+        """笔记的当前状态（TASK_*），没有记录时返回 None"""
+        row = self._write("SELECT status FROM tasks WHERE note = ?", key).fetchone()
+        return row[0] if row else None
+
+    def next_retry_at(self):
+        """最早的重试时间，没有等待重试的笔记时返回 None"""
+        return self._write("SELECT MIN(next_at) FROM tasks WHERE status = ?", TASK_RETRY).fetchone()[0]
+
+    def due_tasks(self, now=None):
+        """已经到重试时间的 (序号, 链接) 列表，按序号排列"""
+        now = time.time() if now is None else now
+        rows = self._write("SELECT idx, url FROM tasks WHERE status = ? AND next_at <= ? ORDER BY idx",
+                           TASK_RETRY, now).fetchall()
+        return [tuple(row) for row in rows]
+
+    def failure_counts(self, since=None):
+        """各类失败的次数（since 之后开始的尝试），没有失败的类别不出现"""
+        rows = self._write("SELECT failure, COUNT(*) FROM attempts WHERE failure IS NOT NULL AND started >= ? "
+                           "GROUP BY failure", since or 0).fetchall()
+        return dict(rows)
+
+    def status_counts(self):
+        return dict(self._write("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+
+def run_with_retries(tasks, retry_store, run_round, stop_event=None):
+    """先处理全部任务，然后按退避时间分批重试失败的任务
+
+    run_round(tasks) 处理一批 (序号, 链接)；每个任务的成功或失败由处理函数
+    记录到 retry_store。等待重试时不占用浏览器。
+    """
+    run_round(tasks)
+    while not (stop_event and stop_event.is_set()):
+        next_at = retry_store.next_retry_at()
+        if next_at is None:
+            return
+        wait = next_at - time.time()
+        if wait > 0:
+            print(f"{wait:.1f} 秒后重试失败的笔记...")
+            if stop_event:
+                if stop_event.wait(wait):
+                    return
+            else:
+                time.sleep(wait)
+        due = retry_store.due_tasks()
+        if due:
+            print(f"重试 {len(due)} 个失败的笔记")
+            run_round(due)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else RETRY_DB_PATH
+    if not os.path.exists(path):
+        print(f"没有找到重试记录: {path}")
+        return 1
+    store = RetryStore(path)
+    counts = store.failure_counts()
+    total = sum(counts.values())
+    print(f"失败次数: {total}")
+    for failure in FAILURE_CLASSES:
+        if counts.get(failure):
+            print(f"  {failure}: {counts[failure]}")
+    print("笔记状态: " + "，".join(f"{status} {count}" for status, count in sorted(store.status_counts().items())))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
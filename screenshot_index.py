@@ -0,0 +1,183 @@
+"""输出目录的内存索引：截图保存时增量更新，文件系统扫描只作为兜底"""
+import bisect
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SCREENSHOT_DIR = "./screenshot"
+SCREENSHOT_EXTENSIONS = (".png",)
+# 兜底全量扫描的最短间隔（秒）
+RESCAN_INTERVAL = 60
+# 目录被修改后两次扫描之间的最短间隔（秒）：截图正在写入时目录一直在变化，
+# 这些文件由写入方直接登记，扫描只用来发现外部的增删
+EXTERNAL_RESCAN_INTERVAL = 5
+
+
+class ScreenshotIndex:
+    """截图文件索引
+
+    文件名按字典序保存在有序列表里，可以直接分页；每次变化都会让 generation
+    加一，客户端可以用它作为游标只获取变化的部分，也可以作为 ETag。
+    变化按 generation 顺序记录，since() 只需要查看游标之后的部分。
+
+    截图由写入方（FramePipeline）保存后直接调用 add() 登记。目录的修改时间与最后
+    一次已知的不一致（有别的程序增删了文件）时，最多每 EXTERNAL_RESCAN_INTERVAL 秒
+    重新扫描一次整个目录；距离上次扫描超过 RESCAN_INTERVAL 时也会扫描一次。
+    """
+
+    def __init__(self, folder=SCREENSHOT_DIR, extensions=SCREENSHOT_EXTENSIONS):
+        self.folder = folder
+        self.extensions = tuple(extensions)
+        self.generation = 0
+        self._instance = uuid.uuid4().hex[:8]  # 区分不同进程的 generation
+        self._entries = {}   # 文件名 -> 条目
+        self._names = []     # 有序文件名
+        self._changes = OrderedDict()  # 文件名 -> 最后一次变化的 generation，按 generation 排列
+        self._dir_mtime = None
+        self._last_scan = 0.0
+        self._lock = threading.RLock()
+        self.rescan()
+
+    @property
+    def etag(self):
+        """当前列表的 ETag 值（不含引号）"""
+        return f"{self._instance}-{self.generation}"
+
+    def _accepts(self, filename):
+        return filename.endswith(self.extensions) and not filename.startswith(".")
+
+    def _put(self, filename, stat, sha256=None):
+        """新增或更新条目，调用方需持有锁
+
+        version 在文件内容变化时一定会变：已知哈希时取哈希前缀，否则由修改时间和大小组成，
+        用于缩略图和原图 URL 的缓存版本。
+        """
+        self.generation += 1
+        if filename not in self._entries:
+            bisect.insort(self._names, filename)
+        self._record_change(filename)
+        version = sha256[:16] if sha256 else f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        self._entries[filename] = {
+            "filename": filename,
+            "path": f"/screenshots/{filename}",
+            "thumbnail": f"/thumbnails/{filename}?v={version}",
+            "timestamp": stat.st_mtime,
+            "size": stat.st_size,
+            "version": version,
+            "sha256": sha256,
+            "generation": self.generation,
+        }
+
+    def _drop(self, filename):
+        """删除条目，调用方需持有锁"""
+        if filename not in self._entries:
+            return
+        self.generation += 1
+        del self._entries[filename]
+        self._names.pop(bisect.bisect_left(self._names, filename))
+        self._record_change(filename)
+
+    def _record_change(self, filename):
+        """把文件移到变化记录的末尾，调用方需持有锁"""
+        self._changes[filename] = self.generation
+        self._changes.move_to_end(filename)
+
+    def _remember_dir_mtime(self):
+        try:
+            self._dir_mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            self._dir_mtime = None
+
+    def add(self, path, sha256=None):
+        """截图保存后调用，把文件加入索引"""
+        filename = os.path.basename(path)
+        if not self._accepts(filename):
+            return
+        try:
+            stat = os.stat(os.path.join(self.folder, filename))
+        except OSError:
+            return
+        with self._lock:
+            self._put(filename, stat, sha256)
+            self._remember_dir_mtime()
+
+    def rescan(self):
+        """全量扫描目录，与索引对比后增量更新"""
+        with self._lock:
+            self._remember_dir_mtime()
+            self._last_scan = time.monotonic()
+            found = {}
+            try:
+                with os.scandir(self.folder) as entries:
+                    for entry in entries:
+                        if entry.is_file() and self._accepts(entry.name):
+                            found[entry.name] = entry.stat()
+            except OSError:
+                pass
+
+            for filename in list(self._entries):
+                if filename not in found:
+                    self._drop(filename)
+            for filename, stat in found.items():
+                current = self._entries.get(filename)
+                if current is None or current["timestamp"] != stat.st_mtime or current["size"] != stat.st_size:
+                    self._put(filename, stat)
+
+    def refresh(self):
+        """目录被外部修改或距离上次扫描太久时重新扫描"""
+        try:
+            dir_mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        elapsed = time.monotonic() - self._last_scan
+        if elapsed > RESCAN_INTERVAL or (dir_mtime != self._dir_mtime and elapsed > EXTERNAL_RESCAN_INTERVAL):
+            self.rescan()
+
+    def get(self, filename):
+        """单个文件的条目（含内部字段），不在索引中时返回 None"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            return dict(entry) if entry else None
+
+    def set_sha256(self, filename, sha256, version):
+        """记录按需计算出的文件哈希，version 不一致说明文件已经变化，忽略"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry and entry["version"] == version:
+                entry["sha256"] = sha256
+
+    def __len__(self):
+        return len(self._names)
+
+    def all(self):
+        """按文件名排序的全部条目"""
+        return self.page(0, None)
+
+    def page(self, offset=0, limit=None, reverse=False):
+        """分页读取，reverse 为真时从最后一个文件开始"""
+        with self._lock:
+            names = self._names[::-1] if reverse else self._names
+            end = None if limit is None else offset + limit
+            return [self._public(self._entries[name]) for name in names[offset:end]]
+
+    def since(self, cursor):
+        """返回 generation 大于 cursor 的新增/更新条目和删除的文件名"""
+        with self._lock:
+            changed = []
+            removed = []
+            for name, generation in reversed(self._changes.items()):
+                if generation <= cursor:
+                    break
+                if name in self._entries:
+                    changed.append(name)
+                else:
+                    removed.append(name)
+            changed.sort()
+            removed.reverse()
+            return [self._public(self._entries[name]) for name in changed], removed
+
+    @staticmethod
+    def _public(entry):
+        return {key: entry[key] for key in ("filename", "path", "thumbnail", "timestamp", "size", "version")}
@@ -0,0 +1,33 @@
+"""请求拦截规则表：off 总是存在，未知规则集报错"""
+import json
+
+import pytest
+
+from blocking import (BLOCK_PROFILE_OFF, BLOCK_PROFILES_FILE, DEFAULT_BLOCK_PROFILE, get_block_profile,
+                      load_block_profiles)
+
+
+def test_load_keeps_only_string_patterns(tmp_path):
+    path = tmp_path / "block_profiles.json"
+    path.write_text(json.dumps({
+        "strict": {"deny": ["*.mp4*", "", 3], "allow": ["*/api/sns/*"]},
+        "broken": ["*.mp4*"],
+    }), encoding="utf-8")
+
+    profiles = load_block_profiles(str(path))
+    assert set(profiles) == {BLOCK_PROFILE_OFF, "strict"}
+    assert profiles["strict"] == {"deny": ["*.mp4*"], "allow": ["*/api/sns/*"]}
+    assert profiles[BLOCK_PROFILE_OFF] == {"deny": [], "allow": []}
+
+
+def test_missing_file_still_has_off(tmp_path):
+    assert load_block_profiles(str(tmp_path / "missing.json")) == {BLOCK_PROFILE_OFF: {"deny": [], "allow": []}}
+
+
+def test_get_unknown_profile_raises(tmp_path):
+    with pytest.raises(ValueError):
+        get_block_profile("strict", str(tmp_path / "missing.json"))
+
+
+def test_bundled_default_profile_blocks_something():
+    assert get_block_profile(DEFAULT_BLOCK_PROFILE, BLOCK_PROFILES_FILE)["deny"]
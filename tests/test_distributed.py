@@ -0,0 +1,101 @@
+"""SQLite 队列后端：租约过期后可以被重新领取，领取次数用完后标记为失败"""
+import pytest
+
+import distributed
+from distributed import (
+    QueueBackend, SQLiteQueueBackend, open_backend,
+    LEASE_DONE, LEASE_FAILED, LEASE_QUEUED, TASK_CAPTURED, TASK_FAILED, TASK_PENDING,
+)
+
+URLS = [f"https://www.xiaohongshu.com/explore/{i:024x}" for i in range(1, 6)]
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(distributed, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteQueueBackend(str(tmp_path / "queue.db"), max_attempts=2)
+
+
+def test_create_job_splits_urls_into_leases(backend, clock):
+    job_id = backend.create_job(URLS, {"max_pages": 3}, lease_size=2)
+    view = backend.job_view(job_id)
+    assert view["total"] == 5
+    assert view["tasks"] == {TASK_PENDING: 5}
+    assert view["leases"] == {LEASE_QUEUED: 3}
+
+    lease = backend.claim("w1", job_id=job_id)
+    assert lease.tasks == [(1, URLS[0]), (2, URLS[1])]
+    assert lease.options == {"max_pages": 3}
+    assert lease.attempts == 1
+
+
+def test_leased_work_is_not_claimed_twice_until_it_expires(backend, clock):
+    backend.create_job(URLS[:2], lease_size=2)
+    lease = backend.claim("w1", lease_seconds=60)
+    assert backend.claim("w2", lease_seconds=60) is None
+
+    # 心跳延长有效期
+    clock.now += 50
+    assert backend.heartbeat("w1", [lease.id], lease_seconds=60) == {lease.id}
+    clock.now += 50
+    assert backend.claim("w2", lease_seconds=60) is None
+
+    # 工作端停止发送心跳，过期后由别的工作端领取，已完成的 URL 不再分配
+    backend.start_task(lease.job_id, 1, "w1")
+    backend.finish_task(lease.job_id, 1, 2)
+    clock.now += 61
+    again = backend.claim("w2", lease_seconds=60)
+    assert again.id == lease.id
+    assert again.tasks == [(2, URLS[1])]
+    assert again.attempts == 2
+    # 原来的工作端已经失去租约
+    assert backend.heartbeat("w1", [lease.id]) == set()
+    assert not backend.complete("w1", lease.id)
+    assert backend.complete("w2", lease.id)
+    assert backend.job_view(lease.job_id)["leases"] == {LEASE_DONE: 1}
+
+
+def test_lease_fails_after_max_attempts(backend, clock):
+    job_id = backend.create_job(URLS[:2], lease_size=2)
+    backend.finish_task(job_id, 1, 1)
+    for worker in ("w1", "w2"):
+        assert backend.claim(worker, lease_seconds=10) is not None
+        clock.now += 11
+    # 两次领取都过期，第三次领取时标记为失败，未完成的 URL 一并失败
+    assert backend.claim("w3", lease_seconds=10) is None
+    view = backend.job_view(job_id)
+    assert view["leases"] == {LEASE_FAILED: 1}
+    assert view["tasks"] == {TASK_CAPTURED: 1, TASK_FAILED: 1}
+
+
+def test_release_requeues_without_waiting_for_expiry(backend, clock):
+    backend.create_job(URLS[:1])
+    lease = backend.claim("w1")
+    backend.release("w1", lease.id)
+    assert backend.claim("w2").id == lease.id
+
+
+def test_open_backend_and_abstract_interface(tmp_path):
+    assert isinstance(open_backend(str(tmp_path / "q.db")), SQLiteQueueBackend)
+    with pytest.raises(ValueError):
+        open_backend("redis://localhost")
+
+    class Incomplete(QueueBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
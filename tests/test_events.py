@@ -0,0 +1,56 @@
+"""事件环形缓冲区：按条数和大小丢弃最早的事件，游标落后时能知道错过了多少"""
+from events import EventHub, EVENT_LOG, EVENT_OVERHEAD
+
+
+def test_evicts_oldest_events_over_max_events():
+    hub = EventHub(max_events=3)
+    for i in range(5):
+        hub.publish(EVENT_LOG, {"text": str(i)})
+
+    events, cursor = hub.read_since(0)
+    assert [event[0] for event in events] == [3, 4, 5]
+    assert [event[2]["text"] for event in events] == ["2", "3", "4"]
+    assert cursor == 5
+    assert hub.first_seq == 3
+    assert hub.stats()["dropped_events"] == 2
+
+
+def test_evicts_by_size_but_keeps_latest_event():
+    hub = EventHub(max_events=100, max_bytes=EVENT_OVERHEAD * 2 + 40)
+    hub.publish(EVENT_LOG, {"text": "a"})
+    hub.publish(EVENT_LOG, {"text": "b"})
+    hub.publish(EVENT_LOG, {"text": "c"})
+    assert [event[2]["text"] for event in hub.read_since(0)[0]] == ["b", "c"]
+
+    # 单个事件超过上限时仍然保留，客户端至少能读到最新的事件
+    hub.publish(EVENT_LOG, {"text": "x" * 1000})
+    assert [event[0] for event in hub.read_since(0)[0]] == [4]
+    assert hub.stats()["bytes"] <= EVENT_OVERHEAD + 1010
+
+
+def test_missed_counts_events_dropped_after_cursor():
+    hub = EventHub(max_events=2)
+    assert hub.missed(0) == 0
+    for i in range(6):
+        hub.publish(EVENT_LOG, {"text": str(i)})
+
+    # 缓冲区中只剩 5、6
+    assert hub.missed(0) == 4
+    assert hub.missed(3) == 1
+    assert hub.missed(4) == 0
+    assert hub.missed(6) == 0
+    # 落后的游标直接从缓冲区中最早的事件继续
+    events, cursor = hub.read_since(1)
+    assert [event[0] for event in events] == [5, 6]
+    assert cursor == 6
+
+
+def test_tail_cursor_and_limit():
+    hub = EventHub(max_events=10)
+    for i in range(8):
+        hub.publish(EVENT_LOG, {"text": str(i)})
+    cursor = hub.tail_cursor(3)
+    assert cursor == 5
+    events, cursor = hub.read_since(cursor, limit=2)
+    assert [event[0] for event in events] == [6, 7]
+    assert hub.read_since(cursor)[0][0][0] == 8
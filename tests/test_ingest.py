@@ -0,0 +1,74 @@
+"""链接读取：规范化笔记链接，按笔记 ID 去重，缓冲区内的重复链接改用较新的 token"""
+import ingest
+from ingest import UrlIngestor, extract_url, iter_text_lines, normalize_url
+
+NOTE = "64a1b2c3d4e5f6a7b8c9d0e1"
+OTHER = "f" * 24
+
+
+def note_url(note_id, token=None, extra=""):
+    url = f"https://www.xiaohongshu.com/explore/{note_id}"
+    query = "&".join(part for part in (f"xsec_token={token}" if token else "", extra) if part)
+    return url + ("?" + query if query else "")
+
+
+def test_extract_url_from_share_text():
+    assert extract_url("  \n") is None
+    text = f"看看这篇笔记 {note_url(NOTE)}，复制打开小红书"
+    assert extract_url(text) == note_url(NOTE)
+    assert extract_url("not a link") == "not a link"
+
+
+def test_normalize_url_keeps_only_access_params():
+    key, url = normalize_url(f"https://www.xiaohongshu.com/discovery/item/{NOTE.upper()}"
+                             "?xsec_token=t1&xsec_source=pc_share&utm_source=x")
+    assert key == NOTE
+    assert url == note_url(NOTE, "t1", "xsec_source=pc_share")
+    assert normalize_url("https://example.com/a?b=1") == ("example.com/a", "https://example.com/a?b=1")
+
+
+def test_ingest_drops_duplicates_in_order():
+    ingestor = UrlIngestor()
+    lines = [note_url(NOTE), "", note_url(OTHER), note_url(NOTE, extra="utm_source=x")]
+    assert list(ingestor.ingest(lines)) == [note_url(NOTE), note_url(OTHER)]
+    assert (ingestor.lines, ingestor.urls, ingestor.duplicates) == (4, 3, 1)
+    assert "去掉 1 个重复链接" in ingestor.summary()
+
+
+def test_ingest_uses_newer_token_within_lookahead():
+    ingestor = UrlIngestor(lookahead=10)
+    lines = [note_url(NOTE, "old"), note_url(OTHER), note_url(NOTE, "new")]
+    assert list(ingestor.ingest(lines)) == [note_url(NOTE, "new"), note_url(OTHER)]
+    assert ingestor.token_updates == 1
+
+
+def test_ingest_streams_after_lookahead():
+    read = []
+
+    def lines():
+        for i in range(1, 11):
+            read.append(i)
+            yield note_url(f"{i:024x}")
+
+    ingestor = UrlIngestor(lookahead=3)
+    urls = ingestor.ingest(lines())
+    assert next(urls) == note_url(f"{1:024x}")
+    assert len(read) == 4  # 只读到缓冲区满了为止
+    assert len(list(urls)) == 9
+
+
+def test_ingest_after_lookahead_keeps_first_token():
+    # 已经交出的笔记再次出现时只计为重复，不再交出，也不能再更新 token
+    ingestor = UrlIngestor(lookahead=1)
+    lines = [note_url(NOTE, "old"), note_url(OTHER), note_url("e" * 24), note_url(NOTE, "new")]
+    assert list(ingestor.ingest(lines))[0] == note_url(NOTE, "old")
+    assert ingestor.duplicates == 1
+    assert ingestor.token_updates == 0
+
+
+def test_iter_lines_sources(tmp_path):
+    path = tmp_path / "url.txt"
+    path.write_text(f"{note_url(NOTE)}\n{note_url(OTHER)}\n", encoding="utf-8")
+    assert len(list(ingest.iter_lines(str(path)))) == 2
+    assert list(ingest.iter_lines(str(tmp_path / "missing.txt"))) == []
+    assert list(iter_text_lines("a\nb")) == ["a\n", "b"]
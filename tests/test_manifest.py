@@ -0,0 +1,82 @@
+"""运行清单：只有所有页都保存完好的笔记才算完成，重放后状态一致"""
+import os
+
+from manifest import RunManifest, note_key, parse_note_id
+
+NOTE = "64a1b2c3d4e5f6a7b8c9d0e1"
+URL = f"https://www.xiaohongshu.com/explore/{NOTE}?xsec_token=abc"
+
+
+def save_frame(manifest, folder, page, data=b"png"):
+    path = os.path.join(folder, f"1_{page}.png")
+    with open(path, "wb") as f:
+        f.write(data)
+    manifest.record_frame(NOTE, page, {"path": path, "size": len(data), "sha256": "0" * 64})
+    return path
+
+
+def test_note_key_uses_note_id():
+    assert parse_note_id(URL) == NOTE
+    assert note_key(URL) == note_key(f"https://www.xiaohongshu.com/discovery/item/{NOTE.upper()}")
+    assert note_key("https://example.com/a?b=1") == "example.com/a"
+
+
+def test_is_done_requires_every_frame(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.jsonl"))
+    manifest.start_note(NOTE, URL, 1)
+    save_frame(manifest, str(tmp_path), 1)
+    assert not manifest.is_done(NOTE)  # 还没有结束采集
+
+    manifest.finish_note(NOTE, 2)
+    assert not manifest.is_done(NOTE)  # 第 2 页的后处理还没完成
+
+    save_frame(manifest, str(tmp_path), 2)
+    assert manifest.is_done(NOTE)
+    # 重新打开清单，重放后状态相同
+    assert RunManifest(manifest.path).is_done(NOTE)
+
+
+def test_is_done_checks_files_on_disk(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.jsonl"))
+    manifest.start_note(NOTE, URL, 1)
+    path = save_frame(manifest, str(tmp_path), 1)
+    manifest.finish_note(NOTE, 1)
+    assert manifest.is_done(NOTE)
+
+    with open(path, "ab") as f:
+        f.write(b"truncated")  # 大小与记录不一致
+    assert not manifest.is_done(NOTE)
+    os.unlink(path)
+    assert not manifest.is_done(NOTE)
+
+
+def test_failed_or_restarted_note_is_not_done(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.jsonl"))
+    manifest.start_note(NOTE, URL, 1)
+    save_frame(manifest, str(tmp_path), 1)
+    manifest.finish_note(NOTE, 1)
+    manifest.start_note(NOTE, URL, 1)  # 重新开始时之前的记录作废
+    assert not manifest.is_done(NOTE)
+    manifest.fail_note(NOTE, "timeout")
+    assert not manifest.is_done(NOTE)
+
+
+def test_pending_tasks_skip_done_notes_and_keep_indexes(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.jsonl"))
+    manifest.start_note(NOTE, URL, 1)
+    save_frame(manifest, str(tmp_path), 1)
+    manifest.finish_note(NOTE, 1)
+    other = "https://www.xiaohongshu.com/explore/" + "f" * 24
+
+    tasks, skipped = manifest.pending_tasks([URL, other])
+    assert tasks == [(2, other)]
+    assert skipped == 1
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / "manifest.jsonl"
+    manifest = RunManifest(str(path))
+    manifest.start_note(NOTE, URL, 1)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"event": "finish", "note": ')
+    assert RunManifest(str(path)).notes[NOTE]["status"] == "running"
@@ -0,0 +1,49 @@
+"""指标：带标签的计数器、累计分桶的直方图和 Prometheus 文本格式"""
+from metrics import Counter, Histogram, MetricsRegistry, _format_value
+
+
+def test_counter_counts_per_label():
+    counter = Counter("xhs_test_total", "测试", labels=("result",))
+    counter.inc(result="done")
+    counter.inc(2, result="done")
+    counter.inc(result="failed")
+
+    assert counter.value(result="done") == 3
+    assert counter.value(result="failed") == 1
+    assert counter.value(result="skipped") == 0
+    assert counter.items() == [(("done",), 3), (("failed",), 1)]
+    assert counter.samples()[0] == ("xhs_test_total", '{result="done"}', 3)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("xhs_test_seconds", "测试", labels=("stage",), buckets=(1, 0.1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, stage="encode")
+
+    samples = {(name, labels): value for name, labels, value in histogram.samples()}
+    assert samples[("xhs_test_seconds_bucket", '{stage="encode",le="0.1"}')] == 1
+    assert samples[("xhs_test_seconds_bucket", '{stage="encode",le="1"}')] == 3
+    assert samples[("xhs_test_seconds_bucket", '{stage="encode",le="+Inf"}')] == 4
+    assert samples[("xhs_test_seconds_sum", '{stage="encode"}')] == 6.05
+    assert samples[("xhs_test_seconds_count", '{stage="encode"}')] == 4
+    assert histogram.snapshot() == {("encode",): (6.05, 4)}
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("xhs_test_total", "测试").inc(2.0)
+    registry.gauge("xhs_test_gauge", "当前值", lambda: {"a": 1}, labels=("name",))
+    registry.gauge("xhs_test_broken", "读取失败", lambda: 1 / 0)
+
+    assert registry.render().splitlines() == [
+        "# HELP xhs_test_total 测试",
+        "# TYPE xhs_test_total counter",
+        "xhs_test_total 2",
+        "# HELP xhs_test_gauge 当前值",
+        "# TYPE xhs_test_gauge gauge",
+        'xhs_test_gauge{name="a"} 1',
+        "# HELP xhs_test_broken 读取失败",
+        "# TYPE xhs_test_broken gauge",
+    ]
+    assert _format_value(float("inf")) == "+Inf"
+    assert _format_value(0.25) == "0.25"
@@ -0,0 +1,33 @@
+"""弹窗表格：跳过格式不正确的条目，默认范围为 every"""
+import json
+
+from overlays import OVERLAYS_FILE, load_overlays
+
+
+def test_skips_invalid_entries(tmp_path):
+    path = tmp_path / "overlays.json"
+    path.write_text(json.dumps([
+        {"name": "login_popup", "detect": "//div", "click": "//button"},
+        {"name": "guide", "scope": "first", "detect": "//span"},
+        {"name": "no_detect"},
+        {"detect": "//div"},
+        {"name": "bad_scope", "scope": "sometimes", "detect": "//div"},
+        "not an entry",
+    ]), encoding="utf-8")
+
+    overlays = load_overlays(str(path))
+    assert [(entry["name"], entry["scope"]) for entry in overlays] == [("login_popup", "every"), ("guide", "first")]
+    assert overlays[0]["click"] == "//button"
+
+
+def test_missing_or_broken_file_returns_empty(tmp_path):
+    assert load_overlays(str(tmp_path / "missing.json")) == []
+    path = tmp_path / "broken.json"
+    path.write_text("[{", encoding="utf-8")
+    assert load_overlays(str(path)) == []
+
+
+def test_bundled_table_is_valid():
+    with open(OVERLAYS_FILE, encoding="utf-8") as f:
+        entries = json.load(f)
+    assert len(load_overlays(OVERLAYS_FILE)) == len(entries)
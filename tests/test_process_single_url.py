@@ -0,0 +1,107 @@
+"""用假的 driver 跑一遍 process_single_url，不需要 Chrome"""
+import base64
+import io
+import os
+
+from PIL import Image
+
+import main
+from capture import FrameCapture
+from compositor import Compositor, CANVAS_SIZE, CONTENT_SIZE
+
+
+class StubDriver:
+    """只实现 process_single_url 用到的 WebDriver 方法"""
+
+    def __init__(self, size, scroll=(0, 0)):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "white").save(buffer, "PNG")
+        self.frame = base64.b64encode(buffer.getvalue()).decode()
+        self.scroll = scroll
+        self.visited = []
+        self.clips = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def execute_async_script(self, script, *args):
+        return True
+
+    def execute_script(self, script, *args):
+        if script == main.CAROUSEL_POSITION_SCRIPT:
+            return [1, 1]
+        return None
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Page.getLayoutMetrics":
+            return {"cssVisualViewport": {"pageX": self.scroll[0], "pageY": self.scroll[1]}}
+        assert command == "Page.captureScreenshot"
+        self.clips.append(params.get("clip"))
+        return {"data": self.frame}
+
+    def get_screenshot_as_png(self):
+        return base64.b64decode(self.frame)
+
+
+def template_images():
+    return (Image.new("RGB", (1179, 165), "red"), Image.new("RGB", (1179, 101), "blue"),
+            Image.new("RGBA", (60, 60), (0, 0, 0, 255)))
+
+
+def native_frame_size(capture):
+    """原生模式下 Chrome 返回的截图尺寸：clip 换算成设备像素"""
+    clip = capture.clip()
+    return round(clip["width"] * capture.pixel_ratio), round(clip["height"] * capture.pixel_ratio)
+
+
+def test_process_single_url_saves_native_frame(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("screenshot")
+    capture = FrameCapture()
+    driver = StubDriver(native_frame_size(capture))
+    url = "https://www.xiaohongshu.com/explore/64a1b2c3d4e5f6a7b8c9d0e1"
+
+    # 原生截图只裁切，不应重采样
+    contents = []
+    prepare_content = Compositor.prepare_content
+
+    def record_content(self, screenshot):
+        content = prepare_content(self, screenshot)
+        contents.append(content.size)
+        return content
+
+    def no_resize(self, *args, **kwargs):
+        raise AssertionError("原生截图不应缩放")
+
+    monkeypatch.setattr(Compositor, "prepare_content", record_content)
+    monkeypatch.setattr(Image.Image, "resize", no_resize)
+
+    assert main.process_single_url(driver, url, 1, *template_images(), check_guides=False, capture=capture)
+    assert driver.visited == [url]
+    assert contents == [CONTENT_SIZE]
+    with Image.open(tmp_path / "screenshot" / "1_1.png") as image:
+        assert image.size == CANVAS_SIZE
+
+
+def test_process_single_url_reports_failure(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("screenshot")
+
+    class BrokenDriver(StubDriver):
+        def get(self, url):
+            raise RuntimeError("boom")
+
+    driver = BrokenDriver((900, 1900))
+    assert not main.process_single_url(driver, "https://www.xiaohongshu.com/explore/64a1b2c3d4e5f6a7b8c9d0e1", 1,
+                                       *template_images(), check_guides=False)
+
+
+def test_native_capture_follows_scrolled_viewport():
+    # 点击下一页前按钮被滚动到视口中间，clip 应跟着视口移动
+    capture = FrameCapture()
+    driver = StubDriver(native_frame_size(capture), scroll=(0, 320))
+    capture.grab(driver)
+    clip = driver.clips[0]
+    assert clip["x"] == 0
+    assert clip["y"] == 320 + capture.clip()["y"]
+    assert (clip["width"], clip["height"]) == (capture.clip()["width"], capture.clip()["height"])
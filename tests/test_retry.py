@@ -0,0 +1,140 @@
+"""失败分类、退避时间和批次末尾的重试"""
+import threading
+
+from selenium.common.exceptions import (
+    TimeoutException, NoSuchElementException, InvalidSessionIdException, WebDriverException,
+)
+
+import retry
+from retry import (
+    RetryStore, NoteUnavailable, classify_failure, retry_delay, run_with_retries,
+    FAILURE_TIMEOUT, FAILURE_MISSING_ELEMENT, FAILURE_LOGIN_WALL, FAILURE_CAPTCHA, FAILURE_DELETED_NOTE,
+    FAILURE_DRIVER_CRASH, FAILURE_UNKNOWN, TASK_DONE, TASK_FAILED, TASK_RETRY,
+)
+
+
+class PageDriver:
+    """execute_script 返回固定的页面状态"""
+
+    def __init__(self, state=None):
+        self.state = state
+
+    def execute_script(self, script, *args):
+        return self.state
+
+
+class FixedRandom:
+    def __init__(self, value):
+        self.value = value
+
+    def uniform(self, low, high):
+        return low + (high - low) * self.value
+
+
+def test_classify_failure_by_exception():
+    assert classify_failure(TimeoutException("slow")) == FAILURE_TIMEOUT
+    assert classify_failure(TimeoutError()) == FAILURE_TIMEOUT
+    assert classify_failure(WebDriverException("script timeout")) == FAILURE_TIMEOUT
+    assert classify_failure(NoSuchElementException("gone")) == FAILURE_MISSING_ELEMENT
+    assert classify_failure(InvalidSessionIdException("x")) == FAILURE_DRIVER_CRASH
+    assert classify_failure(WebDriverException("chrome not reachable")) == FAILURE_DRIVER_CRASH
+    assert classify_failure(ValueError("?")) == FAILURE_UNKNOWN
+    assert classify_failure(NoteUnavailable(FAILURE_CAPTCHA, "验证码")) == FAILURE_CAPTCHA
+
+
+def test_classify_failure_prefers_page_state():
+    # 在登录页上找不到元素，按页面状态归类
+    error = NoSuchElementException("gone")
+    assert classify_failure(error, PageDriver(FAILURE_LOGIN_WALL)) == FAILURE_LOGIN_WALL
+    assert classify_failure(error, PageDriver(FAILURE_DELETED_NOTE)) == FAILURE_DELETED_NOTE
+    assert classify_failure(error, PageDriver(None)) == FAILURE_MISSING_ELEMENT
+    # 浏览器崩溃时不再读取页面
+    assert classify_failure(WebDriverException("disconnected"), PageDriver(FAILURE_CAPTCHA)) == FAILURE_DRIVER_CRASH
+
+
+def test_retry_delay_backs_off_with_jitter_and_cap():
+    assert retry_delay(1, rng=FixedRandom(0)) == 2.5
+    assert retry_delay(1, rng=FixedRandom(1)) == 5.0
+    assert retry_delay(3, rng=FixedRandom(1)) == 20.0
+    assert retry_delay(20, rng=FixedRandom(1)) == retry.RETRY_MAX_SECONDS
+    assert retry_delay(20, rng=FixedRandom(0)) == retry.RETRY_MAX_SECONDS / 2
+
+
+def test_store_schedules_retries_until_max_attempts(tmp_path):
+    store = RetryStore(str(tmp_path / "retry.db"), max_attempts=2)
+    store.begin_run()
+    store.start("a", "url-a", 1)
+    assert store.fail("a", FAILURE_TIMEOUT, "slow") is not None
+    assert store.status("a") == TASK_RETRY
+    assert store.due_tasks(now=store.next_retry_at()) == [(1, "url-a")]
+
+    store.start("a", "url-a", 1)
+    assert store.fail("a", FAILURE_TIMEOUT, "slow") is None
+    assert store.status("a") == TASK_FAILED
+    assert store.next_retry_at() is None
+    assert store.failure_counts() == {FAILURE_TIMEOUT: 2}
+
+
+def test_store_does_not_retry_permanent_failures(tmp_path):
+    store = RetryStore(str(tmp_path / "retry.db"))
+    store.begin_run()
+    store.start("a", "url-a", 1)
+    assert store.fail("a", FAILURE_LOGIN_WALL, "login") is None
+    assert store.status("a") == TASK_FAILED
+
+
+def test_new_run_resets_attempts_and_drops_stale_retries(tmp_path):
+    path = str(tmp_path / "retry.db")
+    store = RetryStore(path, max_attempts=2)
+    store.begin_run()
+    store.start("a", "url-a", 1)
+    store.fail("a", FAILURE_TIMEOUT, "slow")
+
+    store = RetryStore(path, max_attempts=2)
+    store.begin_run()
+    assert store.status("a") == TASK_FAILED  # 上次运行留下的重试不再安排
+    assert store.start("a", "url-a", 1) == 1
+
+
+def test_run_with_retries_retries_failed_tasks(tmp_path, monkeypatch):
+    monkeypatch.setattr(retry, "retry_delay", lambda attempt: 0.01)
+    store = RetryStore(str(tmp_path / "retry.db"))
+    store.begin_run()
+    failures = {"b": 1, "c": 5}
+    rounds = []
+
+    def run_round(tasks):
+        tasks = list(tasks)
+        rounds.append([index for index, _ in tasks])
+        for index, url in tasks:
+            store.start(url, url, index)
+            if failures.get(url, 0) > 0:
+                failures[url] -= 1
+                store.fail(url, FAILURE_TIMEOUT, "slow")
+            else:
+                store.succeed(url)
+
+    run_with_retries([(1, "a"), (2, "b"), (3, "c")], store, run_round)
+    # 重试按各自的到期时间分批，只检查每个任务的尝试次数
+    attempts = [index for batch in rounds for index in batch]
+    assert rounds[0] == [1, 2, 3]
+    assert (attempts.count(1), attempts.count(2), attempts.count(3)) == (1, 2, retry.MAX_ATTEMPTS)
+    assert store.status("b") == TASK_DONE
+    assert store.status("c") == TASK_FAILED
+
+
+def test_run_with_retries_stops_when_cancelled(tmp_path, monkeypatch):
+    monkeypatch.setattr(retry, "retry_delay", lambda attempt: 60)
+    store = RetryStore(str(tmp_path / "retry.db"))
+    store.begin_run()
+    stop_event = threading.Event()
+    rounds = []
+
+    def run_round(tasks):
+        rounds.append(list(tasks))
+        store.start("a", "a", 1)
+        store.fail("a", FAILURE_TIMEOUT, "slow")
+        stop_event.set()
+
+    run_with_retries([(1, "a")], store, run_round, stop_event=stop_event)
+    assert len(rounds) == 1
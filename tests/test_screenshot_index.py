@@ -0,0 +1,52 @@
+"""截图索引：写入方直接登记，since 只返回游标之后的变化"""
+import os
+
+import screenshot_index
+from screenshot_index import ScreenshotIndex
+
+
+def write(folder, name):
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(b"x")
+
+
+def test_since_returns_changes_after_cursor(tmp_path):
+    folder = str(tmp_path)
+    write(folder, "1_1.png")
+    index = ScreenshotIndex(folder)
+    cursor = index.generation
+
+    write(folder, "2_1.png")
+    index.add(os.path.join(folder, "2_1.png"), "ab" * 32)
+    write(folder, "0_1.png")
+    index.add(os.path.join(folder, "0_1.png"))
+    os.unlink(os.path.join(folder, "1_1.png"))
+    index.rescan()
+
+    changed, removed = index.since(cursor)
+    assert [item["filename"] for item in changed] == ["0_1.png", "2_1.png"]
+    assert removed == ["1_1.png"]
+    assert index.since(index.generation) == ([], [])
+
+
+def test_refresh_does_not_rescan_for_every_directory_change(tmp_path, monkeypatch):
+    folder = str(tmp_path)
+    index = ScreenshotIndex(folder)
+    scans = []
+    rescan = index.rescan
+    monkeypatch.setattr(index, "rescan", lambda: scans.append(1) or rescan())
+
+    # 截图由写入方登记，状态文件的创建不应让每次读取列表都扫描目录
+    write(folder, "1_1.png")
+    index.add(os.path.join(folder, "1_1.png"))
+    write(folder, "retry.db-wal")
+    index.refresh()
+    index.refresh()
+    assert scans == []
+
+    # 超过间隔后才扫描，外部新增的文件会被发现
+    write(folder, "2_1.png")
+    index._last_scan -= screenshot_index.EXTERNAL_RESCAN_INTERVAL + 1
+    index.refresh()
+    assert scans == [1]
+    assert [item["filename"] for item in index.all()] == ["1_1.png", "2_1.png"]
@@ -0,0 +1,107 @@
+"""AIMD 并发和令牌桶：正常时加性增加，遇到封禁或变慢时乘性减少，冷却期内只减一次"""
+import pytest
+
+import throttle
+from retry import FAILURE_CAPTCHA, FAILURE_LOGIN_WALL, FAILURE_TIMEOUT
+from throttle import AdaptiveThrottle, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttle, "time", clock)
+    return clock
+
+
+def finish(limiter, clock, seconds=1.0, failure=None, pages=1):
+    ticket = limiter.acquire()
+    clock.now += seconds
+    limiter.release(ticket, failure, pages)
+
+
+def test_token_bucket_spaces_out_requests(clock):
+    bucket = TokenBucket(rate=2.0, burst=1)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock.now += 10
+    assert bucket.reserve() == 0
+
+
+def test_token_bucket_pause(clock):
+    bucket = TokenBucket(rate=1.0, burst=5)
+    bucket.pause(30)
+    assert bucket.reserve() == pytest.approx(31)
+
+
+def test_successes_increase_concurrency_and_rate(clock):
+    limiter = AdaptiveThrottle(max_concurrency=4, max_rate=100, initial_rate=60)
+    assert limiter.limit == 2
+    for _ in range(10):
+        finish(limiter, clock)
+    stats = limiter.stats()
+    assert stats["limit"] == 4
+    assert stats["rate"] == 80
+    assert stats["ok"] == 10 and stats["decreases"] == 0
+    for _ in range(20):
+        finish(limiter, clock)
+    assert limiter.stats()["rate"] == 100  # 不超过上限
+
+
+def test_block_halves_and_pauses_once_per_cooldown(clock):
+    limiter = AdaptiveThrottle(max_concurrency=8, max_rate=600, initial_rate=120)
+    limiter.limit = 8.0
+    # 两个并行的笔记同时遇到验证码和登录页，只减速一次
+    first, second = limiter.acquire(), limiter.acquire()
+    clock.now += 1
+    limiter.release(first, FAILURE_CAPTCHA)
+    limiter.release(second, FAILURE_LOGIN_WALL)
+    stats = limiter.stats()
+    assert stats["limit"] == 4
+    assert limiter.rate == 60
+    assert stats["blocked"] == 2 and stats["decreases"] == 1
+    # 减速后暂停发放令牌
+    clock.slept.clear()
+    ticket = limiter.acquire()
+    assert sum(clock.slept) >= throttle.BLOCK_PAUSE_SECONDS - 1
+
+    clock.now += throttle.DECREASE_COOLDOWN + 1
+    limiter.release(ticket, FAILURE_TIMEOUT)
+    assert limiter.stats()["limit"] == 3  # 4 × 0.75
+    assert limiter.stats()["decreases"] == 2
+
+
+def test_slow_pages_decrease(clock):
+    limiter = AdaptiveThrottle(max_concurrency=8, max_rate=600, initial_rate=600)
+    limiter.limit = 8.0
+    for _ in range(3):
+        finish(limiter, clock, seconds=0.2, pages=2)  # 每页 0.1 秒作为基线
+    assert limiter.stats()["decreases"] == 0
+    for _ in range(3):
+        finish(limiter, clock, seconds=1.0, pages=2)  # 每页 0.5 秒，明显变慢
+    stats = limiter.stats()
+    assert stats["slow"] >= 1
+    assert stats["decreases"] == 1  # 冷却期内只减速一次
+    assert stats["limit"] == 6
+
+
+def test_limits_never_drop_below_minimum(clock):
+    limiter = AdaptiveThrottle(max_concurrency=2, max_rate=600, initial_rate=10)
+    for _ in range(10):
+        clock.now += throttle.DECREASE_COOLDOWN + 1
+        finish(limiter, clock, failure=FAILURE_CAPTCHA)
+    assert limiter.stats()["limit"] == 1
+    assert limiter.rate == throttle.MIN_RATE
@@ -0,0 +1,182 @@
+"""访问节奏控制：令牌桶限速 + AIMD 自适应并发
+
+浏览器越多不代表越快，访问太频繁时小红书会返回登录页或验证码页面，吞吐量反而下降。
+每个笔记开始前先向 AdaptiveThrottle 申请：同时处理的笔记数不超过当前并发上限，
+开始处理的频率不超过令牌桶的速率。笔记结束后根据结果调整：
+
+    正常完成且每页耗时没有明显变慢    并发上限加 1/上限（每轮约加 1），速率加 RATE_STEP
+    遇到登录页或验证码                并发和速率减半，并暂停 BLOCK_PAUSE_SECONDS 秒
+    超时或每页耗时明显变慢            并发和速率乘以 SLOW_FACTOR
+
+每次减速后 DECREASE_COOLDOWN 秒内不再减速，避免同一次封禁让多个并行的失败连续减半。
+这样并发和速率会停在网站能够持续接受的最高水平附近，而不是一个手动调出来的常数。
+"""
+import threading
+import time
+
+from retry import FAILURE_LOGIN_WALL, FAILURE_CAPTCHA, FAILURE_TIMEOUT
+
+# 速率（篇/分钟）：初始值、下限和默认上限
+INITIAL_RATE = 60.0
+MIN_RATE = 6.0
+MAX_RATE = 600.0
+# 每个正常完成的笔记增加的速率（篇/分钟）
+RATE_STEP = 2.0
+# 遇到登录页或验证码时的减速倍数和暂停时间（秒）
+BLOCK_FACTOR = 0.5
+BLOCK_PAUSE_SECONDS = 30.0
+# 超时或变慢时的减速倍数
+SLOW_FACTOR = 0.75
+# 每页耗时的短期均值超过基线的多少倍时认为变慢
+LATENCY_FACTOR = 1.5
+# 短期均值的平滑系数，以及基线每个样本允许上浮的比例（跟随长期变化）
+LATENCY_ALPHA = 0.3
+BASELINE_DRIFT = 0.01
+# 两次减速之间的最短间隔（秒）
+DECREASE_COOLDOWN = 10.0
+
+# 说明网站在限制访问的失败原因
+BLOCK_FAILURES = frozenset({FAILURE_LOGIN_WALL, FAILURE_CAPTCHA})
+
+
+class TokenBucket:
+    """令牌桶：rate 为每秒令牌数，最多积累 burst 个
+
+    reserve() 立即取走一个令牌并返回需要等待的秒数，令牌可以透支，
+    所以多个线程同时申请时按先后顺序错开，不会在令牌补充时一起出发。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def pause(self, seconds):
+        """接下来 seconds 秒内不发放令牌"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+    def reserve(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class Ticket:
+    """一次处理许可，release 时用来计算耗时"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+
+
+class AdaptiveThrottle:
+    """按网站的反应自动调整并发和速率
+
+    acquire() 等待并发名额和令牌，返回 Ticket；release(ticket, failure, pages)
+    在笔记结束时调用，failure 为 retry 模块的失败原因（成功时为 None）。
+    max_concurrency 通常等于浏览器数量，max_rate 为速率上限（篇/分钟）。
+    """
+
+    def __init__(self, max_concurrency=1, max_rate=MAX_RATE, initial_rate=INITIAL_RATE,
+                 min_concurrency=1, min_rate=MIN_RATE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_rate = max(min_rate, max_rate)
+        self.min_rate = min_rate
+        # 从一半的并发开始，网站正常时很快就能加到上限
+        self.limit = float(max(self.min_concurrency, self.max_concurrency // 2))
+        self.rate = min(self.max_rate, max(self.min_rate, initial_rate))
+        self.in_flight = 0
+        self.bucket = TokenBucket(self.rate / 60, burst=self.max_concurrency)
+        self._latency = None     # 每页耗时的短期均值（秒）
+        self._baseline = None    # 正常情况下的每页耗时（秒）
+        self._last_decrease = float("-inf")
+        self._counts = {"ok": 0, "blocked": 0, "slow": 0, "decreases": 0}
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        wait = self.bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return Ticket()
+
+    def release(self, ticket, failure=None, pages=1):
+        seconds = time.monotonic() - ticket.started
+        with self._cond:
+            self.in_flight -= 1
+            if failure in BLOCK_FAILURES:
+                self._counts["blocked"] += 1
+                if self._decrease(BLOCK_FACTOR, f"遇到{'登录页' if failure == FAILURE_LOGIN_WALL else '验证码'}"):
+                    self.bucket.pause(BLOCK_PAUSE_SECONDS)
+            elif failure == FAILURE_TIMEOUT:
+                self._counts["slow"] += 1
+                self._decrease(SLOW_FACTOR, "页面超时")
+            elif failure is None:
+                if self._observe_latency(seconds / max(1, pages)):
+                    self._counts["slow"] += 1
+                    self._decrease(SLOW_FACTOR, "页面变慢")
+                else:
+                    self._counts["ok"] += 1
+                    self._increase()
+            self._cond.notify_all()
+
+    def _observe_latency(self, seconds):
+        """记录每页耗时，明显高于基线时返回 True"""
+        if self._latency is None:
+            self._latency = self._baseline = seconds
+            return False
+        self._latency += LATENCY_ALPHA * (seconds - self._latency)
+        slow = self._latency > self._baseline * LATENCY_FACTOR
+        if not slow:
+            self._baseline = min(self._latency, self._baseline * (1 + BASELINE_DRIFT))
+        return slow
+
+    def _increase(self):
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self.rate = min(self.max_rate, self.rate + RATE_STEP)
+        self.bucket.set_rate(self.rate / 60)
+
+    def _decrease(self, factor, reason):
+        """乘性减速，冷却期内忽略，返回是否减速"""
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return False
+        self._last_decrease = now
+        self._counts["decreases"] += 1
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.bucket.set_rate(self.rate / 60)
+        # 短期均值重新开始统计，避免减速后立即再次判断为变慢
+        self._latency = self._baseline
+        print(f"{reason}，并发降到 {int(self.limit)}，速率降到 {self.rate:.0f} 篇/分钟")
+        return True
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counts, limit=int(self.limit), in_flight=self.in_flight, rate=round(self.rate, 1),
+                        latency=round(self._latency, 3) if self._latency is not None else None)
+
+    def summary(self):
+        """当前并发和速率的一行摘要，还没有处理过笔记时返回 None"""
+        stats = self.stats()
+        if not (stats["ok"] or stats["blocked"] or stats["slow"]):
+            return None
+        return (f"访问节奏: 并发 {stats['limit']}/{self.max_concurrency}，速率 {stats['rate']:.0f} 篇/分钟，"
+                f"减速 {stats['decreases']} 次（登录页/验证码 {stats['blocked']}，变慢 {stats['slow']}）")
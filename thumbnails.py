@@ -0,0 +1,123 @@
+"""缩略图缓存：以最终图片的 sha256 为键保存多种宽度的 WebP 缩略图，超出容量时按最近最少使用淘汰"""
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+THUMBNAIL_DIR = "./screenshot/.thumbs"
+# 生成的缩略图宽度，预览区最宽 800px，720 足够高清屏使用
+THUMBNAIL_WIDTHS = (360, 720)
+THUMBNAIL_QUALITY = 80
+# 缓存目录的容量上限
+THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def thumbnail_path(cache_dir, sha256, width):
+    """缩略图在缓存目录中的路径：按哈希前两位分子目录"""
+    return os.path.join(cache_dir, sha256[:2], f"{sha256}-{width}.webp")
+
+
+def write_thumbnails(image, sha256, cache_dir=THUMBNAIL_DIR, widths=THUMBNAIL_WIDTHS):
+    """为一张已解码的图片生成缺少的缩略图，返回 [(路径, 大小)]
+
+    可以在后处理工作进程中调用；写入先到临时文件再改名，读取方不会看到半个文件。
+    """
+    written = []
+    for width in widths:
+        path = thumbnail_path(cache_dir, sha256, width)
+        if os.path.exists(path):
+            continue
+        height = round(image.height * width / image.width)
+        thumb = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        thumb.save(temp_path, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        os.replace(temp_path, path)
+        written.append((path, os.path.getsize(path)))
+    return written
+
+
+class ThumbnailCache:
+    """缩略图缓存的容量管理
+
+    缩略图文件可能由后处理进程写入，这里只负责记账和淘汰：
+    启动时按修改时间扫描已有文件，之后通过 register() 登记新文件、
+    通过 touch() 标记最近访问，总大小超过 max_bytes 时删除最久未使用的文件。
+    """
+
+    def __init__(self, cache_dir=THUMBNAIL_DIR, widths=THUMBNAIL_WIDTHS, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.widths = tuple(widths)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._files = OrderedDict()  # 路径 -> 大小，越靠后越近使用
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        found = []
+        for root, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if filename.endswith(".tmp"):
+                    # 上次运行中断留下的临时文件
+                    self._remove(path)
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(found):
+                self._files[path] = size
+                self.total_bytes += size
+            self._evict()
+
+    def path_for(self, sha256, width):
+        return thumbnail_path(self.cache_dir, sha256, width)
+
+    def nearest_width(self, width):
+        """不小于请求宽度的最小缩略图宽度，没有时取最大的一档"""
+        for candidate in sorted(self.widths):
+            if candidate >= width:
+                return candidate
+        return max(self.widths)
+
+    def register(self, files):
+        """登记新写入的缩略图 [(路径, 大小)]，必要时淘汰旧文件"""
+        with self._lock:
+            for path, size in files:
+                self.total_bytes += size - self._files.pop(path, 0)
+                self._files[path] = size
+            self._evict()
+
+    def touch(self, path):
+        """标记缩略图最近被访问"""
+        with self._lock:
+            if path in self._files:
+                self._files.move_to_end(path)
+
+    def ensure(self, image_path, sha256, width):
+        """返回指定宽度的缩略图路径，不存在时从原图生成（用于流水线之外保存的截图）"""
+        path = self.path_for(sha256, width)
+        if not os.path.exists(path):
+            with Image.open(image_path) as img:
+                img.draft("RGB", (width, width * 4))
+                self.register(write_thumbnails(img.convert("RGB"), sha256, self.cache_dir, (width,)))
+        self.touch(path)
+        return path
+
+    def _evict(self):
+        """调用方需持有 _lock"""
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self.total_bytes -= size
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,444 @@
+"""图片合成基准测试：不需要浏览器和网络，分阶段测量截图后处理的耗时
+
+生成与 setup_browser 移动端模拟尺寸一致的合成截图，分别计时：
+解码、整幅缩放（可对比多种重采样方式）、裁切、模板拼接、replace_back_icon、
+Compositor 单次合成，以及每种输出格式的编码；再分别测量旧流程和单次合成
+流程（每种格式）的端到端帧率。原生分辨率截图（capture.py 的 native 模式）
+单独计时解码、准备内容区域和端到端（png），与缩放模式对比。
+截图传输（capture）部分用 Pillow 模拟 Chrome 按各种格式编码并 base64 传输的
+截图，统计每帧的传输字节数、模拟编码耗时和解码耗时，与旧的
+“写临时 PNG 文件再重新打开”做法对比；编码器与 Chrome 不同，只能作为参考。
+结果包含每个阶段的 p50/p90/p99 和进程峰值内存，
+可以输出为 JSON，并与之前保存的结果对比以发现性能回退。
+
+在项目根目录运行：
+    python tool/benchmark.py --frames 20
+    python tool/benchmark.py --frames 20 --json result.json
+    python tool/benchmark.py --baseline result.json
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import PIL
+from PIL import Image, ImageDraw
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compositor import (  # noqa: E402
+    Compositor, CANVAS_SIZE, SCALED_SIZE, CONTENT_TOP, CONTENT_BOTTOM, CONTENT_OFFSET, BOTTOM_OFFSET
+)
+from postprocess import load_template_images, compose_screenshot  # noqa: E402
+from encoders import OUTPUT_FORMATS, create_encoder  # noqa: E402
+from capture import FrameCapture, CAPTURE_QUALITY  # noqa: E402
+
+# 与 setup_browser 的移动端模拟一致：450 × int(450 × 2490 / 1179)，pixelRatio 2.0
+FRAME_SIZE = (900, 1900)
+# 原生模式截取的内容区域：按 clip 换算回设备像素（比保留的 2290 行多一行）
+_native_capture = FrameCapture("native")
+NATIVE_FRAME_SIZE = tuple(round(_native_capture.clip()[key] * _native_capture.pixel_ratio)
+                          for key in ("width", "height"))
+
+# 可对比的整幅缩放实现，新的缩放后端在这里注册即可
+RESIZE_BACKENDS = {
+    "lanczos": lambda img: img.resize(SCALED_SIZE, Image.Resampling.LANCZOS),
+    "bicubic": lambda img: img.resize(SCALED_SIZE, Image.Resampling.BICUBIC),
+    "bilinear": lambda img: img.resize(SCALED_SIZE, Image.Resampling.BILINEAR),
+    "lanczos-reducing-gap": lambda img: img.resize(SCALED_SIZE, Image.Resampling.LANCZOS, reducing_gap=2.0),
+}
+
+# 模拟 Chrome 截图编码的 Pillow 参数：png 为默认压缩，png-fast 对应 optimizeForSpeed
+CAPTURE_SIMULATIONS = {
+    "png": ("PNG", {"compress_level": 6}),
+    "png-fast": ("PNG", {"compress_level": 1}),
+    "jpeg": ("JPEG", {"quality": CAPTURE_QUALITY}),
+    "webp": ("WEBP", {"quality": CAPTURE_QUALITY}),
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+def make_synthetic_frame(seed=0, size=FRAME_SIZE):
+    """生成一张类似笔记页面的合成截图（PNG 字节）"""
+    rng = random.Random(seed)
+    width, height = size
+    img = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(img)
+
+    # 上半部分模拟轮播图：渐变 + 噪点
+    photo_height = int(height * 0.6)
+    for y in range(0, photo_height, 4):
+        shade = int(255 * y / photo_height)
+        draw.rectangle((0, y, width, y + 4), fill=(shade, 120, 255 - shade))
+    noise = Image.effect_noise((width, photo_height), 40).convert('RGB')
+    img.paste(Image.blend(img.crop((0, 0, width, photo_height)), noise, 0.3), (0, 0))
+
+    # 下半部分模拟正文文字行
+    y = photo_height + 40
+    while y < height - 40:
+        line_width = rng.randint(width // 3, width - 60)
+        draw.rectangle((30, y, 30 + line_width, y + 18), fill=(40, 40, 40))
+        y += rng.randint(36, 60)
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def replace_back_icon(image_path, back_icon):
+    """替换图片中的返回图标（旧流程的做法，只在基准测试中作为对比）"""
+    try:
+        with Image.open(image_path) as img:
+            # 计算正方形区域（以最长边为准）
+            width = 118 - 35
+            height = 257 - 170
+            size = max(width, height)  # 取最长边
+
+            # 计算居中的正方形区域
+            center_x = (35 + 118) // 2
+            center_y = (170 + 257) // 2
+            half_size = size // 2
+
+            paste_box = (
+                center_x - half_size,  # left
+                center_y - half_size,  # top
+                center_x + half_size,  # right
+                center_y + half_size   # bottom
+            )
+
+            # 将返回图标粘贴到指定位置
+            paste_pos = (paste_box[0], paste_box[1])
+            img.paste(back_icon, paste_pos)
+
+            # 保存修改后的图片
+            img.save(image_path, quality=95)
+            return True
+
+    except Exception as e:
+        print(f"替换返回图标时出错: {str(e)}")
+        return False
+
+
+def compose_legacy(frame_bytes, output_path, top_img, bottom_img, back_icon):
+    """旧流程：整幅缩放、新建画布、保存后再重新打开替换返回图标"""
+    with Image.open(io.BytesIO(frame_bytes)) as img:
+        resized_img = img.resize((1179, 2490), Image.Resampling.LANCZOS)
+        cropped_img = resized_img.crop((0, 195, 1179, 2485))
+        final_img = Image.new('RGB', (1179, 2556), 'white')
+        final_img.paste(top_img, (0, 0))
+        final_img.paste(cropped_img, (0, 165))
+        final_img.paste(bottom_img, (0, 2455))
+        final_img.save(output_path, quality=95)
+    replace_back_icon(output_path, back_icon)
+
+
+def decode_frame(frame_bytes):
+    """解码浏览器截图"""
+    img = Image.open(io.BytesIO(frame_bytes))
+    img.load()
+    return img
+
+
+def simulate_capture(img, name):
+    """模拟 Chrome 按 name 格式编码截图，返回 WebDriver 传输的 base64 文本"""
+    image_format, options = CAPTURE_SIMULATIONS[name]
+    buffer = io.BytesIO()
+    img.save(buffer, image_format, **options)
+    return base64.b64encode(buffer.getvalue())
+
+
+def decode_capture(payload):
+    """新做法：base64 解码后直接在内存中解码图片"""
+    return decode_frame(base64.b64decode(payload))
+
+
+def decode_capture_via_file(payload, out_dir):
+    """旧做法：写入临时 PNG 文件，重新打开后删除"""
+    path = os.path.join(out_dir, "temp_capture.png")
+    with open(path, 'wb') as f:
+        f.write(base64.b64decode(payload))
+    with Image.open(path) as img:
+        img.load()
+    os.remove(path)
+    return img
+
+
+def paste_templates(content, top_img, bottom_img):
+    """旧流程的模板拼接：每帧新建画布并粘贴顶部、内容和底部"""
+    final_img = Image.new('RGB', CANVAS_SIZE, 'white')
+    final_img.paste(top_img, (0, 0))
+    final_img.paste(content, CONTENT_OFFSET)
+    final_img.paste(bottom_img, BOTTOM_OFFSET)
+    return final_img
+
+
+def peak_rss_mb():
+    """进程至今的峰值常驻内存（MB），无法获取时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(ordered, pct):
+    """最近秩法计算百分位，ordered 须已排序"""
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def stats(timings):
+    """每帧耗时（毫秒）的统计信息"""
+    ordered = sorted(timings)
+    mean = sum(timings) / len(timings)
+    result = {
+        "count": len(timings),
+        "mean_ms": round(mean, 2),
+        "min_ms": round(ordered[0], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(ordered, pct), 2)
+    result["fps"] = round(1000 / mean, 2) if mean else None
+    return result
+
+
+class StageTimer:
+    """按阶段收集每帧耗时，前 warmup 帧不计入统计"""
+
+    def __init__(self, warmup=1):
+        self.warmup = warmup
+        self.timings = {}
+        self.peak_rss = {}
+
+    def run(self, stage, inputs, func):
+        """对每个输入调用 func 并计时，返回所有输出"""
+        outputs = []
+        timings = self.timings.setdefault(stage, [])
+        # 帧数不超过预热帧数时全部计入，避免没有数据
+        warmup = self.warmup if len(inputs) > self.warmup else 0
+        for i, item in enumerate(inputs):
+            start = time.perf_counter()
+            outputs.append(func(item))
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+        self.peak_rss[stage] = peak_rss_mb()
+        return outputs
+
+    def report(self):
+        return {
+            stage: dict(stats(timings), peak_rss_mb=self.peak_rss[stage])
+            for stage, timings in self.timings.items()
+        }
+
+
+def run_suite(frame_count, formats, resize_backends, warmup=1, legacy=True):
+    """运行全部阶段，返回可以直接写成 JSON 的结果"""
+    top_img, bottom_img, back_icon = load_template_images()
+    frames = [make_synthetic_frame(seed) for seed in range(frame_count)]
+    native_frames = [make_synthetic_frame(seed, NATIVE_FRAME_SIZE) for seed in range(frame_count)]
+    timer = StageTimer(warmup)
+    encoded_sizes = {}
+
+    start = time.perf_counter()
+    compositor = Compositor(top_img, bottom_img, back_icon)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    # 旧流程的各个阶段：每个阶段的输入是上一阶段的输出
+    decoded = timer.run("decode", frames, decode_frame)
+    resized = None
+    for name in resize_backends:
+        outputs = timer.run(f"resize[{name}]", decoded, RESIZE_BACKENDS[name])
+        resized = resized or outputs
+    cropped = timer.run("crop", resized, lambda img: img.crop((0, CONTENT_TOP, SCALED_SIZE[0], CONTENT_BOTTOM)))
+    pasted = timer.run("paste", cropped, lambda img: paste_templates(img, top_img, bottom_img))
+
+    # Compositor 的单次合成
+    timer.run("prepare_content", decoded, compositor.prepare_content)
+    composed = timer.run("compose", decoded, compositor.compose)
+    native_decoded = timer.run("decode[native]", native_frames, decode_frame)
+    timer.run("prepare_content[native]", native_decoded, compositor.prepare_content)
+
+    # 截图传输：模拟浏览器端编码，再比较在内存中解码和经过临时文件解码
+    capture_bytes = {}
+    for name in CAPTURE_SIMULATIONS:
+        payloads = timer.run(f"capture_encode[{name}]", native_decoded,
+                             lambda img, name=name: simulate_capture(img, name))
+        capture_bytes[name] = round(sum(len(payload) for payload in payloads) / len(payloads))
+        timer.run(f"capture_decode[{name}]", payloads, decode_capture)
+        if name == "png":
+            with tempfile.TemporaryDirectory() as temp_dir:
+                timer.run("capture_decode[temp-file]", payloads,
+                          lambda payload: decode_capture_via_file(payload, temp_dir))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        # replace_back_icon 本身需要打开、粘贴并重新保存文件
+        paths = []
+        for i, img in enumerate(pasted):
+            path = os.path.join(out_dir, f"back_{i}.png")
+            img.save(path, compress_level=1)
+            paths.append(path)
+        timer.run("replace_back_icon", paths, lambda path: replace_back_icon(path, back_icon))
+
+        for name in formats:
+            encoder = create_encoder(name)
+
+            def encode(img, encoder=encoder):
+                buffer = io.BytesIO()
+                encoder.save(img, buffer)
+                return buffer.tell()
+
+            sizes = timer.run(f"encode[{name}]", composed, encode)
+            encoded_sizes[name] = round(sum(sizes) / len(sizes))
+
+        # 端到端：从截图字节到写入文件
+        indexed = list(enumerate(frames))
+        if legacy:
+            timer.run("end_to_end[legacy]", indexed, lambda item: compose_legacy(
+                item[1], os.path.join(out_dir, f"legacy_{item[0]}.png"), top_img, bottom_img, back_icon))
+        for name in formats:
+            encoder = create_encoder(name)
+            pipeline_compositor = Compositor(top_img, bottom_img, back_icon, encoder)
+            timer.run(f"end_to_end[{name}]", indexed, lambda item: compose_screenshot(
+                item[1], os.path.join(out_dir, f"single_{item[0]}{encoder.extension}"), pipeline_compositor))
+        native_compositor = Compositor(top_img, bottom_img, back_icon)
+        timer.run("end_to_end[native]", list(enumerate(native_frames)), lambda item: compose_screenshot(
+            item[1], os.path.join(out_dir, f"native_{item[0]}.png"), native_compositor))
+
+    stages = timer.report()
+    for name, size in encoded_sizes.items():
+        stages[f"encode[{name}]"]["mean_bytes"] = size
+    for name, size in capture_bytes.items():
+        stages[f"capture_encode[{name}]"]["mean_bytes"] = size
+
+    return {
+        "frames": frame_count,
+        "frame_size": list(FRAME_SIZE),
+        "native_frame_size": list(NATIVE_FRAME_SIZE),
+        "warmup": warmup,
+        "setup_ms": round(setup_ms, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": stages,
+        "capture_savings": capture_savings(stages),
+    }
+
+
+def print_report(result):
+    """输出便于阅读的表格"""
+    print(f"输入: {result['frames']} 帧 {FRAME_SIZE[0]}×{FRAME_SIZE[1]} 合成截图（预热 {result['warmup']} 帧）")
+    print(f"模板画布生成（每次运行一次）: {result['setup_ms']:.1f} ms")
+    print(f"{'阶段':<28}{'平均':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'帧/秒':>7}{'KB':>9}")
+    for stage, info in result["stages"].items():
+        size = f"{info['mean_bytes'] / 1024:9.0f}" if "mean_bytes" in info else ""
+        print(f"{stage:<30}{info['mean_ms']:9.1f}{info['p50_ms']:9.1f}{info['p90_ms']:9.1f}"
+              f"{info['p99_ms']:9.1f}{info['fps']:9.2f}{size}")
+    if result["peak_rss_mb"] is not None:
+        print(f"峰值内存: {result['peak_rss_mb']} MB")
+
+    stages = result["stages"]
+    if "end_to_end[legacy]" in stages and "end_to_end[png]" in stages:
+        before = stages["end_to_end[legacy]"]["mean_ms"]
+        after = stages["end_to_end[png]"]["mean_ms"]
+        print(f"单次合成（png）比旧流程每帧节省 {before - after:.1f} ms（{before / after:.2f}×）")
+    if "end_to_end[png]" in stages and "end_to_end[native]" in stages:
+        before = stages["end_to_end[png]"]["mean_ms"]
+        after = stages["end_to_end[native]"]["mean_ms"]
+        print(f"原生分辨率截图（png）比缩放模式每帧节省 {before - after:.1f} ms（{before / after:.2f}×）")
+
+    savings = capture_savings(stages)
+    if savings:
+        print("截图传输（与 png + 临时文件相比，每帧）：")
+        for name, info in savings.items():
+            print(f"  {name:<10}少传 {info['bytes_saved'] / 1024:7.0f} KB，节省 {info['ms_saved']:6.1f} ms")
+
+
+def capture_savings(stages):
+    """每种截图格式与 png + 临时文件相比，每帧少传的字节数和节省的毫秒数"""
+    baseline = stages.get("capture_encode[png]")
+    baseline_decode = stages.get("capture_decode[temp-file]")
+    if not baseline or not baseline_decode:
+        return {}
+    baseline_ms = baseline["mean_ms"] + baseline_decode["mean_ms"]
+    savings = {}
+    for name in CAPTURE_SIMULATIONS:
+        encode = stages.get(f"capture_encode[{name}]")
+        decode = stages.get(f"capture_decode[{name}]")
+        if encode and decode:
+            savings[name] = {
+                "bytes_saved": baseline["mean_bytes"] - encode["mean_bytes"],
+                "ms_saved": round(baseline_ms - encode["mean_ms"] - decode["mean_ms"], 2),
+            }
+    return savings
+
+
+def compare_baseline(result, baseline, tolerance):
+    """与之前的结果对比 p50，返回变慢超过 tolerance 的阶段列表"""
+    regressions = []
+    print(f"与基准结果对比（p50，允许波动 {tolerance:.0%}）：")
+    for stage, info in result["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous["p50_ms"]:
+            continue
+        ratio = info["p50_ms"] / previous["p50_ms"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  <- 变慢"
+            regressions.append(stage)
+        print(f"  {stage:<30}{previous['p50_ms']:9.1f} -> {info['p50_ms']:9.1f} ms（{ratio:.2f}×）{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片合成基准测试")
+    parser.add_argument('--frames', type=int, default=20, help="测试帧数（默认 20）")
+    parser.add_argument('--warmup', type=int, default=1, help="每个阶段不计时的预热帧数（默认 1）")
+    parser.add_argument('--formats', nargs='+', choices=OUTPUT_FORMATS, default=list(OUTPUT_FORMATS),
+                        help="要测试的输出格式（默认全部）")
+    parser.add_argument('--resize', nargs='+', choices=sorted(RESIZE_BACKENDS), default=["lanczos"],
+                        help="要对比的整幅缩放实现（默认 lanczos）")
+    parser.add_argument('--skip-legacy', action='store_true', help="不测试旧流程的端到端耗时")
+    parser.add_argument('--json', metavar='PATH', help="把结果写入 JSON 文件，- 表示输出到标准输出")
+    parser.add_argument('--baseline', metavar='PATH', help="与之前保存的 JSON 结果对比，有阶段变慢时返回非零")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="对比时允许的变慢比例（默认 0.2）")
+    args = parser.parse_args()
+
+    result = run_suite(max(1, args.frames), args.formats, args.resize,
+                       warmup=max(0, args.warmup), legacy=not args.skip_legacy)
+
+    if args.json == '-':
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(result)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到 {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_baseline(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,37 @@
 from flask_cors import CORS
-from flask import Flask, render_template, request, jsonify, Response, send_from_directory
+from flask import Flask, render_template, request, jsonify, Response, send_file, send_from_directory, stream_with_context
 from main import (
-    setup_browser, save_browser_session, prepare_top_image,
-    prepare_bottom_image, prepare_back_icon, process_single_url
+    setup_browser, save_browser_session, restore_cookies, prepare_top_image,
+    prepare_bottom_image, prepare_back_icon, process_single_url,
+    MAX_CAROUSEL_PAGES, COOKIE_FILE, extra_page_stats
+)
+from worker_pool import run_worker_pool, normalize_worker_count, MAX_WORKERS
+from browser_pool import BrowserPool
+from throttle import AdaptiveThrottle
+from blocking import DEFAULT_BLOCK_PROFILE, get_block_profile
+from postprocess import FramePipeline
+from readiness import PAGE_LOAD_STRATEGIES, DEFAULT_PAGE_LOAD_STRATEGY
+from manifest import RunManifest, note_key
+from retry import RetryStore, driver_alive, run_with_retries, TASK_RETRY
+from ingest import UrlIngestor, iter_text_lines
+from screenshot_index import ScreenshotIndex
+from thumbnails import ThumbnailCache
+from metrics import registry, stage_summary, network_summary, failure_summary, JOBS_TOTAL
+from capture import DEFAULT_CAPTURE_MODE, DEFAULT_CAPTURE_FORMAT, FrameCapture
+from encoders import OUTPUT_EXTENSIONS, DEFAULT_OUTPUT_FORMAT, create_encoder
+from joblog import JobLogger, bind, install_stdout_router
+from events import (
+    EventHub, OutputQueue, event_text, format_sse, EVENT_FRAME, EVENT_JOB, EVENT_LOG, EVENT_PROGRESS, EVENT_STATUS
+)
+from jobs import (
+    JobManager, JOB_QUEUED, JOB_FAILED, FINISHED_STATES,
+    URL_PENDING, URL_RUNNING, URL_DONE, URL_FAILED, URL_SKIPPED, URL_CANCELLED
 )
 from PIL import Image
 import os
-import sys
-import io
-from queue import Queue
-from threading import Thread, Event
-import time
+import atexit
+from queue import Full
+from threading import Event, Thread
 import webbrowser
 import subprocess
 import platform
@@ -19,18 +40,36 @@ import socket
 import requests
 from urllib.parse import urljoin
 import json
+import hashlib
 from selenium.webdriver.chrome.service import Service
 
 app = Flask(__name__)
 CORS(app)  # 启用 CORS
 
 # 全局变量
-output_queue = Queue()
-current_driver = None
-processing = False
+# 缓冲区上限可以用环境变量 XHS_EVENT_MAX_EVENTS / XHS_EVENT_MAX_MB 调整
+event_hub = EventHub.from_env()
+output_queue = OutputQueue(event_hub)
+# 服务级别的输出（如准备资源）使用的日志，不写文件
+server_logger = JobLogger(hub=event_hub)
+# 只有绑定了任务日志的线程的 print 才会进入日志，其余线程照常输出到控制台
+install_stdout_router()
+screenshot_index = ScreenshotIndex(extensions=OUTPUT_EXTENSIONS)
+# 任务之间复用的浏览器，服务退出时关闭
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
+# 所有任务共用的访问节奏，并发和速率根据网站的反应自动调整
+site_throttle = AdaptiveThrottle(max_concurrency=MAX_WORKERS)
+thumbnail_cache = ThumbnailCache()
+legacy_cursor = 0  # 旧接口 /get_output 不带游标时共用的读取位置
 login_confirmed = Event()
 chrome_service = None
 
+# SSE 连接空闲时发送心跳的间隔（秒）
+SSE_KEEPALIVE_SECONDS = 15
+# 能还原成文本行的事件类型
+TEXT_EVENTS = (EVENT_LOG, EVENT_STATUS, EVENT_PROGRESS)
+
 # 添加资源URL配置
 RESOURCE_BASE_URL = "https://github.com/Gloridust/xhs_screenshot_spyder/blob/main/src/"
 REQUIRED_RESOURCES = {
@@ -48,33 +87,22 @@ def open_folder(path):
     else:  # Linux
         subprocess.run(["xdg-open", path])
 
-def output_reader():
-    """读取输出队列并返回内容"""
-    messages = []
-    while not output_queue.empty():
-        messages.append(output_queue.get_nowait())
-    return messages
-
-class OutputCapture:
-    """捕获 print 输出的上下文管理器"""
-    def __init__(self):
-        self.original_stdout = sys.stdout
-        self.output = io.StringIO()
-
-    def write(self, text):
-        self.output.write(text)
-        if text.strip():  # 只有非空内容才放入队列
-            output_queue.put(text)
-
-    def flush(self):
-        pass
-
-    def __enter__(self):
-        sys.stdout = self
-        return self
+def output_reader(cursor=None, tail=None):
+    """读取游标之后的输出内容，返回 (消息列表, 新游标)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        sys.stdout = self.original_stdout
+    不指定游标时使用共享的旧游标，行为与原来清空队列一致；
+    指定 tail 时只返回最近 tail 行，供刚打开页面的客户端补齐日志。
+    """
+    global legacy_cursor
+    if tail is not None:
+        events, next_cursor = event_hub.tail(max(tail, 0), kinds=TEXT_EVENTS)
+    else:
+        use_legacy = cursor is None
+        events, next_cursor = event_hub.read_since(legacy_cursor if use_legacy else cursor)
+        if use_legacy:
+            legacy_cursor = next_cursor
+    messages = [text for text in (event_text(kind, data) for _, kind, data, _ in events) if text is not None]
+    return messages, next_cursor
 
 def download_resource(filename):
     """从GitHub下载资源文件"""
@@ -163,17 +191,285 @@ def index():
     has_config = os.path.exists("./chrome_user_data")
     return render_template('index.html', has_config=has_config)
 
-@app.route('/start_process', methods=['POST'])
-def start_process():
-    """开始处理截图"""
-    global current_driver, processing, chrome_service
+def create_capture(options):
+    """按任务参数创建截图方式，参数无效时抛出 ValueError"""
+    return FrameCapture(options['capture_mode'], options['capture_format'], options['capture_quality'],
+                        options['capture_fast'])
+
+def parse_job_request(data, ingestor=None):
+    """解析提交任务的参数，返回 (urls, options, 错误信息)
+
+    URL 逐行解析并按笔记 ID 去重，ingestor 为 UrlIngestor 时可以在解析后查看去重统计。
+    """
+    data = data or {}
+    options = {
+        'use_previous': bool(data.get('use_previous', False)),
+        'workers': normalize_worker_count(data.get('workers', 1)),
+        'page_load_strategy': data.get('page_load_strategy', DEFAULT_PAGE_LOAD_STRATEGY),
+        'output_format': data.get('output_format') or DEFAULT_OUTPUT_FORMAT,
+        'quality': data.get('quality'),
+        'capture_mode': data.get('capture_mode') or DEFAULT_CAPTURE_MODE,
+        'capture_format': data.get('capture_format') or DEFAULT_CAPTURE_FORMAT,
+        'capture_quality': data.get('capture_quality'),
+        'capture_fast': bool(data.get('capture_fast', False)),
+        'overlay_observer': bool(data.get('overlay_observer', False)),
+        'block_profile': data.get('block_profile') or DEFAULT_BLOCK_PROFILE,
+    }
+    try:
+        options['max_pages'] = max(1, int(data.get('max_pages', MAX_CAROUSEL_PAGES)))
+    except (TypeError, ValueError):
+        options['max_pages'] = MAX_CAROUSEL_PAGES
+    if options['page_load_strategy'] not in PAGE_LOAD_STRATEGIES:
+        return None, None, f"不支持的页面加载策略: {options['page_load_strategy']}"
+    try:
+        create_encoder(options['output_format'], options['quality'])
+        create_capture(options)
+        get_block_profile(options['block_profile'])
+    except (TypeError, ValueError) as e:
+        return None, None, str(e)
     
-    if processing:
-        return jsonify({
-            'success': False,
-            'message': '已有任务正在进行中'
-        })
+    urls = data.get('urls', '')
+    if isinstance(urls, str):
+        lines = iter_text_lines(urls)
+    else:
+        lines = (url for url in urls if isinstance(url, str))
+    # 粘贴的文本已经在内存中，全部读完再交出，重复的笔记总是使用最后出现的 token
+    ingestor = ingestor or UrlIngestor(lookahead=None)
+    urls = list(ingestor.ingest(lines))
+    if not urls:
+        return None, None, '请输入有效的URL列表'
+    return urls, options, None
+
+def browser_key(page_load_strategy, capture, overlay_observer=False, block_profile=DEFAULT_BLOCK_PROFILE):
+    """浏览器池的 key：启动参数相同的浏览器才能互相替代"""
+    return (page_load_strategy, capture.pixel_ratio, overlay_observer, block_profile)
+
+def run_job(job):
+    """执行一个截图任务（在任务管理器的后台线程中运行）
+
+    浏览器从 browser_pool 租用，任务结束后归还，下一个任务可以直接使用。
+    """
+    options = job.options
+    workers = options['workers']
+    page_load_strategy = options['page_load_strategy']
+    capture = create_capture(options)
+    overlay_observer = options['overlay_observer']
+    block_profile = get_block_profile(options['block_profile'])
+    pool_key = browser_key(page_load_strategy, capture, overlay_observer, options['block_profile'])
+    extra_page_stats.reset()
+    # drivers[0] 为第一个浏览器，崩溃后在重试前被替换
+    drivers = []
+    # 本任务打开的模板图片，任务结束时关闭（资源可能在两个任务之间重新生成，所以不跨任务缓存）
+    templates = []
     
+    # 任务日志写在截图旁边；任务线程及其派生的线程中的 print 都只进入这个任务的日志
+    logger = JobLogger(job.id, os.path.join('./screenshot', f"{job.output_prefix}events.jsonl"), event_hub)
+    with logger, bind(logger):
+        try:
+            logger.info("开始任务 %s（%d 个URL）", job.id, len(job.urls), urls=len(job.urls), options=options)
+            
+            # 预先加载图片资源
+            try:
+                for path in ("src/top.jpg", "src/bottom.jpg", "src/back.png"):
+                    templates.append(Image.open(path))
+                top_img, bottom_img, back_icon = templates
+                # 立即解码，避免多个线程同时触发延迟加载
+                top_img.load()
+                bottom_img.load()
+                back_icon.load()
+            except Exception as e:
+                logger.error("加载图片资源失败: %s", e, error=str(e))
+                job.finish(JOB_FAILED, f"加载图片资源失败: {str(e)}")
+                return
+            
+            # 跳过上次运行中已经完成的笔记
+            manifest = RunManifest()
+            tasks, skipped = manifest.pending_tasks(job.urls)
+            if skipped:
+                pending = {index for index, _ in tasks}
+                for index in range(1, len(job.urls) + 1):
+                    if index not in pending:
+                        job.set_url_status(index, URL_SKIPPED)
+                logger.info("跳过 %d 个已完成的笔记，剩余 %d 个", skipped, len(tasks), skipped=skipped)
+            if not tasks:
+                logger.status("已完成")
+                logger.info("✨ 任务完成！所有截图已保存。")
+                return
+            
+            # 优先使用池中已经启动的浏览器，没有时用全局的 chrome_service 启动
+            main_driver = browser_pool.lease(pool_key, lambda: setup_browser(
+                options['use_previous'], chrome_service, page_load_strategy=page_load_strategy, capture=capture,
+                overlay_observer=overlay_observer, block_profile=block_profile))
+            job.add_driver(main_driver)
+            drivers.append(main_driver)
+            logger.info("浏览器已就绪")
+            
+            # 如果不使用上次配置，需要等待登录
+            if not options['use_previous']:
+                logger.info("请在浏览器中完成登录，然后点击下方的【确认已登录】按钮继续...")
+                # 打开小红书登录页面
+                main_driver.get("https://www.xiaohongshu.com")
+                # 等待登录确认信号
+                while not login_confirmed.is_set():
+                    if job.cancel_event.wait(0.25):  # 如果任务被取消
+                        return
+                logger.info("已确认登录，开始处理...")
+            
+            # 更新状态为正在截图
+            logger.status("正在截图中...")
+            
+            # 其余浏览器以及替换崩溃的浏览器都直接复用第一个浏览器的登录cookies
+            shared_cookies = main_driver.get_cookies()
+            
+            def lease_driver():
+                launched = []
+                
+                def launch():
+                    launched.append(True)
+                    return setup_browser(
+                        service=chrome_service, cookies=shared_cookies,
+                        page_load_strategy=page_load_strategy, capture=capture, overlay_observer=overlay_observer,
+                        block_profile=block_profile)
+                
+                driver = browser_pool.lease(pool_key, launch)
+                job.add_driver(driver)
+                if not launched:
+                    # 池中的浏览器还带着之前任务的登录状态，换成这个任务的cookies
+                    try:
+                        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                    except Exception as e:
+                        logger.warning("清除浏览器cookies失败: %s", e, error=str(e))
+                    restore_cookies(driver, shared_cookies)
+                return driver
+            
+            def create_driver(worker_id):
+                if worker_id == 0:
+                    if not job.cancelled and not driver_alive(drivers[0]):
+                        logger.warning("浏览器已不可用，重新启动")
+                        job.remove_driver(drivers[0])
+                        browser_pool.release(drivers[0], healthy=False)
+                        drivers[0] = lease_driver()
+                    return drivers[0]
+                return lease_driver()
+            
+            def release_driver(driver, worker_id):
+                # 第一个浏览器在保存会话后统一归还；任务取消时浏览器已被关闭
+                if driver is not drivers[0]:
+                    job.remove_driver(driver)
+                    browser_pool.release(driver, healthy=not job.cancelled)
+            
+            # 记录每个笔记的尝试次数，可以重试的失败在所有 URL 处理完后按退避时间重试
+            retry_store = RetryStore()
+            retry_store.begin_run()
+            
+            # 遍历URL并截图，图片拼接在后处理进程中与浏览器导航并行
+            encoder = create_encoder(options['output_format'], options['quality'])
+            with FramePipeline(on_saved=publish_frame, thumbnails=thumbnail_cache, encoder=encoder,
+                               index=screenshot_index) as pipeline:
+                def set_url_status(index, status):
+                    """更新 URL 状态并推送任务进度，所有客户端的任务列表和进度条随之更新"""
+                    job.set_url_status(index, status)
+                    publish_job(job)
+                    logger.progress(job.summary()['progress'])
+                
+                def handle_url(driver, index, url, worker_id, is_first):
+                    set_url_status(index, URL_RUNNING)
+                    browser_pool.mark_page(driver)
+                    success = process_single_url(driver, url, index, top_img, bottom_img, back_icon,
+                                                 check_guides=is_first, pipeline=pipeline, manifest=manifest,
+                                                 max_pages=options['max_pages'], output_prefix=job.output_prefix,
+                                                 capture=capture, retry_store=retry_store, throttle=site_throttle)
+                    if job.cancelled:
+                        set_url_status(index, URL_CANCELLED)
+                    elif success:
+                        set_url_status(index, URL_DONE)
+                    else:
+                        # 等待重试的 URL 回到等待状态，重试用完后才算失败
+                        retrying = retry_store.status(note_key(url)) == TASK_RETRY
+                        set_url_status(index, URL_PENDING if retrying else URL_FAILED)
+                    return success
+                
+                run_with_retries(tasks, retry_store,
+                                 lambda batch: run_worker_pool(batch, workers, create_driver, handle_url,
+                                                               release_driver, stop_event=job.cancel_event),
+                                 stop_event=job.cancel_event)
+            if job.cancelled:  # 如果任务被取消
+                return
+            
+            # 阶段耗时为服务启动以来的累计值，详细分布见 /metrics
+            for summary in (extra_page_stats.summary(), stage_summary(), network_summary(), failure_summary(),
+                            site_throttle.summary()):
+                if summary:
+                    logger.info(summary)
+            
+            # 总是保存会话
+            save_browser_session(drivers[0])
+            logger.info("已保存浏览器配置，下次可以直接使用")
+            
+            # 更新状态为已完成
+            logger.status("已完成")
+            logger.info("✨ 任务完成！所有截图已保存。")
+        
+        except Exception as e:
+            logger.error("任务出错: %s", e, error=str(e))
+            raise
+        finally:
+            for image in templates:
+                image.close()
+            if drivers:
+                job.remove_driver(drivers[0])
+                browser_pool.release(drivers[0], healthy=not job.cancelled)
+            login_confirmed.clear()  # 重置登录确认状态
+
+def publish_frame(result):
+    """截图保存完成后推送 frame 事件（流水线已经把截图登记到索引）"""
+    filename = os.path.basename(result['path'])
+    entry = screenshot_index.get(filename)
+    event_hub.publish(EVENT_FRAME, {
+        'filename': filename,
+        'path': f"/screenshots/{filename}",
+        'thumbnail': entry['thumbnail'] if entry else None,
+        'size': result['size']
+    })
+
+def publish_job(job):
+    """任务状态变化时推送 job 事件"""
+    if job.status in FINISHED_STATES:
+        JOBS_TOTAL.inc(status=job.status)
+    event_hub.publish(EVENT_JOB, dict(job.summary(), processing=is_processing()))
+
+job_manager = JobManager(run_job, on_change=publish_job)
+
+def pending_url_count():
+    """排队中和运行中的任务里还没处理的 URL 数量"""
+    return sum(job.counts().get(URL_PENDING, 0) for job in job_manager.active_jobs())
+
+registry.gauge("xhs_jobs", "内存中各状态的任务数", job_manager.status_counts, labels=("status",))
+registry.gauge("xhs_queue_depth", "排队等待执行的任务数", lambda: job_manager.status_counts().get(JOB_QUEUED, 0))
+registry.gauge("xhs_pending_urls", "等待处理的 URL 数", pending_url_count)
+registry.gauge("xhs_browser_pool", "浏览器池中空闲和租用中的浏览器数",
+               lambda: {state: browser_pool.stats()[state] for state in ("idle", "leased")}, labels=("state",))
+registry.gauge("xhs_browser_pool_events", "浏览器池启动、复用、回收和关闭浏览器的累计次数",
+               lambda: {event: value for event, value in browser_pool.stats().items()
+                        if event not in ("idle", "leased")}, labels=("event",))
+registry.gauge("xhs_throttle_concurrency", "自适应并发的当前上限", lambda: site_throttle.stats()["limit"])
+registry.gauge("xhs_throttle_in_flight", "正在处理的笔记数", lambda: site_throttle.stats()["in_flight"])
+registry.gauge("xhs_throttle_rate", "访问速率上限（篇/分钟）", lambda: site_throttle.stats()["rate"])
+registry.gauge("xhs_throttle_signals", "访问节奏收到的信号累计次数（ok/blocked/slow/decreases）",
+               lambda: {signal: site_throttle.stats()[signal] for signal in ("ok", "blocked", "slow", "decreases")},
+               labels=("signal",))
+registry.gauge("xhs_event_buffer_events", "事件缓冲区中保留的事件数", lambda: event_hub.stats()["events"])
+registry.gauge("xhs_event_buffer_bytes", "事件缓冲区的估算大小（字节）", lambda: event_hub.stats()["bytes"])
+registry.gauge("xhs_events_dropped", "因缓冲区已满丢弃的事件数", lambda: event_hub.stats()["dropped_events"])
+registry.gauge("xhs_event_bytes_dropped", "因缓冲区已满丢弃的事件估算大小（字节）",
+               lambda: event_hub.stats()["dropped_bytes"])
+
+def is_processing():
+    """是否有排队中或运行中的任务"""
+    return bool(job_manager.active_jobs())
+
+def submit_job(data):
+    """校验参数并提交任务，返回 JSON 响应"""
     # 检查 ChromeDriver 是否已准备好
     if chrome_service is None:
         output_queue.put("ChromeDriver 未就绪，正在重新初始化...")
@@ -183,75 +479,75 @@ def start_process():
                 'message': 'ChromeDriver 初始化失败，请查看控制台输出'
             })
     
-    use_previous = request.json.get('use_previous', False)
-    urls = request.json.get('urls', '').strip().split('\n')
-    urls = [url.strip() for url in urls if url.strip()]
-    
-    if not urls:
+    ingestor = UrlIngestor(lookahead=None)
+    urls, options, error = parse_job_request(data, ingestor)
+    if error:
         return jsonify({
             'success': False,
-            'message': '请输入有效的URL列表'
+            'message': error
         })
     
-    def process_task():
-        global current_driver, processing
-        processing = True
-        
-        with OutputCapture():
-            try:
-                # 预先加载图片资源
-                try:
-                    top_img = Image.open("src/top.jpg")
-                    bottom_img = Image.open("src/bottom.jpg")
-                    back_icon = Image.open("src/back.png")
-                except Exception as e:
-                    output_queue.put(f"加载图片资源失败: {str(e)}")
-                    return
-                
-                # 设置浏览器，使用全局的 chrome_service
-                current_driver = setup_browser(use_previous, chrome_service)
-                output_queue.put("浏览器已启动")
-                
-                # 如果不使用上次配置，需要等待登录
-                if not use_previous:
-                    output_queue.put("\n请在浏览器中完成登录，然后点击下方的【确认已登录】按钮继续...")
-                    # 打开小红书登录页面
-                    current_driver.get("https://www.xiaohongshu.com")
-                    # 等待登录确认信号
-                    while not login_confirmed.is_set():
-                        time.sleep(0.25)
-                        if not processing:  # 如果处理被终止
-                            return
-                    output_queue.put("已确认登录，开始处理...")
-                
-                # 更新状态为正在截图
-                output_queue.put("状态更新: 正在截图中...")
-                
-                # 遍历URL并截图
-                for i, url in enumerate(urls, 1):
-                    process_single_url(current_driver, url, i, top_img, bottom_img, back_icon)
-                
-                # 总是保存会话
-                save_browser_session(current_driver)
-                output_queue.put("已保存浏览器配置，下次可以直接使用")
-                
-                # 更新状态为已完成
-                output_queue.put("状态更新: 已完成")
-                output_queue.put("\n✨ 任务完成！所有截图已保存。")
-                    
-            finally:
-                if current_driver:
-                    current_driver.quit()
-                    current_driver = None
-                processing = False
-                login_confirmed.clear()  # 重置登录确认状态
-    
-    # 启动处理线程
-    Thread(target=process_task, daemon=True).start()
+    try:
+        job = job_manager.submit(urls, options)
+    except Full:
+        return jsonify({
+            'success': False,
+            'message': '任务队列已满，请稍后再试'
+        })
     
+    queued_ahead = len(job_manager.active_jobs()) - 1
+    message = f'任务已提交，前面还有 {queued_ahead} 个任务' if queued_ahead > 0 else '正在启动浏览器...'
+    if ingestor.duplicates:
+        message += f'（去掉 {ingestor.duplicates} 个重复的链接）'
     return jsonify({
         'success': True,
-        'message': '正在启动浏览器...'
+        'job_id': job.id,
+        'duplicates': ingestor.duplicates,
+        'message': message
+    })
+
+@app.route('/start_process', methods=['POST'])
+def start_process():
+    """开始处理截图（提交一个任务）"""
+    return submit_job(request.get_json(silent=True))
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """提交任务"""
+    return submit_job(request.get_json(silent=True))
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """列出所有任务"""
+    return jsonify({
+        'jobs': job_manager.list()
+    })
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """查看任务详情，URL 状态通过 offset/limit 分页"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(1000, max(1, request.args.get('limit', 100, type=int)))
+    return jsonify(job.detail(offset, limit))
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消单个任务，不影响其他任务"""
+    if not job_manager.cancel(job_id):
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    output_queue.put(f"\n⚠️ 任务 {job_id} 已取消")
+    return jsonify({
+        'success': True,
+        'message': '任务已取消'
     })
 
 @app.route('/confirm_login', methods=['POST'])
@@ -283,16 +579,18 @@ def open_output_folder():
 def clear_workspace():
     """清空工作区"""
     try:
-        # 清空 screenshot 文件夹中的所有文件
+        # 只删除 screenshot 文件夹中的截图；运行清单、重试记录、任务日志等状态文件保留，
+        # 排队中的任务和等待重试的笔记不受影响（清单中截图已删除的笔记会重新截图）
         folder_path = './screenshot'
         for filename in os.listdir(folder_path):
-            if filename != '.gitkeep':  # 保留 .gitkeep 文件
+            if filename.lower().endswith(OUTPUT_EXTENSIONS):
                 file_path = os.path.join(folder_path, filename)
                 try:
                     if os.path.isfile(file_path):
                         os.unlink(file_path)
                 except Exception as e:
                     print(f'删除文件失败: {str(e)}')
+        screenshot_index.rescan()
         return jsonify({
             'success': True,
             'message': '工作区已清空'
@@ -306,14 +604,15 @@ def clear_workspace():
 @app.route('/prepare_resources', methods=['POST'])
 def prepare_resources():
     """准备资源文件"""
-    with OutputCapture():
+    cursor = event_hub.last_seq
+    with bind(server_logger):
         # 检查资源文件
         success, message = check_resources()
         if not success:
             print(message)
             return jsonify({
                 'success': False,
-                'messages': output_reader()
+                'messages': output_reader(cursor)[0]
             })
         
         # 处理资源
@@ -325,47 +624,159 @@ def prepare_resources():
         
         return jsonify({
             'success': success,
-            'messages': output_reader()
+            'messages': output_reader(cursor)[0]
         })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus 文本格式的运行指标"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/get_output')
 def get_output():
-    """获取输出内容"""
-    messages = output_reader()
+    """获取输出内容，可以通过 cursor 参数从指定位置读取，tail=N 只取最近 N 行"""
+    messages, cursor = output_reader(request.args.get('cursor', type=int), request.args.get('tail', type=int))
     return jsonify({
         'messages': messages,
-        'processing': processing
+        'cursor': cursor,
+        'processing': is_processing()
+    })
+
+@app.route('/events')
+def stream_events():
+    """以 Server-Sent Events 推送日志、进度、状态和截图保存事件
+
+    客户端从 Last-Event-ID 请求头或 cursor 参数指定的位置开始接收，
+    断线重连时浏览器会自动带上最后收到的事件序号；首次连接可以用 tail=N
+    只接收最近 N 个事件。游标之后的事件已被丢弃时先推送一条警告。
+    """
+    cursor = request.headers.get('Last-Event-ID', type=int)
+    if cursor is None:
+        cursor = request.args.get('cursor', type=int)
+    if cursor is None:
+        tail = request.args.get('tail', type=int)
+        cursor = event_hub.tail_cursor(max(tail, 0)) if tail is not None else 0
+    
+    def generate():
+        position = cursor
+        # 告诉浏览器断线 3 秒后重连
+        yield "retry: 3000\n\n"
+        while True:
+            missed = event_hub.missed(position)
+            if missed:
+                position += missed
+                yield format_sse(position, EVENT_LOG, {
+                    'level': 'warning',
+                    'text': f"⚠️ 客户端落后太多，{missed} 条较早的事件已被丢弃"
+                })
+            events, position = event_hub.read_since(position, timeout=SSE_KEEPALIVE_SECONDS)
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for seq, kind, data, _ in events:
+                yield format_sse(seq, kind, data)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 @app.route('/get_screenshots')
 def get_screenshots():
-    """获取已生成的截图列表"""
-    screenshots = []
-    folder_path = './screenshot'
-    for filename in sorted(os.listdir(folder_path)):
-        if filename.endswith('.png') and filename != '.gitkeep':
-            screenshots.append({
-                'filename': filename,
-                'path': f'/screenshots/{filename}',
-                'timestamp': os.path.getmtime(os.path.join(folder_path, filename))
-            })
-    return jsonify(screenshots)
+    """获取已生成的截图列表
+
+    不带参数时返回完整列表（与旧接口一致）；
+    offset/limit 分页读取，reverse=1 从最新的文件名开始；
+    since=<cursor> 只返回该游标之后新增/更新的条目和已删除的文件名。
+    列表未变化时按 If-None-Match 返回 304。
+    """
+    screenshot_index.refresh()
+    etag = screenshot_index.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    args = request.args
+    if 'since' in args:
+        changed, removed = screenshot_index.since(args.get('since', 0, type=int))
+        body = {'items': changed, 'removed': removed, 'cursor': screenshot_index.generation}
+    elif 'offset' in args or 'limit' in args:
+        offset = max(0, args.get('offset', 0, type=int))
+        limit = max(1, min(args.get('limit', 100, type=int), 1000))
+        body = {
+            'items': screenshot_index.page(offset, limit, reverse=args.get('reverse') == '1'),
+            'offset': offset,
+            'total': len(screenshot_index),
+            'cursor': screenshot_index.generation
+        }
+    else:
+        body = screenshot_index.all()
+
+    response = jsonify(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# 带有正确版本号（?v=）的地址内容不会再变，可以长期缓存
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def cache_response(response, entry):
+    """请求带有当前版本号时允许浏览器长期缓存，否则每次用 ETag 重新验证"""
+    if entry and request.args.get('v') == entry['version']:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
 
-# 修改静态文件路由
 @app.route('/screenshots/<path:filename>')
 def serve_screenshot(filename):
-    """服务截图文件"""
+    """服务截图文件，MIME 类型按扩展名判断"""
     try:
-        return send_from_directory(
+        response = send_from_directory(
             os.path.abspath('./screenshot'),
             filename,
-            mimetype='image/png',
             as_attachment=False
         )
+        return cache_response(response, screenshot_index.get(filename))
     except Exception as e:
         print(f"加载图片失败: {str(e)}")
         return '', 404
 
+def screenshot_sha256(filename, entry):
+    """截图文件的 sha256，流水线之外保存的文件按需计算一次"""
+    if entry['sha256']:
+        return entry['sha256']
+    with open(os.path.join('./screenshot', filename), 'rb') as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    screenshot_index.set_sha256(filename, sha256, entry['version'])
+    return sha256
+
+@app.route('/thumbnails/<path:filename>')
+def serve_thumbnail(filename):
+    """服务截图的 WebP 缩略图，?w= 指定需要的宽度"""
+    screenshot_index.refresh()
+    entry = screenshot_index.get(filename)
+    if entry is None:
+        return '', 404
+    try:
+        width = thumbnail_cache.nearest_width(request.args.get('w', 0, type=int))
+        sha256 = screenshot_sha256(filename, entry)
+        path = thumbnail_cache.ensure(os.path.join('./screenshot', filename), sha256, width)
+        response = send_file(
+            os.path.abspath(path),
+            mimetype='image/webp',
+            etag=f"{sha256[:16]}-{width}",
+            conditional=True
+        )
+        return cache_response(response, entry)
+    except Exception as e:
+        print(f"加载缩略图失败: {str(e)}")
+        return '', 404
+
 def find_available_port(start_port=5000, max_attempts=10):
     """查找可用端口"""
     for port in range(start_port, start_port + max_attempts):
@@ -432,28 +843,14 @@ def check_config():
 
 @app.route('/stop_process', methods=['POST'])
 def stop_process():
-    """停止当前处理"""
-    global current_driver, processing
+    """停止所有排队中和运行中的任务"""
     try:
-        # 设置停止标志
-        processing = False
+        # 取消任务并关闭任务使用的浏览器
+        job_manager.cancel_all()
         
         # 清除登录确认状态
         login_confirmed.clear()
         
-        # 关闭浏览器
-        if current_driver:
-            try:
-                current_driver.quit()
-            except Exception as e:
-                print(f"关闭浏览器时出错: {str(e)}")
-            finally:
-                current_driver = None
-        
-        # 清理输出队列
-        while not output_queue.empty():
-            output_queue.get()
-            
         # 添加停止消息到输出
         output_queue.put("\n⚠️ 任务已停止")
         
@@ -477,6 +874,14 @@ if __name__ == '__main__':
         init_success = init_chrome_driver()
         if not init_success:
             output_queue.put("⚠️ ChromeDriver 初始化失败，程序可能无法正常运行")
+        elif os.path.exists(COOKIE_FILE):
+            # 有保存的登录状态时预先启动一个浏览器，第一个任务不用等待启动
+            capture = FrameCapture()
+            Thread(target=browser_pool.prewarm, daemon=True, args=(
+                browser_key(DEFAULT_PAGE_LOAD_STRATEGY, capture),
+                lambda: setup_browser(True, chrome_service, capture=capture,
+                                      block_profile=get_block_profile(DEFAULT_BLOCK_PROFILE))
+            )).start()
         
         # 启动浏览器（只启动一次）
         url = f'http://127.0.0.1:{port}'
@@ -0,0 +1,96 @@
+"""浏览器工作池：多个 Chrome 实例从共享队列中并行领取 URL"""
+import threading
+from itertools import chain, islice
+from joblog import current_binding, restore, context
+
+# 单次任务允许的最大浏览器数量
+MAX_WORKERS = 8
+
+
+def normalize_worker_count(value, default=1):
+    """把用户输入的并发数转换为 1~MAX_WORKERS 之间的整数"""
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(count, MAX_WORKERS))
+
+
+def run_worker_pool(tasks, worker_count, create_driver, handle_url,
+                    release_driver=None, stop_event=None):
+    """启动 worker_count 个浏览器并行处理 (序号, URL) 任务
+
+    tasks 可以是列表，也可以是边读取边产生任务的迭代器，worker 每次从中取出一个任务，
+    不会先把所有任务放进队列。
+
+    create_driver(worker_id) 返回该 worker 使用的 driver；
+    handle_url(driver, index, url, worker_id, is_first) 处理单个 URL，
+    is_first 表示这是该浏览器处理的第一个 URL（需要检查新手引导）；
+    release_driver(driver, worker_id) 在 worker 退出时调用，默认 quit()。
+
+    URL 的序号（从 1 开始）由调用方确定，输出文件名只取决于序号，
+    与哪个 worker 先完成无关。返回处理过的任务数（不含停止时未处理的任务）。
+    worker 线程继承调用线程的任务日志绑定。
+    """
+    total = len(tasks) if hasattr(tasks, '__len__') else None
+    tasks = iter(tasks)
+    # 先取出每个浏览器的第一个任务，任务比浏览器少时只启动需要的浏览器
+    first = list(islice(tasks, max(1, worker_count)))
+    pending = chain(first, tasks)
+    tasks_lock = threading.Lock()
+    processed = [0]
+    worker_count = max(1, min(worker_count, len(first) or 1))
+    binding = current_binding()
+
+    def next_task():
+        with tasks_lock:
+            task = next(pending, None)
+            if task is not None:
+                processed[0] += 1
+            return task
+
+    def worker(worker_id):
+        with restore(binding):
+            run_worker(worker_id)
+
+    def run_worker(worker_id):
+        try:
+            driver = create_driver(worker_id)
+        except Exception as e:
+            print(f"浏览器 #{worker_id + 1} 启动失败: {str(e)}")
+            return
+
+        is_first = True
+        try:
+            while not (stop_event and stop_event.is_set()):
+                task = next_task()
+                if task is None:
+                    break
+                index, url = task
+                with context(url_index=index, worker=worker_id):
+                    handle_url(driver, index, url, worker_id, is_first)
+                is_first = False
+        finally:
+            if release_driver:
+                release_driver(driver, worker_id)
+            else:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    print(f"关闭浏览器 #{worker_id + 1} 时出错: {str(e)}")
+
+    if worker_count == 1:
+        # 单浏览器时直接在当前线程运行，行为与之前的串行处理一致
+        worker(0)
+    else:
+        print(f"启动 {worker_count} 个浏览器并行处理" + (f" {total} 个URL" if total is not None else "URL"))
+        threads = [
+            threading.Thread(target=worker, args=(worker_id,), daemon=True)
+            for worker_id in range(worker_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return processed[0]